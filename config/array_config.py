@@ -0,0 +1,270 @@
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+
+from config_script import INDEX_FOLDER_MAP, MATRIX_FILES, build_scan_chain, read_file_lines
+from perf_model import read_parameters, read_shared_pkg
+
+# PE-array configuration matrices derived from a layer mapping.
+#
+# The NoC controllers tag every value they send from the GLBs; a PE only
+# takes the values whose tags match the IDs scanned into it. The tag order is
+# fixed by the RTL tag generators, replayed below, so the IDs of every PE
+# follow from where its PE set sits on the array:
+#
+#   - a PE set is R filter rows by e ofmap rows; with e > NUM_OF_COLS it is
+#     folded into strips of at most NUM_OF_COLS columns stacked under each
+#     other (conv2);
+#   - the r sets of a psum chain (one per channel group) are stacked in the
+#     same columns, r = 0 on top: ipsums enter at the bottom row of the chain,
+#     move up over the local links and leave as opsums from the top row;
+#   - the t chains (one per filter group) are tiled top to bottom, then left
+#     to right, against the bottom of the array (conv1, conv2).
+#
+# Row tags are shared by all PEs of an array row, so a placement that would
+# need two row tags on one row cannot be configured and raises ValueError.
+
+# === Constants ===
+# Tags the idle PEs are configured with; the tag generators never send them.
+IFMAP_UNUSED_ROW_TAG, IFMAP_UNUSED_COL_TAG = 15, 31
+UNUSED_TAG = 15
+# Ifmap row tags are U_crnt + 4 * r_crnt (ifmap_tag_generator.sv).
+IFMAP_ROW_TAG_STRIDE = 4
+# Filter column tags are t_crnt + 2 * r_crnt (filter_tag_generator.sv).
+FILTER_COL_TAG_STRIDE = 2
+# Psum tags walk 14 columns (psum_tag_generator.sv).
+PSUM_TAG_COLS = 14
+
+# === NoC Tags ===
+def ifmap_tags(params):
+    """Replays ifmap_tag_generator.sv; returns the (row, col) tag of every ifmap row of a pass, in GLB order."""
+    R, U, e, r = params['R'], params['U'], params['e'], params['r']
+    D = e * U + R - U
+    max_col_id = D >> (U >> 1)
+    tags = []
+    U_crnt = r_crnt = col = 0
+    for _ in range(r * D):
+        tags.append((U_crnt + r_crnt * IFMAP_ROW_TAG_STRIDE, col))
+        if r_crnt == r - 1:
+            r_crnt = 0
+            if U_crnt == U - 1:
+                U_crnt = 0
+                col = 0 if col == max_col_id else col + 1
+            else:
+                U_crnt += 1
+        else:
+            r_crnt += 1
+    return tags
+
+def filter_tags(params):
+    """Replays filter_tag_generator.sv; returns the (row, col) tag of every filter row, t fastest, then r, then R."""
+    return [(row, t_crnt + r_crnt * FILTER_COL_TAG_STRIDE)
+            for row in range(params['R']) for r_crnt in range(params['r']) for t_crnt in range(params['t'])]
+
+def psum_tags(params):
+    """Replays psum_tag_generator.sv; returns the (row, col) tag of every psum column, t fastest, then e."""
+    e, t = params['e'], params['t']
+    num_of_rows = (e * t + 13) >> 4
+    tags = []
+    row = col = 0
+    for _ in range(e * t):
+        tags.append((row, col))
+        if e < PSUM_TAG_COLS:
+            if row == num_of_rows - 1:
+                row, col = 0, (0 if col == PSUM_TAG_COLS - 1 else col + 1)
+            else:
+                row += 1
+        elif col == PSUM_TAG_COLS - 1:
+            row, col = (0 if row == num_of_rows - 1 else row + 1), 0
+        else:
+            col += 1
+    return tags
+
+def check_tags(params):
+    """Raises ValueError if a tag generator repeats a tag or sends an out-of-range one."""
+    for name, tags, max_row, max_col in (
+            ('ifmap', ifmap_tags(params), IFMAP_UNUSED_ROW_TAG - 1, IFMAP_UNUSED_COL_TAG - 1),
+            ('filter', filter_tags(params), UNUSED_TAG - 1, UNUSED_TAG - 1),
+            ('psum', psum_tags(params), UNUSED_TAG - 1, UNUSED_TAG - 1)):
+        if len(set(tags)) != len(tags):
+            raise ValueError(f"{name} tags repeat")
+        if max(row for row, _ in tags) > max_row or max(col for _, col in tags) > max_col:
+            raise ValueError(f"{name} tags exceed the tag widths")
+
+# === Placement ===
+def array_layout(params, hw):
+    """Returns the fold count and the size of one psum chain, and how many chains fit per column and row."""
+    rows, cols = hw['NUM_OF_ROWS'], hw['NUM_OF_COLS']
+    R, e, r = params['R'], params['e'], params['r']
+    folds = -(-e // cols)
+    chain_rows = R * r * folds
+    chain_cols = min(e, cols)
+    return {
+        'folds': folds,
+        'chain_rows': chain_rows,
+        'chain_cols': chain_cols,
+        'chains_per_col': rows // chain_rows,
+        'chains_per_row': cols // chain_cols,
+    }
+
+def _set_row_tag(row_tags, row, tag, name):
+    if row_tags[row] not in (tag, None):
+        raise ValueError(f"array row {row} needs {name} row tags {row_tags[row]} and {tag}")
+    row_tags[row] = tag
+
+def build_array_config(params, hw):
+    """
+    Builds the seven configuration matrices of a layer mapping.
+
+    Returns {name: rows} with the keys of MATRIX_FILES. The enables and link
+    selectors are NUM_OF_ROWS x NUM_OF_COLS bits; every ID matrix row is the
+    row tag followed by one column tag per PE. Raises ValueError if the
+    mapping cannot be placed or tagged.
+    """
+    check_tags(params)
+    rows, cols = hw['NUM_OF_ROWS'], hw['NUM_OF_COLS']
+    R, U, e, r, t = params['R'], params['U'], params['e'], params['r'], params['t']
+    layout = array_layout(params, hw)
+    if layout['chains_per_col'] * layout['chains_per_row'] < t:
+        raise ValueError(f"{t} chains of {layout['chain_rows']}x{layout['chain_cols']} PEs "
+                         f"do not fit the {rows}x{cols} array")
+    ifmap, filters, psums = ifmap_tags(params), filter_tags(params), psum_tags(params)
+
+    enables = [[0] * cols for _ in range(rows)]
+    ipsum_ln = [[0] * cols for _ in range(rows)]
+    opsum_ln = [[0] * cols for _ in range(rows)]
+    ifmap_row, ifmap_col = [None] * rows, [[IFMAP_UNUSED_COL_TAG] * cols for _ in range(rows)]
+    filter_row, filter_col = [None] * rows, [[UNUSED_TAG] * cols for _ in range(rows)]
+    ipsum_row, ipsum_col = [None] * rows, [[UNUSED_TAG] * cols for _ in range(rows)]
+    opsum_row, opsum_col = [None] * rows, [[UNUSED_TAG] * cols for _ in range(rows)]
+
+    chains_down = min(t, layout['chains_per_col'])
+    first_row = rows - chains_down * layout['chain_rows']
+    for t_idx in range(t):
+        top = first_row + (t_idx % chains_down) * layout['chain_rows']
+        left = (t_idx // chains_down) * layout['chain_cols']
+        for fold in range(layout['folds']):
+            width = min(cols, e - fold * cols)
+            for r_idx in range(r):
+                for i in range(R):
+                    row = top + (fold * r + r_idx) * R + i
+                    for j in range(width):
+                        col = left + j
+                        ofmap_row = fold * cols + j
+                        enables[row][col] = 1
+
+                        tag_row, tag_col = ifmap[(ofmap_row * U + i) * r + r_idx]
+                        _set_row_tag(ifmap_row, row, tag_row, 'ifmap')
+                        ifmap_col[row][col] = tag_col
+
+                        tag_row, tag_col = filters[(i * r + r_idx) * t + t_idx]
+                        _set_row_tag(filter_row, row, tag_row, 'filter')
+                        filter_col[row][col] = tag_col
+
+                        tag_row, tag_col = psums[ofmap_row * t + t_idx]
+                        if r_idx == 0 and i == 0:
+                            _set_row_tag(opsum_row, row, tag_row, 'opsum')
+                            opsum_col[row][col] = tag_col
+                            opsum_ln[row][col] = 1
+                        if r_idx == r - 1 and i == R - 1:
+                            _set_row_tag(ipsum_row, row, tag_row, 'ipsum')
+                            ipsum_col[row][col] = tag_col
+                            ipsum_ln[row][col] = 1
+
+    def with_row_tags(row_tags, col_tags, unused):
+        return [[unused if tag is None else tag] + col_tags[row] for row, tag in enumerate(row_tags)]
+
+    return {
+        'enables': enables,
+        'ipsum_ln_selectors': ipsum_ln,
+        'opsum_ln_selectors': opsum_ln,
+        'ifmap_ids': with_row_tags(ifmap_row, ifmap_col, IFMAP_UNUSED_ROW_TAG),
+        'filters_ids': with_row_tags(filter_row, filter_col, UNUSED_TAG),
+        'ipsum_ids': with_row_tags(ipsum_row, ipsum_col, UNUSED_TAG),
+        'opsum_ids': with_row_tags(opsum_row, opsum_col, UNUSED_TAG),
+    }
+
+# === Files ===
+def format_matrix(matrix):
+    return '\n'.join(' '.join(f"{val:<3}" for val in row).rstrip() for row in matrix)
+
+def read_matrix(file_path):
+    return [list(map(int, line.split())) for line in read_file_lines(file_path)]
+
+def compare_array_config(config, base_dir):
+    """Returns the matrix files in `base_dir` that are missing or differ from `config`."""
+    differ = []
+    for name, file_name in MATRIX_FILES.items():
+        file_path = os.path.join(base_dir, file_name)
+        if not os.path.exists(file_path) or read_matrix(file_path) != config[name]:
+            differ.append(file_name)
+    return differ
+
+def write_array_config(config, output_dir):
+    """
+    Writes the matrices of a configuration that are missing or differ in `output_dir`.
+
+    Files whose values already match are left untouched, whatever their column
+    padding. Files are written with CRLF line endings, like the committed ones.
+    Returns the names of the files written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    differ = compare_array_config(config, output_dir)
+    for name, file_name in MATRIX_FILES.items():
+        if file_name in differ:
+            with open(os.path.join(output_dir, file_name), 'w', newline='\r\n') as f:
+                f.write(format_matrix(config[name]))
+    return differ
+
+# === Main Entry ===
+if __name__ == '__main__':
+    base_root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Generate the PE-array configuration matrices and scan chain of conv layers.")
+    parser.add_argument('layers', nargs='*', default=list(INDEX_FOLDER_MAP.values()),
+                        help="layer folders to configure (default: all)")
+    parser.add_argument('--params', help="parameters.txt to configure instead of the layer's own (one layer only)")
+    parser.add_argument('--output', help="folder to write to (default: the layer folder; one layer only)")
+    parser.add_argument('--check', action='store_true',
+                        help="only compare the generated matrices with the files in the layer folder")
+    args = parser.parse_args()
+    if (args.params or args.output) and len(args.layers) != 1:
+        parser.error("--params and --output need exactly one layer")
+
+    hw = read_shared_pkg()
+    failed = False
+    for folder_name in args.layers:
+        base_dir = os.path.join(base_root, folder_name)
+        param_file = args.params or os.path.join(base_dir, 'parameters.txt')
+        try:
+            config = build_array_config(read_parameters(param_file), hw)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {folder_name}: {e}")
+            failed = True
+            continue
+
+        if args.check:
+            differ = compare_array_config(config, base_dir)
+            if differ:
+                print(f"{folder_name}: differs in {', '.join(differ)}")
+                failed = True
+            else:
+                print(f"{folder_name}: matrices match {os.path.basename(param_file)}")
+            continue
+
+        output_dir = args.output or base_dir
+        changed = write_array_config(config, output_dir)
+        output_params = os.path.join(output_dir, 'parameters.txt')
+        if not os.path.exists(output_params) or not filecmp.cmp(param_file, output_params, shallow=False):
+            shutil.copyfile(param_file, output_params)
+            changed.append('parameters.txt')
+        if not changed:
+            # Only a real change rewrites the layer's files, scan chain included.
+            print(f"{folder_name}: up to date")
+            continue
+        print(f"{folder_name}: wrote {', '.join(changed)}")
+        build_scan_chain(output_dir, folder_name)
+
+    if failed:
+        sys.exit(1)
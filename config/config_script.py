@@ -1,8 +1,29 @@
+import argparse
+import hashlib
 import os
 
+import numpy as np
+
+# Scan-chain builder. The chain is the mapping parameters followed by the
+# seven PE-array matrices, every value MSB first:
+#
+#   parameters          PARAM_WIDTHS, in that order
+#   enables             12x14 bits
+#   ipsum_ln_selectors  12x14 bits
+#   opsum_ln_selectors  12x14 bits
+#   ifmap_ids           12 x (4-bit row tag + 14 x 5-bit column tags)
+#   filters_ids         12 x (4-bit row tag + 14 x 4-bit column tags)
+#   ipsum_ids           12 x (4-bit row tag + 14 x 4-bit column tags)
+#   opsum_ids           12 x (4-bit row tag + 14 x 4-bit column tags)
+#
+# Every field is a slice of one bit array at an offset computed from these
+# widths (SCAN_CHAIN_LAYOUT), so a layer is validated and packed with a few
+# array operations. A layer is only rebuilt when the content hash of its
+# input files differs from the one stored with its outputs.
+
 # === Constants ===
 PARAM_WIDTHS = {
-    'H': 8, 'W': 8, 'R': 4, 'S': 4,'E': 6, 'F': 6, 'C': 10, 'M': 10, 'N': 3, 'U': 3, 
+    'H': 8, 'W': 8, 'R': 4, 'S': 4,'E': 6, 'F': 6, 'C': 10, 'M': 10, 'N': 3, 'U': 3,
     'm': 8, 'n': 3, 'e': 6, 'p': 5, 'q': 3, 'r': 2, 't': 3
 }
 
@@ -14,161 +35,204 @@ INDEX_FOLDER_MAP = {
     5: 'conv5'
 }
 
+NUM_OF_ROWS = 12
+NUM_OF_COLS = 14
+
+# Matrix name -> (file name, row tag width or 0, column value width), in scan-chain order.
+MATRIX_SPECS = {
+    'enables': ('enables.txt', 0, 1),
+    'ipsum_ln_selectors': ('ipsum_ln_selectors.txt', 0, 1),
+    'opsum_ln_selectors': ('opsum_ln_selectors.txt', 0, 1),
+    'ifmap_ids': ('ifmap_ids.txt', 4, 5),
+    'filters_ids': ('filters_ids.txt', 4, 4),
+    'ipsum_ids': ('ipsum_ids.txt', 4, 4),
+    'opsum_ids': ('opsum_ids.txt', 4, 4),
+}
+MATRIX_FILES = {name: spec[0] for name, spec in MATRIX_SPECS.items()}
+
+# Part of every input hash; bump it when the chain format changes.
+BUILDER_VERSION = 1
+HASH_FILE = '.scan_chain_hash'
+HEX_WORD_BITS = 64
+
+# === Scan Chain Layout ===
+def matrix_widths(name):
+    """Returns the (rows, cols) bit width of every value of a matrix."""
+    _, row_tag_width, col_width = MATRIX_SPECS[name]
+    row = ([row_tag_width] if row_tag_width else []) + [col_width] * NUM_OF_COLS
+    return np.tile(np.array(row, dtype=np.int64), (NUM_OF_ROWS, 1))
+
+def scan_chain_layout():
+    """Returns {field: (offset, bits)} for every parameter and matrix, in scan order."""
+    layout = {}
+    offset = 0
+    for key, width in PARAM_WIDTHS.items():
+        layout[key] = (offset, width)
+        offset += width
+    for name in MATRIX_SPECS:
+        bits = int(matrix_widths(name).sum())
+        layout[name] = (offset, bits)
+        offset += bits
+    return layout
+
+SCAN_CHAIN_LAYOUT = scan_chain_layout()
+SCAN_CHAIN_BITS = sum(bits for _, bits in SCAN_CHAIN_LAYOUT.values())
+# Width of every value of the chain, in scan order.
+SCAN_CHAIN_WIDTHS = np.concatenate([np.array(list(PARAM_WIDTHS.values()), dtype=np.int64)]
+                                   + [matrix_widths(name).ravel() for name in MATRIX_SPECS])
+
 # === Utility Functions ===
 def read_file_lines(file_path):
     with open(file_path, 'r') as f:
         return [line.strip() for line in f.readlines() if line.strip()]
 
-def parse_parameters(lines):
-    binary_str = ''
-    for line in lines:
+def read_parameters_vector(file_path, layer_info):
+    """Reads parameters.txt into a vector in PARAM_WIDTHS order and checks that every value fits its field."""
+    params = {}
+    for line in read_file_lines(file_path):
         if '=' in line:
             key, val = line.split('=')
-            key = key.strip()
-            val = int(val.strip())
-            width = PARAM_WIDTHS[key]
-            binary_str += format(val, f'0{width}b')
-    return binary_str
-
-
-def parse_matrix_to_bits(file_path):
-    lines = read_file_lines(file_path)
-    bits = ''
-    for line in lines:
-        nums = list(map(int, line.split()))
-        bits += ''.join(str(n) for n in nums)
-    return lines, bits
-
-def parse_ifmap_ids(file_path):
-    lines = read_file_lines(file_path)
-    bits = ''
-    for line in lines:
-        nums = list(map(int, line.split()))
-        if nums:
-            bits += format(nums[0], '04b')
-            for num in nums[1:]:
-                bits += format(num, '05b')
-    return lines, bits
-
-def parse_column_ids(file_path):
-    lines = read_file_lines(file_path)
-    bits = ''
-    for line in lines:
-        nums = list(map(int, line.split()))
-        for num in nums:
-            bits += format(num, '04b')
-    return lines, bits
+            params[key.strip()] = val.strip()
+    missing = [key for key in PARAM_WIDTHS if key not in params]
+    if missing:
+        raise ValueError(f"{layer_info} parameters.txt is missing keys: {', '.join(missing)}")
+    unknown = [key for key in params if key not in PARAM_WIDTHS]
+    if unknown:
+        raise ValueError(f"{layer_info} parameters.txt has unknown keys: {', '.join(unknown)}")
+    try:
+        values = np.array([int(params[key]) for key in PARAM_WIDTHS], dtype=np.int64)
+    except ValueError:
+        raise ValueError(f"{layer_info} parameters.txt has non-integer values")
+    widths = np.array(list(PARAM_WIDTHS.values()), dtype=np.int64)
+    bad = np.flatnonzero((values < 0) | (values >= (1 << widths)))
+    if bad.size:
+        key = list(PARAM_WIDTHS)[bad[0]]
+        raise ValueError(f"{layer_info} parameter {key} = {values[bad[0]]} does not fit {PARAM_WIDTHS[key]} bits")
+    return values
+
+def read_matrix(file_path, name, layer_info):
+    """Reads one matrix file and checks its shape and that every value fits its width."""
+    widths = matrix_widths(name)
+    rows = [line.split() for line in read_file_lines(file_path)]
+    if len(rows) != widths.shape[0]:
+        raise ValueError(f"{layer_info} {name} must have {widths.shape[0]} rows")
+    for i, row in enumerate(rows):
+        if len(row) != widths.shape[1]:
+            raise ValueError(f"{layer_info} {name} row {i} must have {widths.shape[1]} elements")
+    try:
+        matrix = np.array(rows).astype(np.int64)
+    except ValueError:
+        raise ValueError(f"{layer_info} {name} has non-integer values")
+    bad = np.argwhere((matrix < 0) | (matrix >= (1 << widths)))
+    if bad.size:
+        i, j = bad[0]
+        raise ValueError(f"{layer_info} {name} row {i} element {j} out of range")
+    return matrix
+
+def pack_bits(values, widths):
+    """Returns the bits of every value at its width, MSB first, concatenated into one uint8 array."""
+    max_width = int(widths.max())
+    shifts = np.arange(max_width - 1, -1, -1)
+    bits = (values[:, None] >> shifts) & 1
+    keep = shifts < widths[:, None]
+    return bits[keep].astype(np.uint8)
+
+def input_hash(file_paths):
+    """Content hash of the input files, the chain layout and the builder version."""
+    h = hashlib.sha256(f"{BUILDER_VERSION}:{sorted(SCAN_CHAIN_LAYOUT.items())}".encode())
+    for file_path in file_paths:
+        h.update(os.path.basename(file_path).encode())
+        with open(file_path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+# === Output Files ===
+def write_bit_lines(file_path, bits):
+    """Writes one bit per line."""
+    buf = np.empty(2 * bits.size, dtype=np.uint8)
+    buf[0::2] = bits + ord('0')
+    buf[1::2] = ord('\n')
+    with open(file_path, 'wb') as f:
+        f.write(buf.tobytes())
+
+def write_hex(file_path, bits):
+    """Writes the chain as 64-bit hex words for $readmemh, zero-padded at the end."""
+    padded = np.zeros(-(-bits.size // HEX_WORD_BITS) * HEX_WORD_BITS, dtype=np.uint8)
+    padded[:bits.size] = bits
+    digits = np.packbits(padded).tobytes().hex()
+    words = [digits[i:i + HEX_WORD_BITS // 4] for i in range(0, len(digits), HEX_WORD_BITS // 4)]
+    with open(file_path, 'w') as f:
+        f.write(f"// {bits.size} scan-chain bits in scan_chain.txt order, zero-padded to {HEX_WORD_BITS}-bit words\n")
+        f.write('\n'.join(words) + '\n')
+
+# === Scan Chain Build ===
+def build_scan_chain(base_dir, folder_name, hex_output=False, force=False):
+    """
+    Validates and packs the inputs of one layer folder and writes scan_chain.txt,
+    serial_data.txt and, with `hex_output`, scan_chain.hex.
+
+    Returns False if an input is missing or invalid. Layers whose input hash
+    matches the stored one and whose outputs exist are skipped unless `force`.
+    """
+    param_file = os.path.join(base_dir, 'parameters.txt')
+    matrix_files = {name: os.path.join(base_dir, file_name) for name, file_name in MATRIX_FILES.items()}
+    scan_chain_path = os.path.join(base_dir, 'scan_chain.txt')
+    serial_data_path = os.path.join(base_dir, 'serial_data.txt')
+    hex_path = os.path.join(base_dir, 'scan_chain.hex')
+    hash_path = os.path.join(base_dir, HASH_FILE)
+
+    # Ensure files exist
+    required_files = [param_file] + list(matrix_files.values())
+    for f in required_files:
+        if not os.path.exists(f):
+            print(f"Skipping {folder_name}: Missing file {os.path.basename(f)}")
+            return False
+
+    digest = input_hash(required_files)
+    outputs = [scan_chain_path, serial_data_path] + ([hex_path] if hex_output else [])
+    if not force and all(os.path.exists(f) for f in outputs) and os.path.exists(hash_path):
+        with open(hash_path, 'r') as f:
+            if f.read().strip() == digest:
+                print(f"Up to date: {folder_name} (inputs unchanged)")
+                return True
+
+    # === Validation ===
+    layer_info = f"(Layer: {folder_name})"
+    try:
+        values = [read_parameters_vector(param_file, layer_info)]
+        values += [read_matrix(matrix_files[name], name, layer_info).ravel() for name in MATRIX_SPECS]
+    except ValueError as e:
+        print(f"Validation failed for {folder_name}: {e}")
+        return False
+
+    # === Output files
+    full_chain = pack_bits(np.concatenate(values), SCAN_CHAIN_WIDTHS)
+    write_bit_lines(scan_chain_path, full_chain)
+    # The shift-in order is the reverse of the chain; the first bit is sent twice.
+    reversed_chain = full_chain[::-1]
+    write_bit_lines(serial_data_path, np.concatenate((reversed_chain[:1], reversed_chain)))
+    if hex_output:
+        write_hex(hex_path, full_chain)
+    elif os.path.exists(hex_path):
+        os.remove(hex_path)
+    with open(hash_path, 'w') as f:
+        f.write(digest + '\n')
+
+    generated = 'scan_chain.txt, serial_data.txt and scan_chain.hex' if hex_output else 'scan_chain.txt and serial_data.txt'
+    print(f"Successfully generated {generated} in {folder_name}")
+    return True
 
 # === Main Entry ===
 if __name__ == '__main__':
-    base_root = os.path.dirname(__file__)
-
-    for user_index, folder_name in INDEX_FOLDER_MAP.items():
+    base_root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Build the configuration scan chain of conv layers.")
+    parser.add_argument('layers', nargs='*', default=list(INDEX_FOLDER_MAP.values()),
+                        help="layer folders to build (default: all)")
+    parser.add_argument('--hex', action='store_true', help="also write scan_chain.hex")
+    parser.add_argument('--force', action='store_true', help="rebuild layers whose inputs are unchanged")
+    args = parser.parse_args()
+
+    for user_index, folder_name in enumerate(args.layers, start=1):
         print(f"\nProcessing layer {user_index}: {folder_name}")
         base_dir = os.path.join(base_root, folder_name)
-
-        # File paths
-        param_file = os.path.join(base_dir, 'parameters.txt')
-        enable_file = os.path.join(base_dir, 'enables.txt')
-        ipsum_ln_select_file = os.path.join(base_dir, 'ipsum_ln_selectors.txt')
-        opsum_ln_select_file = os.path.join(base_dir, 'opsum_ln_selectors.txt')
-        ifmap_file = os.path.join(base_dir, 'ifmap_ids.txt')
-        filter_file = os.path.join(base_dir, 'filters_ids.txt')
-        ipsum_file = os.path.join(base_dir, 'ipsum_ids.txt')
-        opsum_file = os.path.join(base_dir, 'opsum_ids.txt')
-
-        # Ensure files exist
-        required_files = [param_file, enable_file, ipsum_ln_select_file, opsum_ln_select_file, ifmap_file, filter_file, ipsum_file, opsum_file]
-        for f in required_files:
-            if not os.path.exists(f):
-                print(f"Skipping {folder_name}: Missing file {os.path.basename(f)}")
-                break
-        else:
-            # Read and parse
-            param_lines = read_file_lines(param_file)
-            enable_lines, enables = parse_matrix_to_bits(enable_file)
-            ipsum_ln_select_lines, ipsum_ln_selectors = parse_matrix_to_bits(ipsum_ln_select_file)
-            opsum_ln_select_lines, opsum_ln_selectors = parse_matrix_to_bits(opsum_ln_select_file)
-            ifmap_lines, ifmap_ids = parse_ifmap_ids(ifmap_file)
-            filter_lines, filters_ids = parse_column_ids(filter_file)
-            ipsum_lines, ipsum_ids = parse_column_ids(ipsum_file)
-            opsum_lines, opsum_ids = parse_column_ids(opsum_file)
-            parameters = parse_parameters(param_lines)
-
-            # === Validation ===
-            layer_info = f"(Layer: {folder_name})"
-            try:
-                assert len(enable_lines) == 12, f"{layer_info} enable_lines must have 12 rows"
-                for i, line in enumerate(enable_lines):
-                    bits = line.split()
-                    assert len(bits) == 14, f"{layer_info} enable_lines row {i} must have 14 elements"
-                    assert all(b in {'0', '1'} for b in bits), f"{layer_info} enable_lines row {i} has invalid bits"
-
-                assert len(filter_lines) == 12, f"{layer_info} filter_lines must have 12 rows"
-                for i, line in enumerate(filter_lines):
-                    nums = list(map(int, line.split()))
-                    assert len(nums) == 15, f"{layer_info} filter_lines row {i} must have 15 elements"
-                    assert all(0 <= n <= 15 for n in nums), f"{layer_info} filter_lines row {i} out of range"
-
-                assert len(ipsum_lines) == 12, f"{layer_info} ipsum_lines must have 12 rows"
-                for i, line in enumerate(ipsum_lines):
-                    nums = list(map(int, line.split()))
-                    assert len(nums) == 15, f"{layer_info} ipsum_lines row {i} must have 15 elements"
-                    assert all(0 <= n <= 15 for n in nums), f"{layer_info} ipsum_lines row {i} out of range"
-
-                assert len(opsum_lines) == 12, f"{layer_info} opsum_lines must have 12 rows"
-                for i, line in enumerate(opsum_lines):
-                    nums = list(map(int, line.split()))
-                    assert len(nums) == 15, f"{layer_info} opsum_lines row {i} must have 15 elements"
-                    assert all(0 <= n <= 15 for n in nums), f"{layer_info} opsum_lines row {i} out of range"
-
-                assert len(ifmap_lines) == 12, f"{layer_info} ifmap_lines must have 12 rows"
-                for i, line in enumerate(ifmap_lines):
-                    nums = list(map(int, line.split()))
-                    assert len(nums) == 15, f"{layer_info} ifmap_lines row {i} must have 15 elements"
-                    assert 0 <= nums[0] <= 15, f"{layer_info} ifmap_lines row {i} first element out of range"
-                    assert all(0 <= n <= 31 for n in nums[1:]), f"{layer_info} ifmap_lines row {i} rest out of range"
-
-                assert len(ipsum_ln_select_lines) == 12, f"{layer_info} ln_select_lines must have 12 rows"
-                for i, line in enumerate(ipsum_ln_select_lines):
-                    bits = line.split()
-                    assert len(bits) == 14, f"{layer_info} ln_select_lines row {i} must have 14 elements"
-                    assert all(b in {'0', '1'} for b in bits), f"{layer_info} ln_select_lines row {i} has invalid bits"
-
-                assert len(opsum_ln_select_lines) == 12, f"{layer_info} ln_select_lines must have 12 rows"
-                for i, line in enumerate(opsum_ln_select_lines):
-                    bits = line.split()
-                    assert len(bits) == 14, f"{layer_info} ln_select_lines row {i} must have 14 elements"
-                    assert all(b in {'0', '1'} for b in bits), f"{layer_info} ln_select_lines row {i} has invalid bits"
-
-                expected_keys = {'H', 'W', 'R', 'S', 'E', 'F', 'C', 'M', 'N', 'U', 'm', 'n', 'e', 'p', 'q', 'r', 't'}
-                found_keys = set()
-                for line in param_lines:
-                    if '=' in line:
-                        key = line.split('=')[0].strip()
-                        
-                        found_keys.add(key)
-                missing_keys = expected_keys - found_keys
-                assert not missing_keys, f"{layer_info} parameters.txt is missing keys: {', '.join(missing_keys)}"
-            except AssertionError as e:
-                print(f"Validation failed for {folder_name}: {e}")
-                continue
-
-            # === Output files
-            full_chain = parameters + enables + ipsum_ln_selectors + opsum_ln_selectors + ifmap_ids + filters_ids + ipsum_ids + opsum_ids
-
-            scan_chain_path = os.path.join(base_dir, 'scan_chain.txt')
-            serial_data_path = os.path.join(base_dir, 'serial_data.txt')
-
-            with open(scan_chain_path, 'w') as f:
-                for bit in full_chain:
-                    f.write(f'{bit}\n')
-
-            with open(serial_data_path, 'w') as f:
-                reversed_chain = list(reversed(full_chain))
-                if reversed_chain:
-                    f.write(f'{reversed_chain[0]}\n')
-                    for bit in reversed_chain:
-                        f.write(f'{bit}\n')
-
-            print(f"Successfully generated scan_chain.txt and serial_data.txt in {folder_name}")
+        build_scan_chain(base_dir, folder_name, args.hex, args.force)
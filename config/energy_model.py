@@ -0,0 +1,184 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+
+from config_script import INDEX_FOLDER_MAP
+from perf_model import read_parameters, read_shared_pkg, scheduler_loops
+
+# Per-layer energy and data-movement estimator.
+#
+# Accesses are counted at every storage level for the pass and dump structure
+# of src/scheduler.sv (see perf_model.py) and multiplied by a per-access
+# energy table:
+#
+#   spads   ifmap/filter/psum scratch pads of every active PE (pe.v)
+#   NoC     GIN (ifmap, filter, ipsum), GON (opsum) and the local psum links
+#           between PEs of a column
+#   GLBs    ifmap, filter, psum and bias global buffers
+#   DRAM    tiles loaded into the GLBs and ofmap blocks written back
+#
+# The GLBs hold one pass worth of ifmap and filters and one dump worth of
+# psums (their depths in sim/shared_pkg.sv are sized that way), so a tile is
+# reloaded from DRAM whenever the scheduler moves to a different one.
+#
+# The default table is the normalized Eyeriss cost model (one MAC = 1):
+# spad 1, array NoC 2, GLB 6, DRAM 200 per 16-bit value.
+
+# === Constants ===
+DEFAULT_ENERGY = {
+    'mac': 1.0,
+    'ifmap_spad': 1.0, 'filter_spad': 1.0, 'psum_spad': 1.0,
+    'gin': 2.0, 'gon': 2.0, 'local_psum': 2.0,
+    'ifmap_glb': 6.0, 'filter_glb': 6.0, 'psum_glb': 6.0, 'bias_glb': 6.0,
+    'dram': 200.0,
+}
+
+LEVELS = {
+    'compute': ['mac'],
+    'spad': ['ifmap_spad', 'filter_spad', 'psum_spad'],
+    'noc': ['gin', 'gon', 'local_psum'],
+    'glb': ['ifmap_glb', 'filter_glb', 'psum_glb', 'bias_glb'],
+    'dram': ['dram'],
+}
+
+# === Energy Table ===
+def load_energy_table(file_path=None):
+    """Returns the default energy table, overridden by a JSON file of {component: energy}."""
+    table = dict(DEFAULT_ENERGY)
+    if file_path:
+        with open(file_path, 'r') as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(table)
+        if unknown:
+            raise ValueError(f"Unknown energy table keys: {', '.join(sorted(unknown))}")
+        table.update({key: float(val) for key, val in overrides.items()})
+    return table
+
+# === Access Counts ===
+def check_spads(params, hw):
+    """Raises ValueError if one PE's working set does not fit its scratch pads."""
+    S, p, q = params['S'], params['p'], params['q']
+    for name, need, depth in (('ifmap', q * S, hw['IFMAP_SPAD_DEPTH']),
+                              ('filter', p * q * S, hw['FILTER_SPAD_DEPTH']),
+                              ('psum', p, hw['PSUM_SPAD_DEPTH'])):
+        if need > depth:
+            raise ValueError(f"{name} spad needs {need} entries, depth is {depth}")
+
+def count_accesses(params, hw):
+    """
+    Counts the 16-bit accesses of one layer at every level.
+
+    Returns {component: count} with the same keys as the energy table.
+    """
+    check_spads(params, hw)
+    R, S, F, W, U = params['R'], params['S'], params['F'], params['W'], params['U']
+    M, C = params['M'], params['C']
+    m, n, e, p, q, r, t = (params[k] for k in 'mnepqrt')
+    passes_per_dump, dumps = scheduler_loops(params)
+    passes = passes_per_dump * dumps
+    # Passes of every dump that start from the bias instead of stored psums.
+    bias_passes = dumps * (m // (p * t))
+
+    D = e * U + R - U
+    pes = R * r * e * t
+    macs = n * F * S * q * p * pes
+    ifmap_values = n * W * q * r * D
+    filter_values = p * t * q * r * R * S
+    psum_values = n * p * t * e * F
+
+    # DRAM tiles: filters change with every pass unless one pass covers all of
+    # m and C; the ifmap band changes with the C step unless one pass covers C.
+    if passes_per_dump == 1 and M == m:
+        dram_filters = M * C * R * S
+    else:
+        dram_filters = dumps * m * C * R * S
+    if C == q * r and M > m:
+        dram_ifmap = (dumps // (M // m)) * n * C * D * W
+    else:
+        dram_ifmap = dumps * n * C * D * W
+    dram_bias = dumps * m
+    ofmap_block = n * m * e * F
+
+    return {
+        'mac': passes * macs,
+        'ifmap_spad': passes * (macs + n * W * q * pes),
+        'filter_spad': passes * (macs + p * q * S * pes),
+        'psum_spad': passes * (2 * macs + n * F * p * pes),
+        'gin': passes * (ifmap_values + filter_values + psum_values),
+        'gon': passes * psum_values,
+        'local_psum': passes * n * F * p * e * t * (R * r - 1),
+        'ifmap_glb': passes * ifmap_values + dram_ifmap,
+        'filter_glb': passes * filter_values + dram_filters,
+        'psum_glb': (passes - bias_passes) * psum_values + passes * psum_values + dumps * ofmap_block,
+        'bias_glb': bias_passes * psum_values + dram_bias,
+        'dram': dram_ifmap + dram_filters + dram_bias + dumps * ofmap_block,
+    }
+
+def estimate_energy(params, hw, table):
+    """Returns the access counts, the energy per component and level, and the totals per layer and image."""
+    counts = count_accesses(params, hw)
+    energy = {key: counts[key] * table[key] for key in counts}
+    by_level = {level: sum(energy[key] for key in keys) for level, keys in LEVELS.items()}
+    total = sum(energy.values())
+    return {
+        'counts': counts,
+        'energy': energy,
+        'levels': by_level,
+        'total': total,
+        'images': params['N'],
+        'per_image': total / params['N'],
+        'energy_per_mac': total / counts['mac'],
+    }
+
+# === Reports ===
+def format_json(results):
+    return json.dumps(results, indent=2)
+
+def format_csv(results):
+    """One row per layer and level/component, with per-layer and per-image energy."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(['layer', 'level', 'component', 'accesses', 'energy', 'energy_per_image'])
+    for layer, res in results.items():
+        for level, keys in LEVELS.items():
+            for key in keys:
+                writer.writerow([layer, level, key, res['counts'][key],
+                                 res['energy'][key], res['energy'][key] / res['images']])
+        writer.writerow([layer, 'total', '', '', res['total'], res['per_image']])
+    return buf.getvalue()
+
+# === Main Entry ===
+if __name__ == '__main__':
+    base_root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Estimate per-layer energy and data movement of the conv mappings.")
+    parser.add_argument('layers', nargs='*', default=list(INDEX_FOLDER_MAP.values()),
+                        help="layer folders to estimate (default: all)")
+    parser.add_argument('--energy', help="JSON file overriding the per-access energy table")
+    parser.add_argument('--format', choices=['json', 'csv'], default='json')
+    parser.add_argument('--output', help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    hw = read_shared_pkg()
+    try:
+        table = load_energy_table(args.energy)
+    except (OSError, ValueError) as e:
+        print(f"Invalid energy table: {e}", file=sys.stderr)
+        sys.exit(1)
+    results = {}
+    for folder_name in args.layers:
+        param_file = os.path.join(base_root, folder_name, 'parameters.txt')
+        try:
+            results[folder_name] = estimate_energy(read_parameters(param_file), hw, table)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {folder_name}: {e}", file=sys.stderr)
+
+    report = format_json(results) if args.format == 'json' else format_csv(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+        print(f"Energy report written to {args.output}")
+    else:
+        print(report)
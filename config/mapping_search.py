@@ -0,0 +1,210 @@
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from array_config import build_array_config, write_array_config
+from config_script import INDEX_FOLDER_MAP, PARAM_WIDTHS, build_scan_chain
+from energy_model import check_spads, count_accesses, estimate_energy, load_energy_table
+from perf_model import PARAM_KEYS, estimate_layer, read_parameters, read_shared_pkg, scheduler_loops
+
+# Mapping-space search over (m, n, e, p, q, r, t) for one layer shape.
+#
+# Every candidate is checked against what the hardware can actually run:
+#
+#   scheduler   every loop step divides its bound (scheduler.sv compares the
+#               counters for equality), e <= E
+#   array       the PE sets can be placed on the 12x14 array and tagged
+#               (see array_config.build_array_config)
+#   spads       pe.v scratch pad depths (see energy_model.check_spads)
+#   GLBs        one pass of ifmap and filters, one dump of psums and m biases
+#               fit the GLB depths of sim/shared_pkg.sv
+#   widths      every value fits its field of PARAM_WIDTHS
+#
+# Legal mappings are scored with perf_model (cycles) and energy_model (DRAM
+# traffic and energy) in a process pool, and the mappings no other mapping
+# beats on all three are reported as the Pareto front.
+
+# === Constants ===
+MAPPING_KEYS = ['m', 'n', 'e', 'p', 'q', 'r', 't']
+OBJECTIVES = ['cycles', 'dram', 'energy']
+
+# === Legality ===
+def check_mapping(params, hw):
+    """Raises ValueError with the first constraint a mapping breaks."""
+    for key, width in PARAM_WIDTHS.items():
+        if not 0 < params[key] < (1 << width):
+            raise ValueError(f"{key}={params[key]} does not fit its {width}-bit field")
+    scheduler_loops(params)
+    if params['e'] > params['E']:
+        raise ValueError(f"e={params['e']} is larger than E={params['E']}")
+    build_array_config(params, hw)
+
+    check_spads(params, hw)
+    R, S, W, F, U = params['R'], params['S'], params['W'], params['F'], params['U']
+    m, n, e, p, q, r, t = (params[k] for k in MAPPING_KEYS)
+    D = e * U + R - U
+    for name, need, depth in (('ifmap', n * W * q * r * D, hw['IFMAP_GLB_DEPTH']),
+                              ('filter', p * t * q * r * R * S, hw['FILTER_GLB_DEPTH']),
+                              ('psum', n * m * e * F, hw['PSUM_GLB_DEPTH']),
+                              ('bias', m, hw['BIAS_GLB_DEPTH'])):
+        if need > depth:
+            raise ValueError(f"{name} GLB needs {need} entries, depth is {depth}")
+
+# === Enumeration ===
+def divisors(value, limit):
+    return [d for d in range(1, min(value, limit) + 1) if value % d == 0]
+
+def enumerate_mappings(shape, hw):
+    """
+    Yields every legal mapping of a layer shape as a full parameter dict.
+
+    The loops only visit values the cheap per-parameter bounds allow (widths,
+    scheduler divisibility, spads, bias GLB); `check_mapping` does the rest.
+    """
+    R, S, E, C, M, N = (shape[k] for k in 'RSECMN')
+    width_max = {key: (1 << PARAM_WIDTHS[key]) - 1 for key in MAPPING_KEYS}
+    for q in range(1, min(width_max['q'], hw['IFMAP_SPAD_DEPTH'] // S) + 1):
+        for r in range(1, width_max['r'] + 1):
+            if C % (q * r):
+                continue
+            for p in range(1, min(width_max['p'], hw['PSUM_SPAD_DEPTH'], hw['FILTER_SPAD_DEPTH'] // (q * S)) + 1):
+                for t in range(1, width_max['t'] + 1):
+                    for m in divisors(M, min(width_max['m'], hw['BIAS_GLB_DEPTH'])):
+                        if m % (p * t):
+                            continue
+                        for n in divisors(N, width_max['n']):
+                            for e in range(1, min(width_max['e'], E) + 1):
+                                params = dict(shape, m=m, n=n, e=e, p=p, q=q, r=r, t=t)
+                                try:
+                                    check_mapping(params, hw)
+                                except ValueError:
+                                    continue
+                                yield params
+
+# === Evaluation ===
+def evaluate_mapping(params, hw, table):
+    """Scores one mapping; returns its parameters with cycles, DRAM traffic (bytes) and energy."""
+    perf = estimate_layer(params, hw)
+    dram_values = count_accesses(params, hw)['dram']
+    energy = estimate_energy(params, hw, table)
+    return {
+        **{key: params[key] for key in MAPPING_KEYS},
+        'cycles': perf['cycles'],
+        'time_us': perf['time_us'],
+        'dram': dram_values * 2,
+        'energy': energy['total'],
+        'pe_utilization': perf['pe_utilization'],
+        'mac_utilization': perf['mac_utilization'],
+    }
+
+def _evaluate_chunk(args):
+    chunk, hw, table = args
+    return [evaluate_mapping(params, hw, table) for params in chunk]
+
+def evaluate_mappings(mappings, hw, table, workers=None, chunk_size=256):
+    """Scores mappings in a process pool of `workers` (default: all cores); returns the results in order."""
+    chunks = [mappings[i:i + chunk_size] for i in range(0, len(mappings), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return [res for chunk in chunks for res in _evaluate_chunk((chunk, hw, table))]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_evaluate_chunk, [(chunk, hw, table) for chunk in chunks])
+        return [res for chunk in results for res in chunk]
+
+def pareto_front(results, objectives=OBJECTIVES):
+    """Returns the results no other result matches or beats on every objective, sorted by the first one."""
+    ordered = sorted(results, key=lambda res: [res[obj] for obj in objectives])
+    front = []
+    for res in ordered:
+        # Anything that dominates `res` sorts before it, so only the front so far needs checking.
+        if not any(all(best[obj] <= res[obj] for obj in objectives) for best in front):
+            front.append(res)
+    return front
+
+# === Output Files ===
+def format_parameters(params):
+    return '\n'.join(f"{key} = {params[key]}" for key in PARAM_KEYS)
+
+def format_localparams(params, layer_name):
+    """The shared_pkg.sv localparam block of a layer mapping."""
+    prefix = layer_name.upper()
+    lines = [f"    // {prefix} Mapping Parameters"]
+    for key in PARAM_KEYS:
+        lines.append(f"    localparam {prefix}_{key} = {params[key]};")
+        if key in ('F', 'U'):
+            lines.append("")
+    return '\n'.join(lines)
+
+def write_results(output_dir, layer_name, shape, front, best, hw):
+    """
+    Writes the Pareto front (pareto.csv) and the files of the best mapping:
+    parameters.txt, its shared_pkg.sv block, the array matrices and the scan chain.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'pareto.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(front[0]))
+        writer.writeheader()
+        writer.writerows(front)
+    params = dict(shape, **{key: best[key] for key in MAPPING_KEYS})
+    with open(os.path.join(output_dir, 'parameters.txt'), 'w') as f:
+        f.write(format_parameters(params))
+    with open(os.path.join(output_dir, 'shared_pkg_params.sv'), 'w') as f:
+        f.write(format_localparams(params, layer_name) + '\n')
+    write_array_config(build_array_config(params, hw), output_dir)
+    build_scan_chain(output_dir, layer_name)
+
+# === Main Entry ===
+if __name__ == '__main__':
+    base_root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Search the legal (m, n, e, p, q, r, t) mappings of conv layers.")
+    parser.add_argument('layers', nargs='*', default=list(INDEX_FOLDER_MAP.values()),
+                        help="layer folders whose shape is searched (default: all)")
+    parser.add_argument('--objective', choices=OBJECTIVES, default='cycles',
+                        help="objective that picks the best mapping of the front")
+    parser.add_argument('--energy', help="JSON file overriding the per-access energy table")
+    parser.add_argument('--workers', type=int, help="evaluation processes (default: all cores)")
+    parser.add_argument('--output', default=os.path.join(base_root, 'search'),
+                        help="folder for the per-layer results")
+    args = parser.parse_args()
+
+    hw = read_shared_pkg()
+    try:
+        table = load_energy_table(args.energy)
+    except (OSError, ValueError) as e:
+        print(f"Invalid energy table: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for folder_name in args.layers:
+        try:
+            current = read_parameters(os.path.join(base_root, folder_name, 'parameters.txt'))
+        except (OSError, ValueError) as e:
+            print(f"Skipping {folder_name}: {e}")
+            continue
+        shape = {key: current[key] for key in PARAM_KEYS if key not in MAPPING_KEYS}
+        mappings = list(enumerate_mappings(shape, hw))
+        if not mappings:
+            print(f"Skipping {folder_name}: no legal mapping")
+            continue
+        results = evaluate_mappings(mappings, hw, table, args.workers)
+        front = pareto_front(results)
+        best = min(front, key=lambda res: [res[obj] for obj in [args.objective] + OBJECTIVES])
+
+        print(f"\n{folder_name}: {len(mappings)} legal mappings, {len(front)} on the Pareto front")
+        header = f"{'m':>3} {'n':>2} {'e':>3} {'p':>3} {'q':>2} {'r':>2} {'t':>2} {'cycles':>12} {'DRAM (B)':>12} {'energy':>14} {'MAC util':>8}"
+        print(header)
+        print('-' * len(header))
+        for res in front:
+            mark = '  <- best' if res is best else ''
+            print(f"{res['m']:>3} {res['n']:>2} {res['e']:>3} {res['p']:>3} {res['q']:>2} {res['r']:>2} {res['t']:>2} "
+                  f"{res['cycles']:>12} {res['dram']:>12} {res['energy']:>14.4g} {res['mac_utilization']:>8.1%}{mark}")
+        try:
+            check_mapping(current, hw)
+            cur = evaluate_mapping(current, hw, table)
+            print(f"current mapping: {cur['cycles']} cycles, {cur['dram']} B DRAM, {cur['energy']:.4g} energy")
+        except ValueError as e:
+            print(f"current mapping is not legal: {e}")
+
+        output_dir = os.path.join(args.output, folder_name)
+        write_results(output_dir, folder_name, shape, front, best, hw)
+        print(f"Results written to {output_dir}")
@@ -0,0 +1,192 @@
+import os
+import re
+import sys
+
+from config_script import INDEX_FOLDER_MAP, read_file_lines
+
+# Analytical cycle model of the row-stationary PE array.
+#
+# The layer loop is replayed exactly as src/scheduler.sv runs it: an outer
+# loop over M (step m), E (step e) and N (step n) with one ofmap dump each,
+# around an inner loop over m (step p*t) and C (step q*r) with one pass each.
+# A pass is costed from the PE controller (pe_controller.sv) and the NoC
+# controllers, which move one 16-bit value per core cycle on every GLB port:
+#
+#   - filters are delivered first (p*t * q*r * R*S values); the array cannot
+#     run ahead of the last PE set that is still waiting for its filters;
+#   - then every output column costs the slowest of the PE work
+#     (S*q*p MACs, p accumulations, U*q shifts), the new ifmap columns
+#     (U * D * q*r values) and the psums of the column (p*t * e values);
+#   - each image ends with the PE padding cycles (opsums are padded to whole
+#     64-bit words) and the spad reload.
+#
+# Dumps move the n*m*e*F ofmap block to DRAM over the 64-bit link.
+
+# === Constants ===
+SHARED_PKG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sim', 'shared_pkg.sv')
+
+PARAM_KEYS = ['H', 'W', 'R', 'S', 'E', 'F', 'C', 'M', 'N', 'U', 'm', 'n', 'e', 'p', 'q', 'r', 't']
+
+# Scheduler states around every pass: CHECK, START_PASS, PASS_DONE, INNER_LOOP.
+PASS_OVERHEAD_CYCLES = 4
+# Scheduler states around every dump: DUMPING entry and OUTER_LOOP.
+DUMP_OVERHEAD_CYCLES = 2
+# Values of 16 bits per 64-bit FIFO/GLB word.
+VALUES_PER_WORD = 4
+
+# === Utility Functions ===
+def read_parameters(file_path):
+    """Reads a parameters.txt file into a {name: int} dict."""
+    params = {}
+    for line in read_file_lines(file_path):
+        if '=' in line:
+            key, val = line.split('=')
+            params[key.strip()] = int(val.strip())
+    missing = [key for key in PARAM_KEYS if key not in params]
+    if missing:
+        raise ValueError(f"{file_path} is missing keys: {', '.join(missing)}")
+    return params
+
+def read_shared_pkg(file_path=SHARED_PKG_PATH):
+    """Reads the numeric `parameter NAME = value;` lines of sim/shared_pkg.sv."""
+    hw = {}
+    pattern = re.compile(r'^\s*parameter\s+(\w+)\s*=\s*([0-9.]+)\s*;')
+    for line in read_file_lines(file_path):
+        match = pattern.match(line)
+        if match:
+            value = match.group(2)
+            hw[match.group(1)] = float(value) if '.' in value else int(value)
+    return hw
+
+def scheduler_loops(params):
+    """
+    Replays the scheduler.sv counters; returns (passes per dump, dumps).
+
+    The RTL compares the counters for equality, so a step that does not divide
+    its bound never terminates; such mappings raise ValueError.
+    """
+    M, E, N, C = params['M'], params['E'], params['N'], params['C']
+    m, n, e, p, q, r, t = (params[k] for k in 'mnepqrt')
+    for name, bound, step in (('m', m, p * t), ('C', C, q * r), ('M', M, m), ('N', N, n)):
+        if step <= 0 or bound % step:
+            raise ValueError(f"scheduler loop over {name}={bound} never ends with step {step}")
+    if e <= 0:
+        raise ValueError("scheduler loop over E needs e > 0")
+
+    passes_per_dump = 0
+    m_crnt = C_crnt = 0
+    while True:
+        passes_per_dump += 1
+        if m_crnt + p * t == m:
+            m_crnt = 0
+            if C_crnt + q * r == C:
+                break
+            C_crnt += q * r
+        else:
+            m_crnt += p * t
+
+    dumps = 0
+    M_crnt = E_crnt = N_crnt = 0
+    while True:
+        dumps += 1
+        if M_crnt + m == M:
+            M_crnt = 0
+            if E_crnt + e >= E:
+                E_crnt = 0
+                if N_crnt + n == N:
+                    break
+                N_crnt += n
+            else:
+                E_crnt += e
+        else:
+            M_crnt += m
+    return passes_per_dump, dumps
+
+# === Pass and Dump Costs ===
+def pass_cycles(params):
+    """Returns the core cycles of one pass and the bounds they come from."""
+    R, S, F, W, U = params['R'], params['S'], params['F'], params['W'], params['U']
+    n, e, p, q, r, t = (params[k] for k in 'nepqrt')
+    D = e * U + R - U                      # ifmap rows per pass (noc_controller.sv)
+
+    filter_load = p * t * q * r * R * S
+    column = {
+        'pe': S * q * p + p + U * q,
+        'ifmap': U * D * q * r,
+        'psum': p * t * e,
+    }
+    bound = max(column, key=column.get)
+    ifmap_fill = max(0, S - U) * D * q * r  # first window columns before column 0
+    V = (p % 4) * (F % 4) % 4
+    image_tail = (4 - V) % 4 + 1 + 1       # PADDING words, PADDING exit, LOAD
+    per_image = ifmap_fill + F * column[bound] - U * q + image_tail
+    return {
+        'cycles': filter_load + n * per_image,
+        'filter_load': filter_load,
+        'column_cycles': column,
+        'bound': bound,
+        'ifmap_values': n * W * q * r * D,
+        'macs': n * p * t * q * r * R * S * e * F,
+    }
+
+def dump_cycles(params, hw):
+    """Returns the core cycles to write one n*m*e*F ofmap block to DRAM over the link."""
+    values = params['n'] * params['m'] * params['e'] * params['F']
+    words = -(-values // VALUES_PER_WORD)
+    link_ratio = hw['LINK_CLK_PERIOD'] / hw['CORE_CLK_PERIOD']
+    return int(round(words * link_ratio))
+
+# === Layer Estimate ===
+def estimate_layer(params, hw=None):
+    """
+    Estimates the cycles of one layer mapping.
+
+    Returns a dict with the loop counts, the per-pass / per-dump / per-layer
+    cycles, the runtime at the core clock and the PE and MAC utilization.
+    """
+    if hw is None:
+        hw = read_shared_pkg()
+    passes_per_dump, dumps = scheduler_loops(params)
+    one_pass = pass_cycles(params)
+    per_pass = one_pass['cycles'] + PASS_OVERHEAD_CYCLES
+    per_dump = dump_cycles(params, hw) + DUMP_OVERHEAD_CYCLES
+    total = dumps * (passes_per_dump * per_pass + per_dump)
+
+    num_pes = hw['NUM_OF_ROWS'] * hw['NUM_OF_COLS']
+    active_pes = params['R'] * params['r'] * params['e'] * params['t']
+    layer_macs = (params['N'] * params['M'] * params['C'] * params['E'] * params['F']
+                  * params['R'] * params['S'])
+    return {
+        'passes_per_dump': passes_per_dump,
+        'dumps': dumps,
+        'passes': passes_per_dump * dumps,
+        'cycles_per_pass': per_pass,
+        'cycles_per_dump': per_dump,
+        'cycles': total,
+        'time_us': total * hw['CORE_CLK_PERIOD'] / 1000.0,
+        'bound': one_pass['bound'],
+        'active_pes': active_pes,
+        'pe_utilization': active_pes / num_pes,
+        'mac_utilization': layer_macs / (total * num_pes),
+        'macs': layer_macs,
+    }
+
+# === Main Entry ===
+if __name__ == '__main__':
+    base_root = os.path.dirname(os.path.abspath(__file__))
+    hw = read_shared_pkg()
+    selected = sys.argv[1:] or list(INDEX_FOLDER_MAP.values())
+
+    header = f"{'layer':<6} {'passes':>7} {'dumps':>6} {'cyc/pass':>9} {'cyc/dump':>9} {'cycles':>12} {'time (us)':>10} {'bound':>6} {'PEs':>4} {'MAC util':>8}"
+    print(header)
+    print('-' * len(header))
+    for folder_name in selected:
+        param_file = os.path.join(base_root, folder_name, 'parameters.txt')
+        try:
+            est = estimate_layer(read_parameters(param_file), hw)
+        except (OSError, ValueError) as e:
+            print(f"{folder_name:<6} skipped: {e}")
+            continue
+        print(f"{folder_name:<6} {est['passes']:>7} {est['dumps']:>6} {est['cycles_per_pass']:>9} "
+              f"{est['cycles_per_dump']:>9} {est['cycles']:>12} {est['time_us']:>10.1f} {est['bound']:>6} "
+              f"{est['active_pes']:>4} {est['mac_utilization']:>8.1%}")
@@ -10,135 +10,40 @@ import sys
 import json
 import numpy as np
 from pathlib import Path
-from PIL import Image
 
-# --------------------------------------------------------------------
-# Universal Fixed-Point and I/O Helper Functions
-# --------------------------------------------------------------------
-
-def float_to_q313_int16(val: float) -> np.int16:
-    """Converts a float in [-8.0, 8.0) to a Q3.13 16-bit signed integer."""
-    max_val = (2**15 - 1) / (2**13)
-    min_val = -(2**15) / (2**13)
-    val = min(max(val, min_val), max_val)
-    scaled_val = int(round(val * (2**13)))
-    return np.int16(scaled_val)
-
-def bin16_to_int16(binstr: str) -> np.int16:
-    """Converts a 16-bit two's-complement binary string to int16."""
-    val = int(binstr, 2)
-    if val & 0x8000:
-        val -= 1 << 16
-    return np.int16(val)
-
-def int16_to_bin16(x: np.int16) -> str:
-    """Converts int16 to a 16-bit two's-complement binary string."""
-    return format(np.uint16(x).item(), "016b")
-
-def q313_int16_to_float(q_val: np.int16) -> float:
-    """Converts a Q3.13 signed 16-bit integer back to a float for visualization."""
-    return float(q_val) / (2**13)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from batch_runner import TOP5_NAME, run_batch, save_batch_results, save_top5, split_batches, top5_predictions
+from stage_cache import DEFAULT_CACHE_BYTES, StageCache, content_hash
+from layer_graph import ALEXNET_GRAPH, GraphExecutor, describe_plan
+from model_bundle import BUNDLE_NAME, load_alexnet_bundle
+from product_lut import load_product_lut
+from bin16_codec import read_bin16_file, write_bin16_file
+from tensor_file import TENSOR_SUFFIX, write_tensor
+from feature_render import render_feature_map
+from image_ingest import iter_images_q313
+from stage_archive import ARCHIVE_SUFFIX, StageArchiveWriter
+from stage_writer import (DEFAULT_WRITER_THREADS, DUMP_LEVELS, StageWriter,
+                          parse_dump_overrides, resolve_dump_levels)
 
 # --------------------------------------------------------------------
-# Core Neural Network Layer Implementations
+# Output Generation and Visualization
 # --------------------------------------------------------------------
 
-def fixed_mul_q313(a: np.ndarray, b: np.ndarray) -> np.ndarray:
-    """
-    Element-wise multiply two Q3.13 int16 arrays using custom bit-preserving truncation.
-    - New Sign Bit (bit 15):      Taken from product bit 31.
-    - New Integer Bits (bits 14-13):  Taken from product bits 27 and 26.
-    - New Fractional Bits (bits 12-0): Taken from product bits 25 down to 13.
+def save_stage_outputs(stage_name: str, data_array: np.ndarray, base_output_dir: Path, level: str = "full"):
     """
-    prod32 = a.astype(np.int32) * b.astype(np.int32)
-    prod32_unsigned = prod32.view(np.uint32)
-    value_mask = np.uint32(0x0FFFE000)
-    sign_mask = np.uint32(0x80000000)
-    value_part = (prod32_unsigned & value_mask) >> 13
-    sign_part = (prod32_unsigned & sign_mask) >> 16
-    final_result_unsigned = sign_part | value_part
-    return final_result_unsigned.astype(np.int16)
-
-def conv2d_q313(ifmap, weights, biases, stride):
-    """Performs a 2D convolution with custom fixed-point arithmetic and saturation."""
-    H, W, C = ifmap.shape
-    K, _, _, M = weights.shape
-    OH = (H - K) // stride + 1
-    OW = (W - K) // stride + 1
-    ofmap = np.zeros((OH, OW, M), dtype=np.int16)
-    INT16_MIN, INT16_MAX = -32768, 32767
-
-    for m in range(M):
-        w_m = weights[:, :, :, m]
-        b_m = biases[m]
-        for oh in range(OH):
-            for ow in range(OW):
-                base_h, base_w = oh * stride, ow * stride
-                window = ifmap[base_h:base_h+K, base_w:base_w+K, :]
-                mult = fixed_mul_q313(window, w_m)
-                acc32 = mult.astype(np.int32).sum() + int(b_m)
-                clamped_acc = np.clip(acc32, INT16_MIN, INT16_MAX)
-                ofmap[oh, ow, m] = np.int16(clamped_acc)
-    return ofmap
-
-def apply_padding(data_array: np.ndarray, pad: int) -> np.ndarray:
-    """Applies zero-padding to the height and width dimensions of a feature map."""
-    if pad == 0:
-        return data_array
-    return np.pad(data_array, ((pad, pad), (pad, pad), (0, 0)), 'constant', constant_values=0)
-
-def apply_relu(data: np.ndarray) -> np.ndarray:
-    """Applies the ReLU activation function."""
-    return np.maximum(data, np.int16(0))
-
-def max_pooling_3d(input_3d: np.ndarray, pool_size: int, stride: int) -> np.ndarray:
-    """Performs 3D max pooling on the input array (H, W, C)."""
-    H, W, C = input_3d.shape
-    out_H = (H - pool_size) // stride + 1
-    out_W = (W - pool_size) // stride + 1
-    pooled = np.zeros((out_H, out_W, C), dtype=input_3d.dtype)
-    for c in range(C):
-        for h in range(out_H):
-            for w in range(out_W):
-                h_start, w_start = h * stride, w * stride
-                window = input_3d[h_start:h_start + pool_size, w_start:w_start + pool_size, c]
-                pooled[h, w, c] = np.max(window)
-    return pooled
-
-def fully_connected_layer(input_vector, weights, biases):
-    """Performs a fully-connected layer operation with custom bit-preserving truncation."""
-    n_output = weights.shape[1]
-    output_vector = np.zeros(n_output, dtype=np.int64)
-
-    # Manually compute the matrix multiplication (dot product) for each output neuron
-    # to ensure the custom multiplication is applied before summation.
-    for j in range(n_output):
-        # Get the weights for the j-th output neuron
-        weight_col = weights[:, j]
-        
-        # Perform element-wise multiplication with the custom fixed-point function
-        products = fixed_mul_q313(input_vector, weight_col)
-        
-        # Sum the results in a 64-bit accumulator
-        output_vector[j] = products.astype(np.int64).sum()
+    Saves the outputs of a convolutional or pooling stage.
 
-    # Add the biases
-    output_vector += biases.astype(np.int64)
-    
-    # Clamp the final result to the int16 range
-    INT16_MIN, INT16_MAX = -32768, 32767
-    clamped_output = np.clip(output_vector, INT16_MIN, INT16_MAX)
-    return clamped_output.astype(np.int16)
-
-# --------------------------------------------------------------------
-# Output Generation and Visualization
-# --------------------------------------------------------------------
-
-def save_stage_outputs(stage_name: str, data_array: np.ndarray, base_output_dir: Path):
-    """Saves comprehensive outputs for a convolutional or pooling stage."""
+    `level` "full" writes the comprehensive debug dump; "combined" writes only
+    one packed `.q313` tensor file (HWC layout) for the stage.
+    """
     print(f"--- Saving Stage: {stage_name} ---")
     stage_dir = base_output_dir / stage_name
     stage_dir.mkdir(parents=True, exist_ok=True)
+
+    if level == "combined":
+        write_tensor(stage_dir / f"{stage_name}_all_channels{TENSOR_SUFFIX}", data_array, layout="HWC")
+        print(f"  ✅ Stage '{stage_name}' saved as a packed tensor.")
+        return
     
     if data_array.ndim != 3:
         print(f"  ❗️Warning: Data is not a 3D tensor (shape: {data_array.shape}). Skipping detailed output.")
@@ -149,52 +54,30 @@ def save_stage_outputs(stage_name: str, data_array: np.ndarray, base_output_dir:
 
     # Save combined .txt file for all channels
     combined_txt_path = stage_dir / f"{stage_name}_all_channels.txt"
-    with combined_txt_path.open("w") as f:
-        for c in range(C):
-            for val in data_array[:, :, c].flatten():
-                f.write(int16_to_bin16(val) + "\n")
+    write_bin16_file(combined_txt_path, data_array.transpose(2, 0, 1))
 
-    # Save individual channels and create grid visualization
-    channel_images = []
+    # Save individual channels
     for c in range(C):
-        channel_data = data_array[:, :, c]
         channel_dir = stage_dir / f"channel_{c:03d}"
         channel_dir.mkdir(exist_ok=True)
+        write_bin16_file(channel_dir / "output.txt", data_array[:, :, c])
 
-        txt_output_path = channel_dir / "output.txt"
-        with txt_output_path.open("w") as f:
-            for val in channel_data.flatten():
-                f.write(int16_to_bin16(val) + "\n")
-
-        float_channel = np.vectorize(q313_int16_to_float)(channel_data)
-        min_val, max_val = np.min(float_channel), np.max(float_channel)
-        normalized_data = ((float_channel - min_val) / (max_val - min_val) * 255) if max_val > min_val else np.zeros_like(float_channel)
-        img = Image.fromarray(normalized_data.astype(np.uint8), 'L')
-        
-        jpg_output_path = channel_dir / "visualization.jpeg"
-        img.save(jpg_output_path, 'JPEG')
-        channel_images.append(img)
-        
-    if C > 0 and H > 0 and W > 0:
-        grid_cols = int(np.ceil(np.sqrt(C)))
-        grid_rows = int(np.ceil(C / grid_cols))
-        grid_image = Image.new('L', (grid_cols * W, grid_rows * H))
-        for i, img in enumerate(channel_images):
-            grid_image.paste(img, ((i % grid_cols) * W, (i // grid_cols) * H))
-        grid_jpg_path = stage_dir / f"{stage_name}_visualization_grid.jpeg"
-        grid_image.save(grid_jpg_path, 'JPEG')
+    # Per-channel and grid visualizations, all channels normalized at once
+    render_feature_map(data_array, stage_dir, stage_name)
         
     print(f"  ✅ Stage '{stage_name}' saved successfully.")
 
-def save_fc_output(stage_name: str, data_vector: np.ndarray, base_output_dir: Path):
-    """Saves the output vector of a fully-connected layer."""
+def save_fc_output(stage_name: str, data_vector: np.ndarray, base_output_dir: Path, level: str = "full"):
+    """Saves the output vector of a fully-connected layer (as a packed `.q313` file at level "combined")."""
     print(f"--- Saving Stage: {stage_name} ---")
     stage_dir = base_output_dir / stage_name
     stage_dir.mkdir(parents=True, exist_ok=True)
-    txt_output_path = stage_dir / f"{stage_name}_output.txt"
-    with txt_output_path.open("w") as f:
-        for val in data_vector:
-            f.write(int16_to_bin16(val) + "\n")
+    if level == "combined":
+        txt_output_path = stage_dir / f"{stage_name}_output{TENSOR_SUFFIX}"
+        write_tensor(txt_output_path, data_vector, layout="FLAT")
+    else:
+        txt_output_path = stage_dir / f"{stage_name}_output.txt"
+        write_bin16_file(txt_output_path, data_vector)
     print(f"  ✅ Data saved to: {txt_output_path}")
 
 # --------------------------------------------------------------------
@@ -202,24 +85,39 @@ def save_fc_output(stage_name: str, data_vector: np.ndarray, base_output_dir: Pa
 # --------------------------------------------------------------------
 
 def load_weights(weights_dir: Path):
-    """Loads all model weights and biases from the specified directory."""
+    """
+    Loads all model weights and biases from the specified directory.
+
+    A binary model bundle (see `model_bundle.py`) in the directory is memory-mapped
+    instead of parsing the per-line `.txt` files.
+    """
     print("\n--- Loading all model weights and biases ---")
+
+    bundle_path = weights_dir / BUNDLE_NAME
+    if bundle_path.is_file():
+        try:
+            w, b = load_alexnet_bundle(bundle_path)
+            print(f"✅ Memory-mapped all weights and biases from {bundle_path.name}.")
+            return w, b
+        except Exception as e:
+            print(f"❌ FATAL ERROR loading model bundle: {e}", file=sys.stderr)
+            sys.exit(1)
     
     def load_conv(C, M, K, name):
         w_path = weights_dir / f"{name}_filter_16.txt"
         b_path = weights_dir / f"{name}_bias_16.txt"
-        w_flat = np.array([bin16_to_int16(line) for line in w_path.read_text().splitlines() if line.strip()])
+        w_flat = read_bin16_file(w_path)
         weights = w_flat.reshape(M, C, K, K).transpose(2, 3, 1, 0)
-        biases = np.array([bin16_to_int16(line) for line in b_path.read_text().splitlines() if line.strip()])
+        biases = read_bin16_file(b_path)
         print(f"  - Loaded {name} weights: {weights.shape}, biases: {biases.shape}")
         return weights, biases
 
     def load_fc(in_feat, out_feat, name):
         w_path = weights_dir / f"{name}_weights.pth.txt"
         b_path = weights_dir / f"{name}_biases.pth.txt"
-        w_flat = np.array([bin16_to_int16(line) for line in w_path.read_text().splitlines() if line.strip()])
+        w_flat = read_bin16_file(w_path)
         weights = w_flat.reshape(out_feat, in_feat).transpose()
-        biases = np.array([bin16_to_int16(line) for line in b_path.read_text().splitlines() if line.strip()])
+        biases = read_bin16_file(b_path)
         print(f"  - Loaded {name} weights: {weights.shape}, biases: {biases.shape}")
         return weights, biases
 
@@ -240,6 +138,85 @@ def load_weights(weights_dir: Path):
         print(f"❌ FATAL ERROR loading weights: {e}", file=sys.stderr)
         sys.exit(1)
 
+def process_image(image_path: Path, ifmap: np.ndarray, context: dict):
+    """
+    Runs the full network on one decoded (227, 227, 3) Q3.13 image, saving its
+    stages and top-5 predictions.
+
+    `context` holds the shared layer-graph executor, class names, output
+    directory, per-stage dump levels, writer thread count and archive flag.
+    Stage dumps run on a background writer while the next layers compute; with
+    the archive flag they all go into one `<image>.zip` instead of a directory
+    tree. Returns the top-5 predictions, or None if the image failed.
+    """
+    executor, class_names = context['executor'], context['class_names']
+    dump_levels = context['dump_levels']
+    print(f"\n\n{'='*25} Processing Image: {image_path.name} {'='*25}")
+    image_output_dir = context['output_dir'] / image_path.stem
+    archive = None
+    if context['archive']:
+        archive = StageArchiveWriter(context['output_dir'] / f"{image_path.stem}{ARCHIVE_SUFFIX}")
+    writer = StageWriter(context['writer_threads'])
+
+    def save_stage(name: str, data: np.ndarray):
+        level = dump_levels[name]
+        if level == "none":
+            return
+        # Stage directories keep their graph position, whatever is skipped.
+        stage_name = f"{list(dump_levels).index(name):02d}_{name}"
+        if archive is not None:
+            writer.submit(archive.add_stage, stage_name, data, level == "full")
+            return
+        save_fn = save_stage_outputs if data.ndim == 3 else save_fc_output
+        writer.submit(save_fn, stage_name, data, image_output_dir, level)
+
+    try:
+        # --- STAGE 0: Input (decoded and quantized by the ingest threads) ---
+        if isinstance(ifmap, Exception):
+            raise ifmap
+        save_stage("input", ifmap)
+
+        # --- CONV1 ... FC3: fused layer graph, kept stages queued for saving as they are produced ---
+        fc3 = executor.run(ifmap, on_stage=save_stage)
+        writer.wait()
+
+        # --- Final Prediction Output ---
+        predictions = top5_predictions(fc3, class_names)
+        if archive is not None:
+            archive.add_json(TOP5_NAME, predictions)
+        else:
+            save_top5(predictions, image_output_dir)
+        print("\n" + "="*20 + f" TOP 5 PREDICTIONS FOR: {image_path.name} " + "="*20)
+        for p in predictions:
+            marker = "🏆" if p["rank"] == 1 else f"  {p['rank']}."
+            print(f"{marker} Class: {p['class'].replace('_', ' ').title()} (Index: {p['index']}, Score: {p['score']})")
+        print("="*70)
+        return predictions
+
+    except Exception as e:
+        print(f"\n❌ An error occurred while processing {image_path.name}: {e}", file=sys.stderr)
+        import traceback
+        traceback.print_exc()
+        print("  Skipping to the next image.", file=sys.stderr)
+        return None
+    finally:
+        writer.close()
+        if archive is not None:
+            archive.close()
+            print(f"  ✅ Stage outputs archived to: {archive.path}")
+
+def process_images(image_paths: list, context: dict) -> dict:
+    """
+    Runs `process_image` over a list of images while the next images are decoded
+    on background threads. Returns {image name: top-5 predictions} for the images that succeeded.
+    """
+    results = {}
+    for image_path, ifmap in iter_images_q313(image_paths, draft=context['draft'], cache=context['input_cache']):
+        predictions = process_image(image_path, ifmap, context)
+        if predictions is not None:
+            results[image_path.name] = predictions
+    return results
+
 def main():
     print("🚀 === AlexNet Full Pipeline Simulation (Custom Fixed-Point) === 🚀")
     
@@ -248,6 +225,30 @@ def main():
     weights_dir = Path(input("Enter path to the WEIGHTS & BIASES directory: ").strip())
     output_dir = Path(input("Enter path for the main OUTPUT directory: ").strip())
     class_index_path = Path(input("Enter path to the ImageNet class index JSON file: ").strip())
+    workers_str = input("Enter number of CONV worker processes (default: 1): ").strip()
+    conv_workers = int(workers_str) if workers_str else 1
+    images_str = input("Enter number of IMAGE worker processes (default: 1): ").strip()
+    image_workers = int(images_str) if images_str else 1
+    cache_str = input("Enter path to a STAGE CACHE directory (leave empty to disable): ").strip()
+    if cache_str:
+        cache_mib = input(f"Enter the stage cache size limit in MiB (default: {DEFAULT_CACHE_BYTES // 2**20}): ").strip()
+        stage_cache = StageCache(Path(cache_str), int(cache_mib) * 2**20 if cache_mib else DEFAULT_CACHE_BYTES)
+    else:
+        stage_cache = None
+    dump_level = input(f"Enter the stage DUMP LEVEL [{'/'.join(DUMP_LEVELS)}] (default: full): ").strip().lower() or "full"
+    overrides_str = input("Enter per-stage dump level overrides, e.g. conv5=full,relu5=none (leave empty for none): ").strip()
+    threads_str = input(f"Enter number of background WRITER threads (default: {DEFAULT_WRITER_THREADS}, 0 writes inline): ").strip()
+    writer_threads = int(threads_str) if threads_str else DEFAULT_WRITER_THREADS
+    use_archive = input("Write each image's stages into one ARCHIVE file? [y/N]: ").strip().lower() == 'y'
+    draft = input("Decode large JPEGs in reduced-size DRAFT mode (faster, not bit-identical)? [y/N]: ").strip().lower() == 'y'
+
+    # --- Resolve Dump Levels ---
+    stage_names = ["input"] + [layer["name"] for layer in ALEXNET_GRAPH]
+    try:
+        dump_levels = resolve_dump_levels(stage_names, dump_level, parse_dump_overrides(overrides_str))
+    except ValueError as e:
+        print(f"❌ FATAL ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
 
     # --- Load Class Names ---
     try:
@@ -269,90 +270,27 @@ def main():
     
     print(f"\n✅ Found {len(image_files)} images to process.")
 
-    for image_path in image_files:
-        print(f"\n\n{'='*25} Processing Image: {image_path.name} {'='*25}")
-        image_output_dir = output_dir / image_path.stem
-        step = 0
-        
-        try:
-            # --- STAGE 0: Input Processing ---
-            img = Image.open(image_path).convert('RGB').resize((227, 227), Image.Resampling.BILINEAR)
-            ifmap = np.vectorize(float_to_q313_int16)(np.array(img).astype(np.float32) / 255.0)
-            save_stage_outputs(f"{step:02d}_input", ifmap, image_output_dir); step += 1
-            
-            # --- LAYER 1: CONV1 -> RELU -> MAX1 ---
-            conv1 = conv2d_q313(ifmap, weights['conv1'], biases['conv1'], stride=4)
-            save_stage_outputs(f"{step:02d}_conv1", conv1, image_output_dir); step += 1
-            relu1 = apply_relu(conv1)
-            save_stage_outputs(f"{step:02d}_relu1", relu1, image_output_dir); step += 1
-            max1 = max_pooling_3d(relu1, pool_size=3, stride=2)
-            save_stage_outputs(f"{step:02d}_maxpool1", max1, image_output_dir); step += 1
-            
-            # --- LAYER 2: PAD -> CONV2 -> RELU -> MAX2 ---
-            pad2 = apply_padding(max1, pad=2)
-            save_stage_outputs(f"{step:02d}_padding2", pad2, image_output_dir); step += 1
-            conv2 = conv2d_q313(pad2, weights['conv2'], biases['conv2'], stride=1)
-            save_stage_outputs(f"{step:02d}_conv2", conv2, image_output_dir); step += 1
-            relu2 = apply_relu(conv2)
-            save_stage_outputs(f"{step:02d}_relu2", relu2, image_output_dir); step += 1
-            max2 = max_pooling_3d(relu2, pool_size=3, stride=2)
-            save_stage_outputs(f"{step:02d}_maxpool2", max2, image_output_dir); step += 1
-            
-            # --- LAYER 3: PAD -> CONV3 -> RELU ---
-            pad3 = apply_padding(max2, pad=1)
-            save_stage_outputs(f"{step:02d}_padding3", pad3, image_output_dir); step += 1
-            conv3 = conv2d_q313(pad3, weights['conv3'], biases['conv3'], stride=1)
-            save_stage_outputs(f"{step:02d}_conv3", conv3, image_output_dir); step += 1
-            relu3 = apply_relu(conv3)
-            save_stage_outputs(f"{step:02d}_relu3", relu3, image_output_dir); step += 1
-            
-            # --- LAYER 4: PAD -> CONV4 -> RELU ---
-            pad4 = apply_padding(relu3, pad=1)
-            save_stage_outputs(f"{step:02d}_padding4", pad4, image_output_dir); step += 1
-            conv4 = conv2d_q313(pad4, weights['conv4'], biases['conv4'], stride=1)
-            save_stage_outputs(f"{step:02d}_conv4", conv4, image_output_dir); step += 1
-            relu4 = apply_relu(conv4)
-            save_stage_outputs(f"{step:02d}_relu4", relu4, image_output_dir); step += 1
-            
-            # --- LAYER 5: PAD -> CONV5 -> RELU -> MAX3 ---
-            pad5 = apply_padding(relu4, pad=1)
-            save_stage_outputs(f"{step:02d}_padding5", pad5, image_output_dir); step += 1
-            conv5 = conv2d_q313(pad5, weights['conv5'], biases['conv5'], stride=1)
-            save_stage_outputs(f"{step:02d}_conv5", conv5, image_output_dir); step += 1
-            relu5 = apply_relu(conv5)
-            save_stage_outputs(f"{step:02d}_relu5", relu5, image_output_dir); step += 1
-            max3 = max_pooling_3d(relu5, pool_size=3, stride=2)
-            save_stage_outputs(f"{step:02d}_maxpool3", max3, image_output_dir); step += 1
-            
-            # --- FLATTEN & FC Layers ---
-            flat = max3.flatten()
-            fc1 = fully_connected_layer(flat, weights['fc1'], biases['fc1'])
-            save_fc_output(f"{step:02d}_fc1", fc1, image_output_dir); step += 1
-            relu_fc1 = apply_relu(fc1)
-            save_fc_output(f"{step:02d}_relu_fc1", relu_fc1, image_output_dir); step += 1
-            
-            fc2 = fully_connected_layer(relu_fc1, weights['fc2'], biases['fc2'])
-            save_fc_output(f"{step:02d}_fc2", fc2, image_output_dir); step += 1
-            relu_fc2 = apply_relu(fc2)
-            save_fc_output(f"{step:02d}_relu_fc2", relu_fc2, image_output_dir); step += 1
-            
-            fc3 = fully_connected_layer(relu_fc2, weights['fc3'], biases['fc3'])
-            save_fc_output(f"{step:02d}_fc3_output", fc3, image_output_dir); step += 1
-            
-            # --- Final Prediction Output ---
-            top5_indices = np.argsort(fc3)[::-1][:5]
-            print("\n" + "="*20 + f" TOP 5 PREDICTIONS FOR: {image_path.name} " + "="*20)
-            for i, idx in enumerate(top5_indices):
-                class_name = class_names.get(str(idx), "Unknown Class")
-                marker = "🏆" if i == 0 else f"  {i+1}."
-                print(f"{marker} Class: {class_name.replace('_', ' ').title()} (Index: {idx}, Score: {fc3[idx]})")
-            print("="*70)
-
-        except Exception as e:
-            print(f"\n❌ An error occurred while processing {image_path.name}: {e}", file=sys.stderr)
-            import traceback
-            traceback.print_exc()
-            print("  Skipping to the next image.", file=sys.stderr)
+    # Weights are hashed once; stage keys reuse these digests.
+    digests = {name: content_hash(weights[name], biases[name]) for name in weights} if stage_cache else {}
+    # Stages that are not dumped need not be materialized, so their ops can fuse.
+    keep = {name for name, level in dump_levels.items() if level != "none"}
+    # conv1 sees only 8-bit pixel codes: its products come from a table kept next to the weights.
+    product_luts = {'conv1': load_product_lut(weights['conv1'], weights_dir)}
+    executor = GraphExecutor(ALEXNET_GRAPH, weights, biases, keep=keep, conv_workers=conv_workers,
+                             stage_cache=stage_cache, digests=digests, space_to_depth=True,
+                             product_luts=product_luts)
+    print(f"  - Layer graph: {describe_plan(executor.steps)}")
+    context = {
+        'executor': executor, 'class_names': class_names, 'output_dir': output_dir,
+        'dump_levels': dump_levels, 'writer_threads': writer_threads, 'archive': use_archive,
+        'draft': draft, 'input_cache': stage_cache,   # quantized inputs share the stage cache
+    }
+    # Each image worker takes a contiguous share of the images and prefetches its own decodes.
+    batch_results = {}
+    for results in run_batch(process_images, split_batches(image_files, image_workers), context, workers=image_workers):
+        batch_results.update(results)
+    results_path = save_batch_results(batch_results, output_dir)
+    print(f"\n✅ Aggregated top-5 results for {len(batch_results)} image(s) saved to: {results_path}")
 
     print("\n\n✨ AlexNet batch processing finished successfully! ✨")
 
@@ -3,149 +3,38 @@ import sys
 import json
 import numpy as np
 from pathlib import Path
-from PIL import Image
-
-# ------------------------- Universal Helper Functions -------------------------
-
-def float_to_q313_int16(val: float) -> np.int16:
-    """Converts a float in [-8.0, 8.0) to a Q3.13 16-bit signed integer."""
-    max_val = (2**15 - 1) / (2**13)
-    min_val = -(2**15) / (2**13)
-    val = min(max(val, min_val), max_val)
-    scaled_val = int(round(val * (2**13)))
-    return np.int16(scaled_val)
-
-def int16_to_bin16(x: np.int16) -> str:
-    """Converts a signed 16-bit integer to its 16-bit binary string."""
-    return format(np.uint16(x).item(), "016b")
-
-def bin16_to_int16(bin_str: str) -> np.int16:
-    """Converts a 16-bit binary string to a signed 16-bit integer."""
-    val = int(bin_str, 2)
-    if val & 0x8000:
-        val -= 1 << 16
-    return np.int16(val)
-
-def q313_int16_to_float(q_val: np.int16) -> float:
-    """Converts a Q3.13 signed 16-bit integer back to a float."""
-    return float(q_val) / (2**13)
-
-# ------------------------- Core Pipeline Operations -------------------------
-
-def apply_padding(data_array: np.ndarray, pad: int) -> np.ndarray:
-    """Applies zero-padding to the height and width dimensions of a feature map."""
-    if pad == 0:
-        return data_array
-    return np.pad(data_array, ((pad, pad), (pad, pad), (0, 0)), 'constant', constant_values=0)
-
-# --- INTEGRATED: Custom Bit-Preserving Truncation ---
-def fixed_mul_q313(a: np.ndarray, b: np.ndarray) -> np.ndarray:
-    """
-    Element-wise multiply two Q3.13 int16 arrays using a custom bit-preserving truncation.
-
-    The final 16-bit result is constructed by selecting specific bits from the
-    32-bit Q6.26 intermediate product according to the following rule:
-    - New Sign Bit (bit 15):      Taken from product bit 31.
-    - New Integer Bits (bits 14-13):  Taken from product bits 27 and 26.
-    - New Fractional Bits (bits 12-0): Taken from product bits 25 down to 13.
-    """
-    # Cast to 32-bit to perform multiplication without overflow.
-    prod32 = a.astype(np.int32) * b.astype(np.int32)
-
-    # Use unsigned integers for bitwise operations to prevent overflow errors.
-    prod32_unsigned = prod32.view(np.uint32)
-
-    # Define masks as unsigned 32-bit integers.
-    value_mask = np.uint32(0x0FFFE000)
-    sign_mask = np.uint32(0x80000000)
-
-    # Isolate the value bits and shift them right by 13 to align them in positions 14-0.
-    value_part = (prod32_unsigned & value_mask) >> 13
-
-    # Isolate the sign bit and shift it right by 16 to align it in position 15.
-    sign_part = (prod32_unsigned & sign_mask) >> 16
-
-    # Combine the sign and value parts. The result is a uint32 array.
-    final_result_unsigned = sign_part | value_part
 
-    # Cast the final result to a signed int16. This correctly interprets
-    # the two's complement bit pattern of the 16-bit value.
-    return final_result_unsigned.astype(np.int16)
-
-# --- INTEGRATED AND ENHANCED FROM CONVOLUTION SCRIPT ---
-def conv2d_q313(ifmap, weights, biases, kernel_size, stride):
-    """
-    Performs a 2D convolution with custom fixed-point arithmetic and saturation.
-    """
-    H, W, C = ifmap.shape
-    K = kernel_size
-    _, _, _, M = weights.shape
-    OH = (H - K) // stride + 1
-    OW = (W - K) // stride + 1
-    ofmap = np.zeros((OH, OW, M), dtype=np.int16)
-
-    # Define the min and max values for a 16-bit signed integer for clamping.
-    INT16_MIN, INT16_MAX = -32768, 32767
-
-    for m in range(M):
-        w_m = weights[:, :, :, m]
-        b_m = biases[m]
-        for oh in range(OH):
-            for ow in range(OW):
-                base_h, base_w = oh * stride, ow * stride
-                window = ifmap[base_h:base_h+K, base_w:base_w+K, :]
-                mult = fixed_mul_q313(window, w_m)
-                
-                # Sum is done in 32-bit to prevent intermediate overflow.
-                acc32 = mult.astype(np.int32).sum() + int(b_m)
-                
-                # Clamp (saturate) the result to the int16 range to prevent overflow wrap-around.
-                clamped_acc = np.clip(acc32, INT16_MIN, INT16_MAX)
-                
-                ofmap[oh, ow, m] = np.int16(clamped_acc)
-    return ofmap
-
-def apply_relu(data: np.ndarray) -> np.ndarray:
-    """Applies the ReLU activation function."""
-    return np.maximum(data, np.int16(0))
-
-def max_pooling_3d(input_3d: np.ndarray, pool_size: int, stride: int) -> np.ndarray:
-    """Performs 3D max pooling on the input array (H, W, C)."""
-    H, W, C = input_3d.shape
-    out_H = (H - pool_size) // stride + 1
-    out_W = (W - pool_size) // stride + 1
-    pooled = np.zeros((out_H, out_W, C), dtype=input_3d.dtype)
-    
-    for c in range(C):
-        for h in range(out_H):
-            for w in range(out_W):
-                h_start, w_start = h * stride, w * stride
-                window = input_3d[h_start:h_start + pool_size, w_start:w_start + pool_size, c]
-                pooled[h, w, c] = np.max(window)
-    return pooled
-
-def fully_connected_layer(input_vector, weights, biases):
-    """Performs a fully-connected layer operation."""
-    # The multiplication result is scaled back by shifting right by 13.
-    # Note: FC layers use standard Q3.13 multiplication, not the custom one.
-    output_vector = ((input_vector.astype(np.int32) @ weights.astype(np.int32)) >> 13) + biases.astype(np.int32)
-    
-    # Clamp the result to the int16 range before casting.
-    INT16_MIN, INT16_MAX = -32768, 32767
-    clamped_output = np.clip(output_vector, INT16_MIN, INT16_MAX)
-    return clamped_output.astype(np.int16)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from batch_runner import TOP5_NAME, run_batch, save_batch_results, save_top5, split_batches, top5_predictions
+from stage_cache import DEFAULT_CACHE_BYTES, StageCache, content_hash
+from layer_graph import ALEXNET_FEATURES, GraphExecutor, describe_plan
+from model_bundle import load_alexnet_bundle
+from product_lut import load_product_lut
+from bin16_codec import read_bin16_file, write_bin16_file
+from tensor_file import TENSOR_SUFFIX, write_tensor
+from feature_render import render_feature_map
+from image_ingest import iter_images_q313
+from stage_archive import ARCHIVE_SUFFIX, StageArchiveWriter
+from stage_writer import (DEFAULT_WRITER_THREADS, DUMP_LEVELS, StageWriter,
+                          parse_dump_overrides, resolve_dump_levels)
 
 # ------------------------- Stage Output & Visualization -------------------------
 
-def save_stage_outputs(stage_name: str, data_array: np.ndarray, base_output_dir: Path):
+def save_stage_outputs(stage_name: str, data_array: np.ndarray, base_output_dir: Path, level: str = "full"):
     """
     Saves each channel of a feature map into its own subdirectory, and also
     creates a combined .txt file and a grid visualization for all channels.
+    At `level` "combined", only one packed `.q313` tensor file (HWC) is written.
     """
     print(f"--- Processing Stage: {stage_name} ---")
     
     stage_dir = base_output_dir / stage_name
     stage_dir.mkdir(parents=True, exist_ok=True)
+
+    if level == "combined":
+        write_tensor(stage_dir / f"{stage_name}_all_channels{TENSOR_SUFFIX}", data_array, layout="HWC")
+        print(f"✅ Stage '{stage_name}' saved as a packed tensor.")
+        return
     
     if data_array.ndim != 3:
         print(f"     - Data is not a 3D tensor (shape: {data_array.shape}). Skipping detailed channel output.")
@@ -154,70 +43,36 @@ def save_stage_outputs(stage_name: str, data_array: np.ndarray, base_output_dir:
     H, W, C = data_array.shape
     print(f"     - Feature map shape: ({H}, {W}, {C}).")
 
-    # Part 1: Save each channel individually and collect images for the grid
+    # Part 1: Save each channel individually
     print(f"     - Saving {C} individual channel output(s)...")
-    channel_images = []
     for c in range(C):
-        channel_data = data_array[:, :, c]
         channel_dir = stage_dir / f"channel_{c:03d}"
         channel_dir.mkdir(exist_ok=True)
-
-        txt_output_path = channel_dir / "output.txt"
-        with txt_output_path.open("w") as f:
-            for val in channel_data.flatten():
-                f.write(int16_to_bin16(val) + "\n")
-
-        jpg_output_path = channel_dir / "visualization.jpeg"
-        float_channel = np.vectorize(q313_int16_to_float)(channel_data)
-        
-        min_val, max_val = np.min(float_channel), np.max(float_channel)
-        if max_val > min_val:
-            normalized_data = ((float_channel - min_val) / (max_val - min_val) * 255)
-        else:
-            normalized_data = np.zeros_like(float_channel)
-            
-        img = Image.fromarray(normalized_data.astype(np.uint8), 'L')
-        img.save(jpg_output_path, 'JPEG')
-        channel_images.append(img)
+        write_bin16_file(channel_dir / "output.txt", data_array[:, :, c])
         
     # Part 2: Save the combined .txt file for all channels
     print("     - Saving combined .txt for all channels...")
     combined_txt_path = stage_dir / f"{stage_name}_all_channels.txt"
-    with combined_txt_path.open("w") as f:
-        for c in range(C):
-            for val in data_array[:, :, c].flatten():
-                f.write(int16_to_bin16(val) + "\n")
-
-    # Part 3: Create and save the combined grid visualization
-    if C > 0 and H > 0 and W > 0:
-        print("     - Creating and saving grid visualization...")
-        grid_cols = int(np.ceil(np.sqrt(C)))
-        grid_rows = int(np.ceil(C / grid_cols))
-        
-        canvas_width = grid_cols * W
-        canvas_height = grid_rows * H
-        grid_image = Image.new('L', (canvas_width, canvas_height))
+    write_bin16_file(combined_txt_path, data_array.transpose(2, 0, 1))
 
-        for i, img in enumerate(channel_images):
-            row = i // grid_cols
-            col = i % grid_cols
-            grid_image.paste(img, (col * W, row * H))
-
-        grid_jpg_path = stage_dir / f"{stage_name}_visualization_grid.jpeg"
-        grid_image.save(grid_jpg_path, 'JPEG')
+    # Part 3: Render the per-channel and grid visualizations (all channels normalized at once)
+    print("     - Rendering channel and grid visualizations...")
+    render_feature_map(data_array, stage_dir, stage_name)
         
     print(f"✅ Stage '{stage_name}' saved successfully.")
 
-def save_fc_output(stage_name: str, data_vector: np.ndarray, base_output_dir: Path):
-    """Saves the output vector of a fully-connected layer to a .txt file."""
+def save_fc_output(stage_name: str, data_vector: np.ndarray, base_output_dir: Path, level: str = "full"):
+    """Saves the output vector of a fully-connected layer to a .txt file (a packed `.q313` file at level "combined")."""
     print(f"--- Processing Stage: {stage_name} ---")
     stage_dir = base_output_dir / stage_name
     stage_dir.mkdir(parents=True, exist_ok=True)
     
-    txt_output_path = stage_dir / f"{stage_name}_output.txt"
-    with txt_output_path.open("w") as f:
-        for val in data_vector:
-            f.write(int16_to_bin16(val) + "\n")
+    if level == "combined":
+        txt_output_path = stage_dir / f"{stage_name}_output{TENSOR_SUFFIX}"
+        write_tensor(txt_output_path, data_vector, layout="FLAT")
+    else:
+        txt_output_path = stage_dir / f"{stage_name}_output.txt"
+        write_bin16_file(txt_output_path, data_vector)
     print(f"✅ Data saved to: {txt_output_path}")
 
 # ------------------------- Main Orchestrator -------------------------
@@ -226,9 +81,9 @@ def load_conv_files(w_path: Path, b_path: Path, M: int, C: int, K: int):
     """Loads and reshapes weights and biases for a convolutional layer."""
     print(f"Loading weights from {w_path.name} and biases from {b_path.name}...")
     try:
-        w_flat = np.array([bin16_to_int16(line) for line in w_path.read_text().splitlines() if line.strip()])
+        w_flat = read_bin16_file(w_path)
         weights = w_flat.reshape(M, C, K, K).transpose(2, 3, 1, 0)
-        biases = np.array([bin16_to_int16(line) for line in b_path.read_text().splitlines() if line.strip()])
+        biases = read_bin16_file(b_path)
         assert biases.shape[0] == M, f"Expected {M} biases but found {biases.shape[0]}."
         return weights, biases
     except Exception as e:
@@ -239,15 +94,134 @@ def load_fc_files(w_path: Path, b_path: Path, input_features: int, output_featur
     """Loads and reshapes weights and biases for a fully-connected layer."""
     print(f"Loading weights from {w_path.name} and biases from {b_path.name}...")
     try:
-        w_flat = np.array([bin16_to_int16(line) for line in w_path.read_text().splitlines() if line.strip()])
+        w_flat = read_bin16_file(w_path)
         weights = w_flat.reshape(output_features, input_features).transpose()
-        biases = np.array([bin16_to_int16(line) for line in b_path.read_text().splitlines() if line.strip()])
+        biases = read_bin16_file(b_path)
         assert biases.shape[0] == output_features, f"Expected {output_features} biases but found {biases.shape[0]}."
         return weights, biases
     except Exception as e:
         print(f"❌ Error loading FC files for In={input_features}, Out={output_features}. Details: {e}", file=sys.stderr)
         sys.exit(1)
 
+def load_bundle_files(bundle_path: Path):
+    """Memory-maps all CONV1-CONV5 and FC6-FC8 weights and biases from a model bundle."""
+    print(f"Memory-mapping weights and biases from {bundle_path.name}...")
+    try:
+        weights, biases = load_alexnet_bundle(bundle_path)
+        keys = ('conv1', 'conv2', 'conv3', 'conv4', 'conv5', 'fc1', 'fc2', 'fc3')
+        return [weights[k] for k in keys], [biases[k] for k in keys]
+    except Exception as e:
+        print(f"❌ Error loading model bundle {bundle_path}. Details: {e}", file=sys.stderr)
+        sys.exit(1)
+
+# FC layers of this driver: shift-mode truncation, dumped under the fc6..fc8 names.
+CLASSIFIER_GRAPH = [
+    {"name": "fc6", "op": "fc", "weights": "fc1", "mode": "shift"},
+    {"name": "relu6", "op": "relu"},
+    {"name": "fc7", "op": "fc", "weights": "fc2", "mode": "shift"},
+    {"name": "relu7", "op": "relu"},
+    {"name": "fc8_output", "op": "fc", "weights": "fc3", "mode": "shift"},
+]
+
+def process_image_batch(image_paths: list, context: dict) -> dict:
+    """
+    Runs the network on a list of images: conv layers image by image, then the FC
+    layers once for the whole list. Stage dumps and top-5 files are written here.
+
+    `context` holds the feature and classifier graph executors, class names,
+    output directory, per-stage dump levels, writer thread count and archive
+    flag (one `<image>.zip` per image instead of a directory tree; each archive
+    is suspended after its conv stages and finished after its FC stages, so no
+    file stays open per image across the batch). Returns
+    {image name: top-5 predictions} for the images that succeeded.
+    """
+    archives = {}
+    try:
+        with StageWriter(context['writer_threads']) as writer:
+            return _run_image_batch(image_paths, context, writer, archives)
+    finally:
+        for archive in archives.values():
+            archive.close()
+            print(f"✅ Stage outputs archived to: {archive.path}")
+
+def _run_image_batch(image_paths: list, context: dict, writer: StageWriter, archives: dict) -> dict:
+    features, classifier = context['features'], context['classifier']
+    class_names, dump_levels = context['class_names'], context['dump_levels']
+    # Stage directories keep their graph position, whatever is skipped.
+    stage_numbers = {name: n for n, name in enumerate(dump_levels)}
+
+    def save_stage(name: str, data: np.ndarray, image_path: Path):
+        level = dump_levels[name]
+        if level == "none":
+            return
+        stage_name = f"{stage_numbers[name]:02d}_{name}"
+        if image_path in archives:
+            writer.submit(archives[image_path].add_stage, stage_name, data, level == "full")
+        else:
+            save_fn = save_stage_outputs if data.ndim == 3 else save_fc_output
+            writer.submit(save_fn, stage_name, data, context['output_dir'] / image_path.stem, level)
+
+    # --- Conv layers per image, FC inputs collected for batching ---
+    conv_results = []
+    predictions = {}
+    # Images are decoded and quantized on background threads, ahead of the conv layers.
+    for image_path, ifmap in iter_images_q313(image_paths, draft=context['draft'], cache=context['input_cache']):
+        print(f"\n\n{'='*25} Processing Image: {image_path.name} {'='*25}")
+        if context['archive']:
+            archives[image_path] = StageArchiveWriter(context['output_dir'] / f"{image_path.stem}{ARCHIVE_SUFFIX}")
+        try:
+            # --- STAGE 0: Input ---
+            if isinstance(ifmap, Exception):
+                raise ifmap
+            save_stage("input", ifmap, image_path)
+
+            # --- LAYERS 1-5: fused feature graph, kept stages queued on the background writer ---
+            max3 = features.run(ifmap, on_stage=lambda name, data: save_stage(name, data, image_path))
+            writer.wait()
+
+            # --- Flatten (a copy: the executor reuses its buffers); FC layers run once for the whole batch below ---
+            conv_results.append((image_path, max3.flatten()))
+
+        except Exception as e:
+            print(f"\n❌ An error occurred while processing {image_path.name}: {e}", file=sys.stderr)
+            print("  Skipping to the next image.", file=sys.stderr)
+        finally:
+            # No file handle is held per image until the FC pass; the FC stages reopen the archive.
+            if image_path in archives:
+                archives[image_path].suspend()
+
+    # --- Batched FC Layers: one pass over each weight matrix for all images ---
+    if conv_results:
+        print(f"\n\n{'='*25} Running FC layers for {len(conv_results)} image(s) {'='*25}")
+        flattened_batch = np.stack([flat for _, flat in conv_results])
+        fc_stages = []
+        fc8 = classifier.run(flattened_batch, on_stage=lambda name, data: fc_stages.append((name, data)))
+
+        for n, (image_path, _) in enumerate(conv_results):
+            for name, data in fc_stages:
+                save_stage(name, data[n], image_path)
+
+            # --- Final Prediction ---
+            top5 = top5_predictions(fc8[n], class_names)
+            if image_path in archives:
+                archives[image_path].add_json(TOP5_NAME, top5)
+            else:
+                save_top5(top5, context['output_dir'] / image_path.stem)
+            predictions[image_path.name] = top5
+            print("\n" + "="*20 + f" TOP 5 PREDICTIONS FOR: {image_path.name} " + "="*20)
+            for p in top5:
+                marker = "🏆" if p["rank"] == 1 else f"  {p['rank']}."
+                print(f"{marker} Class: {p['class'].replace('_', ' ').title()} (Index: {p['index']}, Score: {p['score']})")
+            print("="*70)
+            if image_path in archives:
+                writer.wait()
+                archive = archives.pop(image_path)
+                archive.close()
+                print(f"✅ Stage outputs archived to: {archive.path}")
+        writer.wait()
+
+    return predictions
+
 def main():
     print("🚀 === AlexNet Batch Forward Pass Simulation (Custom Truncation) === 🚀")
     
@@ -259,22 +233,49 @@ def main():
     
     # --- Load all weights and configuration files ONCE ---
     print("\n--- Loading all model weights and configuration files ---")
-    w1_path = Path(input("Enter path to WEIGHTS file for CONV1: ").strip())
-    b1_path = Path(input("Enter path to BIASES file for CONV1: ").strip())
-    w2_path = Path(input("Enter path to WEIGHTS file for CONV2: ").strip())
-    b2_path = Path(input("Enter path to BIASES file for CONV2: ").strip())
-    w3_path = Path(input("Enter path to WEIGHTS file for CONV3: ").strip())
-    b3_path = Path(input("Enter path to BIASES file for CONV3: ").strip())
-    w4_path = Path(input("Enter path to WEIGHTS file for CONV4: ").strip())
-    b4_path = Path(input("Enter path to BIASES file for CONV4: ").strip())
-    w5_path = Path(input("Enter path to WEIGHTS file for CONV5: ").strip())
-    b5_path = Path(input("Enter path to BIASES file for CONV5: ").strip())
-    w6_path = Path(input("Enter path to WEIGHTS file for FC6: ").strip())
-    b6_path = Path(input("Enter path to BIASES file for FC6: ").strip())
-    w7_path = Path(input("Enter path to WEIGHTS file for FC7: ").strip())
-    b7_path = Path(input("Enter path to BIASES file for FC7: ").strip())
-    w8_path = Path(input("Enter path to WEIGHTS file for FC8: ").strip())
-    b8_path = Path(input("Enter path to BIASES file for FC8: ").strip())
+    bundle_str = input("Enter path to a model BUNDLE file (leave empty to enter each .txt file): ").strip()
+    if not bundle_str:
+        w1_path = Path(input("Enter path to WEIGHTS file for CONV1: ").strip())
+        b1_path = Path(input("Enter path to BIASES file for CONV1: ").strip())
+        w2_path = Path(input("Enter path to WEIGHTS file for CONV2: ").strip())
+        b2_path = Path(input("Enter path to BIASES file for CONV2: ").strip())
+        w3_path = Path(input("Enter path to WEIGHTS file for CONV3: ").strip())
+        b3_path = Path(input("Enter path to BIASES file for CONV3: ").strip())
+        w4_path = Path(input("Enter path to WEIGHTS file for CONV4: ").strip())
+        b4_path = Path(input("Enter path to BIASES file for CONV4: ").strip())
+        w5_path = Path(input("Enter path to WEIGHTS file for CONV5: ").strip())
+        b5_path = Path(input("Enter path to BIASES file for CONV5: ").strip())
+        w6_path = Path(input("Enter path to WEIGHTS file for FC6: ").strip())
+        b6_path = Path(input("Enter path to BIASES file for FC6: ").strip())
+        w7_path = Path(input("Enter path to WEIGHTS file for FC7: ").strip())
+        b7_path = Path(input("Enter path to BIASES file for FC7: ").strip())
+        w8_path = Path(input("Enter path to WEIGHTS file for FC8: ").strip())
+        b8_path = Path(input("Enter path to BIASES file for FC8: ").strip())
+    workers_str = input("Enter number of CONV worker processes (default: 1): ").strip()
+    conv_workers = int(workers_str) if workers_str else 1
+    images_str = input("Enter number of IMAGE worker processes (default: 1): ").strip()
+    image_workers = int(images_str) if images_str else 1
+    cache_str = input("Enter path to a STAGE CACHE directory (leave empty to disable): ").strip()
+    if cache_str:
+        cache_mib = input(f"Enter the stage cache size limit in MiB (default: {DEFAULT_CACHE_BYTES // 2**20}): ").strip()
+        stage_cache = StageCache(Path(cache_str), int(cache_mib) * 2**20 if cache_mib else DEFAULT_CACHE_BYTES)
+    else:
+        stage_cache = None
+    dump_level = input(f"Enter the stage DUMP LEVEL [{'/'.join(DUMP_LEVELS)}] (default: full): ").strip().lower() or "full"
+    overrides_str = input("Enter per-stage dump level overrides, e.g. conv5=full,relu5=none (leave empty for none): ").strip()
+    threads_str = input(f"Enter number of background WRITER threads (default: {DEFAULT_WRITER_THREADS}, 0 writes inline): ").strip()
+    writer_threads = int(threads_str) if threads_str else DEFAULT_WRITER_THREADS
+    use_archive = input("Write each image's stages into one ARCHIVE file? [y/N]: ").strip().lower() == 'y'
+    draft = input("Decode large JPEGs in reduced-size DRAFT mode (faster, not bit-identical)? [y/N]: ").strip().lower() == 'y'
+
+    # --- Resolve Dump Levels (paddings are never dumped by this driver) ---
+    feature_names = [layer['name'] for layer in ALEXNET_FEATURES if layer['op'] != 'pad']
+    stage_names = ["input"] + feature_names + [layer['name'] for layer in CLASSIFIER_GRAPH]
+    try:
+        dump_levels = resolve_dump_levels(stage_names, dump_level, parse_dump_overrides(overrides_str))
+    except ValueError as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
 
     # --- Load Class Names ---
     try:
@@ -285,15 +286,18 @@ def main():
         print(f"❌ Error loading or parsing class index JSON: {e}", file=sys.stderr)
         sys.exit(1)
 
-    # --- Load all weights into memory ---
-    w1, b1 = load_conv_files(w1_path, b1_path, M=64, C=3, K=11)
-    w2, b2 = load_conv_files(w2_path, b2_path, M=192, C=64, K=5)
-    w3, b3 = load_conv_files(w3_path, b3_path, M=384, C=192, K=3)
-    w4, b4 = load_conv_files(w4_path, b4_path, M=256, C=384, K=3)
-    w5, b5 = load_conv_files(w5_path, b5_path, M=256, C=256, K=3)
-    w6, b6 = load_fc_files(w6_path, b6_path, input_features=9216, output_features=4096)
-    w7, b7 = load_fc_files(w7_path, b7_path, input_features=4096, output_features=4096)
-    w8, b8 = load_fc_files(w8_path, b8_path, input_features=4096, output_features=1000)
+    # --- Load all weights into memory (or memory-map the bundle) ---
+    if bundle_str:
+        (w1, w2, w3, w4, w5, w6, w7, w8), (b1, b2, b3, b4, b5, b6, b7, b8) = load_bundle_files(Path(bundle_str))
+    else:
+        w1, b1 = load_conv_files(w1_path, b1_path, M=64, C=3, K=11)
+        w2, b2 = load_conv_files(w2_path, b2_path, M=192, C=64, K=5)
+        w3, b3 = load_conv_files(w3_path, b3_path, M=384, C=192, K=3)
+        w4, b4 = load_conv_files(w4_path, b4_path, M=256, C=384, K=3)
+        w5, b5 = load_conv_files(w5_path, b5_path, M=256, C=256, K=3)
+        w6, b6 = load_fc_files(w6_path, b6_path, input_features=9216, output_features=4096)
+        w7, b7 = load_fc_files(w7_path, b7_path, input_features=4096, output_features=4096)
+        w8, b8 = load_fc_files(w8_path, b8_path, input_features=4096, output_features=1000)
     
     # --- Diagnostic Check ---
     if not image_dir.is_dir():
@@ -305,82 +309,34 @@ def main():
         sys.exit(1)
     print(f"\n✅ Diagnostic OK: Found {len(image_files)} images to process.")
 
-    # --- Main loop to process each image ---
-    for image_path in image_files:
-        print(f"\n\n{'='*25} Processing Image: {image_path.name} {'='*25}")
-        image_output_dir = output_dir / image_path.stem
-        step = 0
-        try:
-            # --- STAGE 0: Input ---
-            img = Image.open(image_path).convert('RGB').resize((227, 227), Image.Resampling.BILINEAR)
-            ifmap = np.vectorize(float_to_q313_int16)(np.array(img).astype(np.float32) / 255.0)
-            save_stage_outputs(f"{step:02d}_input", ifmap, image_output_dir); step += 1
-            
-            # --- LAYER 1 ---
-            conv1 = conv2d_q313(ifmap, w1, b1, kernel_size=11, stride=4)
-            save_stage_outputs(f"{step:02d}_conv1", conv1, image_output_dir); step += 1
-            relu1 = apply_relu(conv1)
-            save_stage_outputs(f"{step:02d}_relu1", relu1, image_output_dir); step += 1
-            max1 = max_pooling_3d(relu1, pool_size=3, stride=2)
-            save_stage_outputs(f"{step:02d}_maxpool1", max1, image_output_dir); step += 1
-            
-            # --- LAYER 2 ---
-            pad1 = apply_padding(max1, pad=2)
-            conv2 = conv2d_q313(pad1, w2, b2, kernel_size=5, stride=1)
-            save_stage_outputs(f"{step:02d}_conv2", conv2, image_output_dir); step += 1
-            relu2 = apply_relu(conv2)
-            save_stage_outputs(f"{step:02d}_relu2", relu2, image_output_dir); step += 1
-            max2 = max_pooling_3d(relu2, pool_size=3, stride=2)
-            save_stage_outputs(f"{step:02d}_maxpool2", max2, image_output_dir); step += 1
-            
-            # --- LAYER 3 ---
-            pad2 = apply_padding(max2, pad=1)
-            conv3 = conv2d_q313(pad2, w3, b3, kernel_size=3, stride=1)
-            save_stage_outputs(f"{step:02d}_conv3", conv3, image_output_dir); step += 1
-            relu3 = apply_relu(conv3)
-            save_stage_outputs(f"{step:02d}_relu3", relu3, image_output_dir); step += 1
-            
-            # --- LAYER 4 ---
-            pad3 = apply_padding(relu3, pad=1)
-            conv4 = conv2d_q313(pad3, w4, b4, kernel_size=3, stride=1)
-            save_stage_outputs(f"{step:02d}_conv4", conv4, image_output_dir); step += 1
-            relu4 = apply_relu(conv4)
-            save_stage_outputs(f"{step:02d}_relu4", relu4, image_output_dir); step += 1
-            
-            # --- LAYER 5 ---
-            pad4 = apply_padding(relu4, pad=1)
-            conv5 = conv2d_q313(pad4, w5, b5, kernel_size=3, stride=1)
-            save_stage_outputs(f"{step:02d}_conv5", conv5, image_output_dir); step += 1
-            relu5 = apply_relu(conv5)
-            save_stage_outputs(f"{step:02d}_relu5", relu5, image_output_dir); step += 1
-            max3 = max_pooling_3d(relu5, pool_size=3, stride=2)
-            save_stage_outputs(f"{step:02d}_maxpool3", max3, image_output_dir); step += 1
-            
-            # --- Flatten & FC Layers ---
-            flattened_vector = max3.flatten()
-            fc6 = fully_connected_layer(flattened_vector, w6, b6)
-            save_fc_output(f"{step:02d}_fc6", fc6, image_output_dir); step += 1
-            relu6 = apply_relu(fc6)
-            save_fc_output(f"{step:02d}_relu6", relu6, image_output_dir); step += 1
-            fc7 = fully_connected_layer(relu6, w7, b7)
-            save_fc_output(f"{step:02d}_fc7", fc7, image_output_dir); step += 1
-            relu7 = apply_relu(fc7)
-            save_fc_output(f"{step:02d}_relu7", relu7, image_output_dir); step += 1
-            fc8 = fully_connected_layer(relu7, w8, b8)
-            save_fc_output(f"{step:02d}_fc8_output", fc8, image_output_dir); step += 1
-
-            # --- Final Prediction ---
-            top5_indices = np.argsort(fc8)[::-1][:5]
-            print("\n" + "="*20 + f" TOP 5 PREDICTIONS FOR: {image_path.name} " + "="*20)
-            for i, idx in enumerate(top5_indices):
-                class_name = class_names.get(str(idx), "Unknown Class")
-                marker = "🏆" if i == 0 else f"  {i+1}."
-                print(f"{marker} Class: {class_name.replace('_', ' ').title()} (Index: {idx}, Score: {fc8[idx]})")
-            print("="*70)
-
-        except Exception as e:
-            print(f"\n❌ An error occurred while processing {image_path.name}: {e}", file=sys.stderr)
-            print("  Skipping to the next image.", file=sys.stderr)
+    # --- Main loop: each worker runs a contiguous share of the images ---
+    # Conv weights are hashed once; stage keys reuse these digests.
+    conv_layers = {'conv1': (w1, b1), 'conv2': (w2, b2), 'conv3': (w3, b3), 'conv4': (w4, b4), 'conv5': (w5, b5)}
+    digests = {name: content_hash(w, b) for name, (w, b) in conv_layers.items()} if stage_cache else {}
+    weights = {'conv1': w1, 'conv2': w2, 'conv3': w3, 'conv4': w4, 'conv5': w5, 'fc1': w6, 'fc2': w7, 'fc3': w8}
+    biases = {'conv1': b1, 'conv2': b2, 'conv3': b3, 'conv4': b4, 'conv5': b5, 'fc1': b6, 'fc2': b7, 'fc3': b8}
+    # Only dumped stages are materialized; the others (and every padding) fuse into their producers.
+    keep = {name for name in feature_names if dump_levels[name] != "none"}
+    # conv1 sees only 8-bit pixel codes: its products come from a table kept next to the weights.
+    lut_dir = Path(bundle_str).parent if bundle_str else w1_path.parent
+    product_luts = {'conv1': load_product_lut(w1, lut_dir)}
+    features = GraphExecutor(ALEXNET_FEATURES, weights, biases, keep=keep, conv_workers=conv_workers,
+                             stage_cache=stage_cache, digests=digests, space_to_depth=True,
+                             product_luts=product_luts)
+    classifier = GraphExecutor(CLASSIFIER_GRAPH, weights, biases)
+    print(f"  - Layer graph: {describe_plan(features.steps)} | {describe_plan(classifier.steps)}")
+    context = {
+        'features': features, 'classifier': classifier, 'class_names': class_names,
+        'output_dir': output_dir, 'dump_levels': dump_levels, 'writer_threads': writer_threads,
+        'archive': use_archive, 'draft': draft,
+        'input_cache': stage_cache,   # quantized inputs share the stage cache
+    }
+    batches = split_batches(image_files, image_workers)
+    batch_results = {}
+    for predictions in run_batch(process_image_batch, batches, context, workers=image_workers):
+        batch_results.update(predictions)
+    results_path = save_batch_results(batch_results, output_dir)
+    print(f"\n✅ Aggregated top-5 results for {len(batch_results)} image(s) saved to: {results_path}")
 
     print("\n\n✨ AlexNet batch processing finished successfully! ✨")
 
@@ -11,41 +11,15 @@ import json
 import numpy as np
 from pathlib import Path
 
-# --------------------------------------------------------------------
-# Universal Fixed-Point and I/O Helper Functions
-# --------------------------------------------------------------------
-
-def bin16_to_int16(binstr: str) -> np.int16:
-    """Converts a 16-bit two's-complement binary string to a signed 16-bit integer."""
-    val = int(binstr, 2)
-    if val & 0x8000:
-        val -= 1 << 16
-    return np.int16(val)
-
-def int16_to_bin16(x: np.int16) -> str:
-    """Converts a signed 16-bit integer to a 16-bit two's-complement binary string."""
-    return format(np.uint16(x).item(), "016b")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from q313_engine import fully_connected_q313_blocked
+from model_bundle import BUNDLE_NAME, load_alexnet_bundle
+from bin16_codec import read_bin16_file, write_bin16_file
 
 # --------------------------------------------------------------------
 # Core Neural Network Layer Implementations
 # --------------------------------------------------------------------
 
-def fixed_mul_q313(a: np.ndarray, b: np.ndarray) -> np.ndarray:
-    """
-    Element-wise multiplies two Q3.13 int16 arrays with custom bit-preserving truncation.
-    """
-    prod32 = a.astype(np.int32) * b.astype(np.int32)
-    prod32_unsigned = prod32.view(np.uint32)
-    
-    value_mask = np.uint32(0x0FFFE000)
-    sign_mask = np.uint32(0x80000000)
-    
-    value_part = (prod32_unsigned & value_mask) >> 13
-    sign_part = (prod32_unsigned & sign_mask) >> 16
-    
-    final_result_unsigned = sign_part | value_part
-    return final_result_unsigned.astype(np.int16)
-
 def apply_relu(data: np.ndarray) -> np.ndarray:
     """Applies the ReLU activation function to a Q3.13 fixed-point array."""
     return np.maximum(data, np.int16(0))
@@ -54,28 +28,32 @@ def fully_connected_layer(input_vector: np.ndarray, weights: np.ndarray, biases:
     """
     Performs a fully-connected layer operation with custom fixed-point arithmetic.
     """
-    n_output = weights.shape[1]
-    output_vector = np.zeros(n_output, dtype=np.int64)
-
-    for j in range(n_output):
-        weight_col = weights[:, j]
-        products = fixed_mul_q313(input_vector, weight_col)
-        output_vector[j] = products.astype(np.int64).sum()
-
-    output_vector += biases.astype(np.int64)
-    
-    INT16_MIN, INT16_MAX = -32768, 32767
-    clamped_output = np.clip(output_vector, INT16_MIN, INT16_MAX)
-    
-    return clamped_output.astype(np.int16)
+    return fully_connected_q313_blocked(input_vector, weights, biases)
 
 # --------------------------------------------------------------------
 # Main Orchestrator for the FCN
 # --------------------------------------------------------------------
 
 def load_fcn_weights(weights_dir: Path):
-    """Loads only the fully-connected layer weights and biases."""
+    """
+    Loads only the fully-connected layer weights and biases.
+
+    A binary model bundle (see `model_bundle.py`) in the directory is memory-mapped
+    instead of parsing the per-line `.txt` files.
+    """
     print("\n--- Loading FCN weights and biases ---")
+
+    bundle_path = weights_dir / BUNDLE_NAME
+    if bundle_path.is_file():
+        try:
+            all_w, all_b = load_alexnet_bundle(bundle_path)
+            w = {key: all_w[key] for key in ('fc1', 'fc2', 'fc3')}
+            b = {key: all_b[key] for key in ('fc1', 'fc2', 'fc3')}
+            print(f"✅ Memory-mapped FCN weights and biases from {bundle_path.name}.")
+            return w, b
+        except Exception as e:
+            print(f"❌ FATAL ERROR loading model bundle: {e}", file=sys.stderr)
+            sys.exit(1)
     
     def load_fc(in_feat, out_feat, name):
         w_path = weights_dir / f"{name}_weights.pth.txt"
@@ -85,9 +63,9 @@ def load_fcn_weights(weights_dir: Path):
             print(f"❌ FATAL ERROR: Weight file not found for {name} at {w_path}", file=sys.stderr)
             sys.exit(1)
             
-        w_flat = np.array([bin16_to_int16(line) for line in w_path.read_text().splitlines() if line.strip()])
+        w_flat = read_bin16_file(w_path)
         weights = w_flat.reshape(out_feat, in_feat).transpose()
-        biases = np.array([bin16_to_int16(line) for line in b_path.read_text().splitlines() if line.strip()])
+        biases = read_bin16_file(b_path)
         
         print(f"  - Loaded {name} weights: {weights.shape}, biases: {biases.shape}")
         return weights, biases
@@ -148,10 +126,7 @@ def main():
     # --- Load Input Data ---
     print(f"\n--- Loading input data from: {input_file_path} ---")
     try:
-        input_data = np.array(
-            [bin16_to_int16(line) for line in input_file_path.read_text().splitlines() if line.strip()],
-            dtype=np.int16
-        )
+        input_data = read_bin16_file(input_file_path)
         if input_data.shape[0] != 9216:
             print(f"  ❗️ Warning: Input data shape is {input_data.shape}, expected (9216,).")
         else:
@@ -169,9 +144,7 @@ def main():
     # --- Save Final Output ---
     print(f"\n--- Saving final scores to: {output_file_path} ---")
     try:
-        with output_file_path.open("w") as f:
-            for score in final_scores:
-                f.write(int16_to_bin16(score) + "\n")
+        write_bin16_file(output_file_path, final_scores)
         print("✅ Final scores saved successfully.")
         
         # --- Display Top 5 Predictions with Class Names ---
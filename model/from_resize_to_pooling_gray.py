@@ -4,6 +4,11 @@ import numpy as np
 from pathlib import Path
 from PIL import Image
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "utils"))
+from bin16_codec import read_bin16_file, write_bin16_file
+from q313_engine import max_pool_q313
+from feature_render import q313_to_float
+
 # ------------------------- Universal Helper Functions -------------------------
 
 def float_to_q313_int16(val: float) -> np.int16:
@@ -14,17 +19,6 @@ def float_to_q313_int16(val: float) -> np.int16:
     scaled_val = int(round(val * (2**13)))
     return np.int16(scaled_val)
 
-def int16_to_bin16(x: np.int16) -> str:
-    """Converts a signed 16-bit integer to its 16-bit binary string."""
-    return format(np.uint16(x).item(), "016b")
-
-def bin16_to_int16(bin_str: str) -> np.int16:
-    """Converts a 16-bit binary string to a signed 16-bit integer."""
-    val = int(bin_str, 2)
-    if val & 0x8000:
-        val -= 1 << 16
-    return np.int16(val)
-
 def q313_int16_to_float(q_val: np.int16) -> float:
     """Converts a Q3.13 signed 16-bit integer back to a float."""
     return float(q_val) / (2**13)
@@ -57,18 +51,7 @@ def apply_relu(data: np.ndarray) -> np.ndarray:
 
 def max_pooling_3d(input_3d: np.ndarray, pool_size: int, stride: int) -> np.ndarray:
     """Performs 3D max pooling on the input array (H, W, C)."""
-    H, W, C = input_3d.shape
-    out_H = (H - pool_size) // stride + 1
-    out_W = (W - pool_size) // stride + 1
-    pooled = np.zeros((out_H, out_W, C), dtype=input_3d.dtype)
-    
-    for c in range(C):
-        for h in range(out_H):
-            for w in range(out_W):
-                h_start, w_start = h * stride, w * stride
-                window = input_3d[h_start:h_start + pool_size, w_start:w_start + pool_size, c]
-                pooled[h, w, c] = np.max(window)
-    return pooled
+    return max_pool_q313(input_3d, pool_size, stride)
 
 # ------------------------- Stage Output & Visualization -------------------------
 
@@ -83,11 +66,8 @@ def save_and_visualize_stage(stage_name: str, data_array: np.ndarray, base_outpu
     # 2. Save the raw Q3.13 data to a .txt file
     txt_output_path = stage_dir / f"{stage_name}_output.txt"
     try:
-        with txt_output_path.open("w") as f:
-            # Flatten C,H,W style for consistency
-            transposed_data = np.transpose(data_array, (2, 0, 1))
-            for val in transposed_data.flatten():
-                f.write(int16_to_bin16(val) + "\n")
+        transposed_data = np.transpose(data_array, (2, 0, 1))
+        write_bin16_file(txt_output_path, transposed_data)
         print(f"✅ Data saved to: {txt_output_path}")
     except IOError as e:
         print(f"❌ Error saving .txt file: {e}")
@@ -98,7 +78,7 @@ def save_and_visualize_stage(stage_name: str, data_array: np.ndarray, base_outpu
     try:
         H, W, C = data_array.shape
         # Convert Q3.13 integers back to floats for processing
-        float_data = np.vectorize(q313_int16_to_float)(data_array)
+        float_data = q313_to_float(data_array)
         
         # To create a single grayscale image, average the channels
         if C > 1:
@@ -155,9 +135,9 @@ def main():
     # --- 2. Load Weights and Biases ---
     print("\n[2] Loading weights and biases...")
     try:
-        weights_flat = np.array([bin16_to_int16(line) for line in weights_path.read_text().splitlines() if line.strip()])
+        weights_flat = read_bin16_file(weights_path)
         weights = weights_flat.reshape(M, 3, K, K).transpose(2, 3, 1, 0) # Reshape to K,K,C,M
-        biases = np.array([bin16_to_int16(line) for line in biases_path.read_text().splitlines() if line.strip()])
+        biases = read_bin16_file(biases_path)
         assert biases.shape[0] == M, f"Error: Expected {M} biases but found {biases.shape[0]}."
         print("✅ Weights and biases loaded.")
     except Exception as e:
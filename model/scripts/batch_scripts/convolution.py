@@ -8,18 +8,11 @@ import sys
 import numpy as np
 from pathlib import Path
 
-# ------------------------- Fixed-point & I/O Helpers -------------------------
-
-def bin16_to_int16(binstr: str) -> np.int16:
-    """Convert 16-bit two's-complement binary string to int16."""
-    val = int(binstr, 2)
-    if val & 0x8000:
-        val -= 1 << 16
-    return np.int16(val)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "utils"))
+from bin16_codec import read_bin16_file, write_bin16_file
+from tensor_file import TENSOR_SUFFIX, load_tensor, write_tensor
 
-def int16_to_bin16(x: np.int16) -> str:
-    """Convert int16 to a 16-bit two's-complement binary string."""
-    return format(np.uint16(x).item(), "016b")
+# ------------------------- Fixed-point & I/O Helpers -------------------------
 
 def fixed_mul_q313(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     """Element-wise multiply two Q3.13 int16 arrays."""
@@ -29,15 +22,15 @@ def fixed_mul_q313(a: np.ndarray, b: np.ndarray) -> np.ndarray:
 
 def load_txt_int16(path: Path) -> np.ndarray:
     """Load a text file of 16-bit binary lines into a 1-D int16 NumPy array."""
-    with path.open("r") as f:
-        return np.array([bin16_to_int16(line.strip()) for line in f if line.strip()], dtype=np.int16)
+    return read_bin16_file(path)
 
 def save_data(data: np.ndarray, output_path: Path):
-    """Saves a NumPy array into the flat binary string format."""
+    """Saves an (H, W, C) array as a `.q313` tensor file or in the flat binary string format."""
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w") as f:
-        for val in data.flatten():
-            f.write(int16_to_bin16(val) + "\n")
+    if output_path.suffix == TENSOR_SUFFIX:
+        write_tensor(output_path, data, layout="HWC")
+    else:
+        write_bin16_file(output_path, data)
 
 # ------------------------- Generic 2D Convolution -------------------------
 
@@ -71,6 +64,7 @@ def main():
         # --- Get Paths and Parameters Interactively ---
         ifmap_dir_str = input("Enter the path to the INPUT FEATURE MAP directory: ").strip()
         output_dir_str = input("Enter the path to the OUTPUT directory: ").strip()
+        output_format = input(f"Enter the OUTPUT format: [T]ext or [B]inary {TENSOR_SUFFIX} (default: same as input): ").strip().upper()
         weights_path_str = input("Enter the path to the WEIGHTS file: ").strip()
         bias_path_str = input("Enter the path to the BIAS file: ").strip()
 
@@ -99,9 +93,9 @@ def main():
         print("✅ Weights and biases loaded and reshaped successfully.")
 
         # --- Find all input files ---
-        ifmap_files = list(ifmap_dir.glob('*.txt'))
+        ifmap_files = sorted(p for p in ifmap_dir.iterdir() if p.suffix in (".txt", TENSOR_SUFFIX))
         if not ifmap_files:
-            print(f"❌ Error: No '.txt' files found in '{ifmap_dir}'.", file=sys.stderr)
+            print(f"❌ Error: No '.txt' or '{TENSOR_SUFFIX}' files found in '{ifmap_dir}'.", file=sys.stderr)
             sys.exit(1)
             
         print(f"\n✅ Found {len(ifmap_files)} feature maps to process.")
@@ -109,17 +103,23 @@ def main():
         # --- Process each input feature map ---
         for ifmap_path in ifmap_files:
             print(f"\n--- Processing {ifmap_path.name} ---")
-            ifmap_flat = load_txt_int16(ifmap_path)
-            
-            expected_ifmap_size = H * W * C
-            assert len(ifmap_flat) == expected_ifmap_size, f"IFMAP size mismatch in {ifmap_path.name}"
-            
-            ifmap = ifmap_flat.reshape(C, H, W).transpose(1, 2, 0)
+            if ifmap_path.suffix == TENSOR_SUFFIX:
+                ifmap = load_tensor(ifmap_path, layout="HWC")
+                assert ifmap.shape == (H, W, C), f"IFMAP shape mismatch in {ifmap_path.name}"
+            else:
+                ifmap_flat = load_txt_int16(ifmap_path)
+
+                expected_ifmap_size = H * W * C
+                assert len(ifmap_flat) == expected_ifmap_size, f"IFMAP size mismatch in {ifmap_path.name}"
+
+                ifmap = ifmap_flat.reshape(C, H, W).transpose(1, 2, 0)
             
             conv_out = conv2d_q313(ifmap, weights, biases, stride=S)
             print(f"  - Convolution complete. New shape is {conv_out.shape}")
             
             output_path = output_dir / ifmap_path.name
+            if output_format in ("T", "B"):
+                output_path = output_path.with_suffix(TENSOR_SUFFIX if output_format == "B" else ".txt")
             save_data(conv_out, output_path)
             print(f"  - Saved output to {output_path}")
 
@@ -7,23 +7,21 @@ import sys
 import numpy as np
 from pathlib import Path
 
-# ------------------------- Universal Helper Functions -------------------------
-
-def bin16_to_int16(binstr: str) -> np.int16:
-    """Converts a 16-bit two's-complement binary string to int16."""
-    val = int(binstr, 2)
-    if val & 0x8000:
-        val -= 1 << 16
-    return np.int16(val)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "utils"))
+from bin16_codec import read_bin16_file, write_bin16_file
+from tensor_file import TENSOR_SUFFIX, load_tensor, write_tensor
 
-def int16_to_bin16(x: np.int16) -> str:
-    """Converts int16 to a 16-bit two's-complement binary string."""
-    return format(np.uint16(x).item(), "016b")
+# ------------------------- Universal Helper Functions -------------------------
 
 def load_data(file_path: Path, shape: tuple) -> np.ndarray:
-    """Loads a flat binary text file and reshapes it to the given dimensions."""
-    with file_path.open("r") as f:
-        data = np.array([bin16_to_int16(line.strip()) for line in f if line.strip()], dtype=np.int16)
+    """Loads a `.q313` tensor file or a flat binary text file with the given (H, W, C) dimensions."""
+    if file_path.suffix == TENSOR_SUFFIX:
+        data = load_tensor(file_path, layout="HWC")
+        if data.shape != shape:
+            raise ValueError(f"Shape mismatch in {file_path.name}: file holds {data.shape}, expected {shape}.")
+        return data
+
+    data = read_bin16_file(file_path)
     
     expected_elements = np.prod(shape)
     if data.size != expected_elements:
@@ -32,11 +30,12 @@ def load_data(file_path: Path, shape: tuple) -> np.ndarray:
     return data.reshape(shape)
 
 def save_data(data: np.ndarray, output_path: Path):
-    """Saves a NumPy array into the flat binary string format."""
+    """Saves an (H, W, C) array as a `.q313` tensor file or in the flat binary string format."""
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    with output_path.open("w") as f:
-        for val in data.flatten():
-            f.write(int16_to_bin16(val) + "\n")
+    if output_path.suffix == TENSOR_SUFFIX:
+        write_tensor(output_path, data, layout="HWC")
+    else:
+        write_bin16_file(output_path, data)
 
 # ------------------------- Core Padding Operation -------------------------
 
@@ -56,6 +55,7 @@ def main():
         # --- Get Paths and Parameters Interactively ---
         input_dir_str = input("Enter the path to the INPUT directory: ").strip()
         output_dir_str = input("Enter the path to the OUTPUT directory: ").strip()
+        output_format = input(f"Enter the OUTPUT format: [T]ext or [B]inary {TENSOR_SUFFIX} (default: same as input): ").strip().upper()
         
         print("\nPlease provide the input tensor dimensions:")
         H = int(input("  Enter Input Height (H): "))
@@ -69,9 +69,9 @@ def main():
         output_dir = Path(output_dir_str)
         shape = (H, W, C)
 
-        input_files = list(input_dir.glob('*.txt'))
+        input_files = sorted(p for p in input_dir.iterdir() if p.suffix in (".txt", TENSOR_SUFFIX))
         if not input_files:
-            print(f"❌ Error: No '.txt' files found in '{input_dir}'.", file=sys.stderr)
+            print(f"❌ Error: No '.txt' or '{TENSOR_SUFFIX}' files found in '{input_dir}'.", file=sys.stderr)
             sys.exit(1)
 
         print(f"\n✅ Found {len(input_files)} files to process in '{input_dir}'.")
@@ -87,6 +87,8 @@ def main():
             print(f"  - Applied padding. New shape is {padded_data.shape}")
             
             output_path = output_dir / input_path.name
+            if output_format in ("T", "B"):
+                output_path = output_path.with_suffix(TENSOR_SUFFIX if output_format == "B" else ".txt")
             save_data(padded_data, output_path)
             print(f"  - Saved output to {output_path}")
 
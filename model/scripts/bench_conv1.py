@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Times the conv1 kernels of the Q3.13 engine on one image and checks that they agree.
+
+Every kernel must reproduce the reference `conv2d_q313_blocked` output bit for
+bit; the speedup is reported against it, with its default memory budget.
+"""
+import sys
+import time
+import numpy as np
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from image_ingest import load_image_q313
+from model_bundle import load_alexnet_bundle
+from product_lut import build_product_lut, conv2d_q313_lut
+from q313_engine import conv2d_q313_blocked, conv2d_q313_s2d
+
+# ------------------------- Timing -------------------------
+
+def best_time(fn, repeats: int):
+    """Returns (fastest wall time in seconds, result of the last call)."""
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def conv1_kernels(weights: np.ndarray, biases: np.ndarray, stride: int) -> dict:
+    """Returns the conv1 kernels to compare, by name; the first one is the reference."""
+    lut = build_product_lut(weights)
+    K = weights.shape[0]
+    return {
+        "blocked (im2col)": lambda x: conv2d_q313_blocked(x, weights, biases, stride),
+        "space-to-depth": lambda x: conv2d_q313_s2d(x, weights, biases, stride),
+        "product table": lambda x: conv2d_q313_lut(x, lut, biases, K, stride),
+    }
+
+# ------------------------- Main Driver -------------------------
+
+def main():
+    print("🚀 --- Conv1 Kernel Benchmark --- 🚀")
+    image_path = Path(input("Enter path to the INPUT image: ").strip())
+    bundle_path = Path(input("Enter path to the weight BUNDLE (.bundle): ").strip())
+    repeats_input = input("Enter the number of timed runs per kernel (default: 5): ").strip()
+
+    try:
+        repeats = max(1, int(repeats_input)) if repeats_input else 5
+        weights, biases = load_alexnet_bundle(bundle_path)
+        ifmap = load_image_q313(image_path)
+    except (ValueError, FileNotFoundError, KeyError) as e:
+        print(f"\n❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    w = np.ascontiguousarray(weights["conv1"], dtype=np.int16)
+    b = np.ascontiguousarray(biases["conv1"], dtype=np.int16)
+    K, _, C, M = w.shape
+    print(f"🔄 conv1: {ifmap.shape[0]}x{ifmap.shape[1]}x{C} input, {M} filters of {K}x{K}, stride 4")
+
+    reference_time, reference = None, None
+    for name, kernel in conv1_kernels(w, b, 4).items():
+        elapsed, result = best_time(lambda: kernel(ifmap), repeats)
+        if reference is None:
+            reference_time, reference = elapsed, result
+        exact = np.array_equal(result, reference)
+        print(f"  {'✅' if exact else '❌'} {name:<20} {elapsed * 1000:8.1f} ms   "
+              f"x{reference_time / elapsed:.2f}{'' if exact else '   (MISMATCH)'}")
+
+if __name__ == "__main__":
+    main()
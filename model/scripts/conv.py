@@ -3,16 +3,10 @@ import sys
 import numpy as np
 from pathlib import Path
 
-# ------------------------- Fixed‑Point Helpers -------------------------
-def bin16_to_int16(binstr: str) -> np.int16:
-    val = int(binstr, 2)
-    if val & 0x8000:
-        val -= 1 << 16
-    return np.int16(val)
-
-def int16_to_bin16(x: np.int16) -> str:
-    return format(np.uint16(x).item(), "016b")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from bin16_codec import read_bin16_file, write_bin16_file
 
+# ------------------------- Fixed‑Point Helpers -------------------------
 def fixed_mul_q313(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     prod32 = a.astype(np.int32) * b.astype(np.int32)
     shifted = prod32 >> 13
@@ -44,8 +38,7 @@ def conv2d_q313(ifmap, weights, biases, kernel_size, stride):
 
 # ------------------------- I/O -------------------------
 def load_txt_int16(path: Path) -> np.ndarray:
-    with path.open("r") as f:
-        return np.array([bin16_to_int16(line.strip()) for line in f], dtype=np.int16)
+    return read_bin16_file(path)
 
 def main():
     print("=== Q3.13 Convolution Runner ===")
@@ -79,11 +72,7 @@ def main():
     OH, OW, _ = ofmap.shape
 
     # Write output
-    with output_path.open("w") as f:
-        for m in range(M):
-            fmap = ofmap[:, :, m].ravel()
-            for val in fmap:
-                f.write(int16_to_bin16(val) + "\n")
+    write_bin16_file(output_path, ofmap.transpose(2, 0, 1))
 
     print(f"✅ Done. Output shape: ({OH}, {OW}, {M}) → {OH*OW*M} lines")
     print(f"📁 Saved to: {output_path}")
@@ -12,20 +12,12 @@ import sys
 import numpy as np
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from bin16_codec import read_bin16_file, write_bin16_file
+
 # --------------------------------------------------------------------
 # Fixed-point helpers (Q3.13 stored in int16)
 # --------------------------------------------------------------------
-def bin16_to_int16(binstr: str) -> np.int16:
-    """Convert a 16-bit two's-complement binary string to int16."""
-    val = int(binstr, 2)
-    if val & 0x8000:  # if sign bit set, convert to negative
-        val -= 1 << 16
-    return np.int16(val)
-
-def int16_to_bin16(x: np.int16) -> str:
-    """Convert int16 to a 16-bit two's-complement binary string."""
-    return format(np.uint16(x).item(), "016b")
-
 def fixed_mul_q313(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     """
     Element-wise multiply two Q3.13 int16 arrays.
@@ -75,8 +67,7 @@ def conv2d_q313(ifmap, weights, biases, stride):
 # --------------------------------------------------------------------
 def load_txt_int16(path: Path) -> np.ndarray:
     """Load a text file of 16-bit binary lines into a 1-D int16 NumPy array."""
-    with path.open("r") as f:
-        return np.array([bin16_to_int16(line.strip()) for line in f if line.strip()], dtype=np.int16)
+    return read_bin16_file(path)
 
 # --------------------------------------------------------------------
 # Main driver
@@ -138,11 +129,7 @@ def main():
         # ---------- write ----------
         print(f"Writing output to: {output_path}")
         OH, OW, _ = conv_out.shape
-        with output_path.open("w") as f:
-            for m in range(M):
-                fmap = conv_out[:, :, m].ravel()
-                for val in fmap:
-                    f.write(int16_to_bin16(val) + "\n")
+        write_bin16_file(output_path, conv_out.transpose(2, 0, 1))
 
         print(f"\n✅ Done. Output dimensions: ({OH}, {OW}, {M}). Total lines written: {OH * OW * M}")
 
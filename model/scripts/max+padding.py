@@ -1,31 +1,11 @@
+import sys
 import numpy as np
 import os
+from pathlib import Path
 
-def binary_to_q313(binary_str):
-    """
-    Convert 16-bit binary string (Q3.13 format) to signed integer.
-    Args:
-        binary_str: 16-bit binary string
-    Returns:
-        int: Signed integer value
-    """
-    if len(binary_str) != 16:
-        raise ValueError(f"Binary string must be 16 bits, got {len(binary_str)}")
-    if binary_str[0] == '1':  # Negative number
-        return -(int(''.join('1' if b == '0' else '0' for b in binary_str), 2) + 1)
-    return int(binary_str, 2)
-
-def q313_to_binary(value):
-    """
-    Convert integer back to 16-bit Q3.13 binary string.
-    Args:
-        value: Integer value to convert
-    Returns:
-        str: 16-bit binary string
-    """
-    if value < 0:  # Two's complement for negative numbers
-        return bin((abs(value) ^ 0xFFFF) + 1)[2:].zfill(16)
-    return bin(value)[2:].zfill(16)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from bin16_codec import read_bin16_file, write_bin16_file
+from q313_engine import max_pool_q313
 
 def read_input_binary(file_path, H, W, C):
     """
@@ -38,14 +18,12 @@ def read_input_binary(file_path, H, W, C):
     Returns:
         numpy.ndarray: Reshaped array of integers
     """
-    with open(file_path, 'r') as f:
-        lines = [line.strip() for line in f if line.strip()]
+    data = read_bin16_file(file_path)
     
-    if len(lines) != H * W * C:
-        raise ValueError(f"Expected {H*W*C} values, got {len(lines)}")
+    if data.size != H * W * C:
+        raise ValueError(f"Expected {H*W*C} values, got {data.size}")
     
-    data = [binary_to_q313(line) if len(line) == 16 else 0 for line in lines]
-    return np.array(data, dtype=int).reshape(H, W, C)
+    return data.astype(int).reshape(H, W, C)
 
 import numpy as np
 
@@ -62,31 +40,8 @@ def max_pooling_3d(input_3d, pool_size=3, stride=2, padding=2):
     Returns:
         numpy.ndarray: Result after max pooling and then padding
     """
-    H, W, C = input_3d.shape
-
-    # Calculate output dimensions for max pooling
-    out_H = (H - pool_size) // stride + 1
-    out_W = (W - pool_size) // stride + 1
-
-    pooled = np.zeros((out_H, out_W, C), dtype=input_3d.dtype)
-
-    for c in range(C):
-        for h in range(out_H):
-            for w in range(out_W):
-                h_start = h * stride
-                w_start = w * stride
-                window = input_3d[h_start:h_start + pool_size,
-                                  w_start:w_start + pool_size,
-                                  c]
-                pooled[h, w, c] = np.max(window)
-
-    # Apply padding after pooling
-    padded = np.pad(pooled,
-                    ((padding, padding), (padding, padding), (0, 0)),
-                    mode='constant',
-                    constant_values=0)
-
-    return padded
+    # Pool straight into the interior of the zero-padded output buffer
+    return max_pool_q313(input_3d, pool_size, stride, pad=padding)
 
 '''
 def max_pooling_3d(input_3d, pool_size=3, stride=2, padding=2):
@@ -132,10 +87,7 @@ def write_output_binary(output, file_path):
         output: Array to save
         file_path: Output file path
     """
-    flattened = output.flatten()
-    with open(file_path, 'w') as f:
-        for value in flattened:
-            f.write(q313_to_binary(value) + '\n')
+    write_bin16_file(file_path, output)
 
 def read_parameters(param_file):
     """
@@ -10,23 +10,14 @@ import sys
 import numpy as np
 from pathlib import Path
 
-# ------------------------- Universal Helper Functions -------------------------
-
-def bin16_to_int16(binstr: str) -> np.int16:
-    """Converts a 16-bit two's-complement binary string to int16."""
-    val = int(binstr, 2)
-    if val & 0x8000:  # if sign bit is set, convert to negative
-        val -= 1 << 16
-    return np.int16(val)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from bin16_codec import read_bin16_file, write_bin16_file
 
-def int16_to_bin16(x: np.int16) -> str:
-    """Converts int16 to a 16-bit two's-complement binary string."""
-    return format(np.uint16(x).item(), "016b")
+# ------------------------- Universal Helper Functions -------------------------
 
 def load_data(file_path: Path, shape: tuple) -> np.ndarray:
     """Loads a flat binary text file and reshapes it to the given dimensions."""
-    with file_path.open("r") as f:
-        data = np.array([bin16_to_int16(line.strip()) for line in f if line.strip()], dtype=np.int16)
+    data = read_bin16_file(file_path)
     
     expected_elements = np.prod(shape)
     if data.size != expected_elements:
@@ -36,9 +27,7 @@ def load_data(file_path: Path, shape: tuple) -> np.ndarray:
 
 def save_data(data: np.ndarray, output_path: Path):
     """Saves a NumPy array into the flat binary string format."""
-    with output_path.open("w") as f:
-        for val in data.flatten():
-            f.write(int16_to_bin16(val) + "\n")
+    write_bin16_file(output_path, data)
 
 # ------------------------- Core Padding Operation -------------------------
 
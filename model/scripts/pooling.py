@@ -10,23 +10,15 @@ import sys
 import numpy as np
 from pathlib import Path
 
-# ------------------------- Universal Helper Functions -------------------------
-
-def bin16_to_int16(binstr: str) -> np.int16:
-    """Converts a 16-bit two's-complement binary string to int16."""
-    val = int(binstr, 2)
-    if val & 0x8000:  # if sign bit is set, convert to negative
-        val -= 1 << 16
-    return np.int16(val)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "utils"))
+from bin16_codec import read_bin16_file, write_bin16_file
+from q313_engine import max_pool_q313
 
-def int16_to_bin16(x: np.int16) -> str:
-    """Converts int16 to a 16-bit two's-complement binary string."""
-    return format(np.uint16(x).item(), "016b")
+# ------------------------- Universal Helper Functions -------------------------
 
 def load_data(file_path: Path, shape: tuple) -> np.ndarray:
     """Loads a flat binary text file and reshapes it to the given dimensions."""
-    with file_path.open("r") as f:
-        data = np.array([bin16_to_int16(line.strip()) for line in f if line.strip()], dtype=np.int16)
+    data = read_bin16_file(file_path)
     
     expected_elements = np.prod(shape)
     if data.size != expected_elements:
@@ -36,9 +28,7 @@ def load_data(file_path: Path, shape: tuple) -> np.ndarray:
 
 def save_data(data: np.ndarray, output_path: Path):
     """Saves a NumPy array into the flat binary string format."""
-    with output_path.open("w") as f:
-        for val in data.flatten():
-            f.write(int16_to_bin16(val) + "\n")
+    write_bin16_file(output_path, data)
 
 # ------------------------- Core Max-Pooling Operation -------------------------
 
@@ -54,30 +44,7 @@ def max_pooling_3d(input_3d: np.ndarray, pool_size: int, stride: int) -> np.ndar
     Returns:
         np.ndarray: The tensor after max-pooling.
     """
-    H, W, C = input_3d.shape
-
-    # Calculate the dimensions of the output tensor
-    out_H = (H - pool_size) // stride + 1
-    out_W = (W - pool_size) // stride + 1
-    
-    # Initialize the output tensor with zeros
-    pooled = np.zeros((out_H, out_W, C), dtype=input_3d.dtype)
-    
-    # Iterate over each channel
-    for c in range(C):
-        # Iterate over the output height
-        for h in range(out_H):
-            # Iterate over the output width
-            for w in range(out_W):
-                # Define the current window
-                h_start = h * stride
-                w_start = w * stride
-                window = input_3d[h_start : h_start + pool_size, w_start : w_start + pool_size, c]
-                
-                # Find the maximum value in the window and assign it to the output
-                pooled[h, w, c] = np.max(window)
-                
-    return pooled
+    return max_pool_q313(input_3d, pool_size, stride)
 
 # ------------------------- Main Driver -------------------------
 
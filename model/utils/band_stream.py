@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Band-streaming convolution and pooling for inputs of any resolution.
+
+The drivers hold whole feature maps, which is fine at 227x227 but grows with
+the square of the input size. Here every layer is a generator over horizontal
+row bands of an (H, W, C) feature map, the way the accelerator consumes the
+ifmap in row segments:
+
+- a windowed layer (conv or max pooling with window R and stride U) keeps
+  only the rows its next output row still needs, R - U of them between
+  bands, and yields every output row as soon as its window is complete;
+- "pad" emits the zero rows above the first band and below the last one and
+  pads the columns of every band on the way through;
+- "relu" is applied to each band, or on the writeback of the conv before it.
+
+Layers are chained lazily, so pulling bands from the last layer pulls just
+enough rows through the ones before it. Memory is proportional to the band
+height and the frame width, never to the frame height. With a `.q313` input
+the frame itself is read band by band from its memory map, so the whole run
+is bounded. An image input is the exception: PIL decodes JPEG and PNG frames
+in full, so the decoded 8-bit frame stays in memory (only the RGB conversion
+and quantization are done per band); convert large images to `.q313` first
+to bound memory end to end. The output rows are bit-identical to running the
+same layers on the whole frame.
+"""
+import sys
+import numpy as np
+from pathlib import Path
+from PIL import Image
+
+from image_ingest import quantize_q313
+from layer_graph import ALEXNET_FEATURES
+from model_bundle import load_alexnet_bundle
+from q313_engine import DEFAULT_MEM_BUDGET, conv2d_q313_blocked, max_pool_q313
+from tensor_file import TENSOR_SUFFIX, encode_header, open_tensor
+
+DEFAULT_BAND_ROWS = 32
+
+# ------------------------- Band Sources -------------------------
+
+def iter_tensor_bands(tensor: np.ndarray, band_rows: int = DEFAULT_BAND_ROWS):
+    """Yields an (H, W, C) array, or `np.memmap`, as int16 bands of up to `band_rows` rows."""
+    if band_rows <= 0:
+        raise ValueError(f"Band height must be positive, got {band_rows}.")
+    for r0 in range(0, tensor.shape[0], band_rows):
+        yield np.array(tensor[r0:r0 + band_rows], dtype=np.int16)
+
+def iter_image_bands(image_path: Path, band_rows: int = DEFAULT_BAND_ROWS):
+    """
+    Yields an image at its native resolution as Q3.13 (rows, W, 3) bands.
+
+    Memory is not bounded by the band height here: PIL decodes the whole frame
+    in its native mode. Each band is cropped from it, converted to RGB and
+    quantized as it is yielded, with the same scaling as `load_image_q313`,
+    so no full-frame RGB or float copy is made.
+    """
+    if band_rows <= 0:
+        raise ValueError(f"Band height must be positive, got {band_rows}.")
+    with Image.open(image_path) as img:
+        W, H = img.size
+        for r0 in range(0, H, band_rows):
+            band = img.crop((0, r0, W, min(H, r0 + band_rows))).convert('RGB')
+            yield quantize_q313(np.asarray(band).astype(np.float32) / 255.0)
+
+# ------------------------- Streaming Layers -------------------------
+
+def stream_windows(bands, window: int, stride: int, op):
+    """
+    Slides a `window`-row window with `stride` down a stream of bands.
+
+    Whenever the buffered rows complete one or more windows, `op` is called
+    on exactly the rows those windows cover and its result is yielded. The
+    rows no later window needs are dropped, so at most `window - stride` rows
+    are carried from one band to the next.
+    """
+    pending = None
+    skip = 0
+    for band in bands:
+        if skip:
+            dropped = min(skip, len(band))
+            band, skip = band[dropped:], skip - dropped
+        pending = band if pending is None else np.concatenate((pending, band))
+        if len(pending) < window:
+            continue
+        n_out = (len(pending) - window) // stride + 1
+        yield op(np.ascontiguousarray(pending[:(n_out - 1) * stride + window]))
+        # A stride larger than the window can also skip rows of the next band.
+        skip = max(0, n_out * stride - len(pending))
+        pending = pending[n_out * stride:].copy()
+
+def stream_conv(bands, weights: np.ndarray, biases: np.ndarray, stride: int,
+                relu: bool = False, mem_budget: int = DEFAULT_MEM_BUDGET):
+    """Streaming `conv2d_q313_blocked`: yields the output rows of every completed window."""
+    K = weights.shape[0]
+    return stream_windows(bands, K, stride,
+                          lambda rows: conv2d_q313_blocked(rows, weights, biases, stride, mem_budget, relu=relu))
+
+def stream_maxpool(bands, pool_size: int, stride: int, relu: bool = False):
+    """Streaming `max_pool_q313`: yields the pooled rows of every completed window."""
+    return stream_windows(bands, pool_size, stride, lambda rows: max_pool_q313(rows, pool_size, stride, relu=relu))
+
+def stream_relu(bands):
+    """Applies ReLU to every band."""
+    for band in bands:
+        yield np.maximum(band, 0)
+
+def stream_pad(bands, pad: int):
+    """Zero-pads a stream of bands by `pad` rows above and below and `pad` columns on both sides."""
+    if pad == 0:
+        yield from bands
+        return
+    border = None
+    for band in bands:
+        if border is None:
+            border = np.zeros((pad, band.shape[1] + 2 * pad, band.shape[2]), dtype=band.dtype)
+            yield border
+        yield np.pad(band, ((0, 0), (pad, pad), (0, 0)))
+    if border is not None:
+        yield border
+
+# ------------------------- Graph Streams -------------------------
+
+def _stream_layers(graph: list, stop: str = None) -> list:
+    """Returns the layers up to and including `stop`, checking that each one can stream."""
+    names = [layer["name"] for layer in graph]
+    if stop is not None and stop not in names:
+        raise ValueError(f"Unknown stage '{stop}', expected one of {names}.")
+    layers = graph[:names.index(stop) + 1] if stop is not None else graph
+    for layer in layers:
+        if layer["op"] not in ("conv", "relu", "maxpool", "pad"):
+            raise ValueError(f"Layer '{layer['name']}' ({layer['op']}) needs the whole frame and cannot be streamed.")
+    return layers
+
+def stream_graph(graph: list, weights: dict, biases: dict, bands, stop: str = None,
+                 mem_budget: int = DEFAULT_MEM_BUDGET):
+    """
+    Chains the streaming layers of a graph over an input band stream.
+
+    A ReLU that directly follows a conv is applied on the conv writeback, as
+    `GraphExecutor` does. Returns the band stream of the last layer (`stop`,
+    or the end of the graph).
+    """
+    layers = _stream_layers(graph, stop)
+    i = 0
+    while i < len(layers):
+        layer = layers[i]
+        if layer["op"] == "conv":
+            relu = i + 1 < len(layers) and layers[i + 1]["op"] == "relu"
+            key = layer["weights"]
+            bands = stream_conv(bands, weights[key], biases[key], layer["stride"], relu, mem_budget)
+            i += 2 if relu else 1
+            continue
+        if layer["op"] == "maxpool":
+            bands = stream_maxpool(bands, layer["pool_size"], layer["stride"])
+        elif layer["op"] == "relu":
+            bands = stream_relu(bands)
+        else:
+            bands = stream_pad(bands, layer["pad"])
+        i += 1
+    return bands
+
+def stream_output_shape(graph: list, weights: dict, input_shape: tuple, stop: str = None) -> tuple:
+    """Returns the (H, W, C) shape a graph stream produces for an input of `input_shape`."""
+    H, W, C = input_shape
+    for layer in _stream_layers(graph, stop):
+        if layer["op"] == "conv":
+            K, _, _, C = weights[layer["weights"]].shape
+            H, W = (H - K) // layer["stride"] + 1, (W - K) // layer["stride"] + 1
+        elif layer["op"] == "maxpool":
+            K = layer["pool_size"]
+            H, W = (H - K) // layer["stride"] + 1, (W - K) // layer["stride"] + 1
+        elif layer["op"] == "pad":
+            H, W = H + 2 * layer["pad"], W + 2 * layer["pad"]
+        if H <= 0 or W <= 0:
+            raise ValueError(f"An input of {input_shape[0]}x{input_shape[1]} is too small for layer '{layer['name']}'.")
+    return H, W, C
+
+def write_band_stream(path: Path, bands, shape: tuple) -> int:
+    """
+    Writes a band stream to an HWC `.q313` file as the bands arrive.
+
+    The header is written first from the expected `shape`; a stream that ends
+    with a different number of rows raises `ValueError`. Returns the row count.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    with path.open("wb") as f:
+        f.write(encode_header(shape, layout="HWC"))
+        for band in bands:
+            if band.shape[1:] != tuple(shape[1:]):
+                raise ValueError(f"Band of shape {band.shape} does not match the output shape {tuple(shape)}.")
+            f.write(np.ascontiguousarray(band, dtype="<i2").tobytes())
+            rows += len(band)
+    if rows != shape[0]:
+        raise ValueError(f"The stream produced {rows} rows, expected {shape[0]}.")
+    return rows
+
+# ------------------------- Main Driver -------------------------
+
+def main():
+    """Streams an image or `.q313` feature map of any size through the AlexNet feature layers."""
+    print("🚀 --- Band-Streaming Q3.13 Feature Extractor --- 🚀")
+    input_path = Path(input("Enter path to the INPUT image or .q313 (HWC) tensor: ").strip())
+    bundle_path = Path(input("Enter path to the weight BUNDLE (.bundle): ").strip())
+    band_input = input(f"Enter the band height in input rows (default: {DEFAULT_BAND_ROWS}): ").strip()
+    stop = input("Enter the last stage to compute (default: maxpool3): ").strip() or "maxpool3"
+    default_output = input_path.with_name(f"{input_path.stem}_{stop}{TENSOR_SUFFIX}")
+    output_path = Path(input(f"Enter path for the OUTPUT tensor (default: {default_output}): ").strip() or default_output)
+
+    try:
+        band_rows = int(band_input) if band_input else DEFAULT_BAND_ROWS
+        weights, biases = load_alexnet_bundle(bundle_path)
+        if input_path.suffix == TENSOR_SUFFIX:
+            tensor, header = open_tensor(input_path)
+            if header["layout"] != "HWC":
+                raise ValueError(f"'{input_path.name}' has layout {header['layout']}; streaming needs HWC.")
+            input_shape = tuple(header["shape"])
+            bands = iter_tensor_bands(tensor, band_rows)
+        else:
+            with Image.open(input_path) as img:
+                input_shape = (img.height, img.width, 3)
+            bands = iter_image_bands(input_path, band_rows)
+        shape = stream_output_shape(ALEXNET_FEATURES, weights, input_shape, stop)
+        print(f"🔄 Streaming {input_shape[0]}x{input_shape[1]}x{input_shape[2]} -> "
+              f"{shape[0]}x{shape[1]}x{shape[2]} in bands of {band_rows} rows...")
+        write_band_stream(output_path, stream_graph(ALEXNET_FEATURES, weights, biases, bands, stop), shape)
+    except (ValueError, FileNotFoundError, KeyError) as e:
+        print(f"\n❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"✅ Output written to: {output_path}")
+
+if __name__ == "__main__":
+    main()
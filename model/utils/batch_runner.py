@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Image-level parallel batch runner for the AlexNet drivers.
+
+Images are independent, so a batch is spread over a pool of worker
+processes. The shared state (model weights, class names, output paths) is
+handed to every worker once through the pool initializer; with the "fork"
+start method it is inherited copy-on-write instead of being pickled, and
+memory-mapped bundle weights share the page cache. Workers write their own
+stage dumps and top-5 files; only the small per-image results come back.
+"""
+import json
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from q313_parallel import shutdown_pool
+
+RESULTS_NAME = "batch_results.json"
+TOP5_NAME = "top5_predictions.json"
+
+_CONTEXT = None
+
+# ------------------------- Worker Pool -------------------------
+
+def _init_worker(context):
+    global _CONTEXT
+    _CONTEXT = context
+
+def _run_task(task_fn, item):
+    try:
+        return task_fn(item, _CONTEXT)
+    finally:
+        # A conv pool started by this worker would otherwise keep it from exiting.
+        shutdown_pool()
+
+def run_batch(task_fn, items: list, context, workers: int = 1) -> list:
+    """
+    Runs `task_fn(item, context)` for every item, in a process pool when `workers` > 1.
+
+    `task_fn` must be a module-level function. Results are returned in item order.
+    """
+    if workers <= 1 or len(items) <= 1:
+        return [task_fn(item, context) for item in items]
+    methods = multiprocessing.get_all_start_methods()
+    mp_context = multiprocessing.get_context("fork") if "fork" in methods else None
+    with ProcessPoolExecutor(max_workers=min(workers, len(items)), mp_context=mp_context,
+                             initializer=_init_worker, initargs=(context,)) as executor:
+        return list(executor.map(partial(_run_task, task_fn), items))
+
+def split_batches(items: list, parts: int) -> list:
+    """Splits `items` into at most `parts` contiguous, nearly equal, non-empty lists."""
+    bounds = np.linspace(0, len(items), max(1, min(parts, len(items))) + 1).astype(int)
+    return [items[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+# ------------------------- Prediction Results -------------------------
+
+def top5_predictions(scores: np.ndarray, class_names: dict) -> list:
+    """Returns the five highest-scoring classes as a list of dictionaries."""
+    top5_indices = np.argsort(scores)[::-1][:5]
+    return [
+        {"rank": rank + 1, "index": int(idx),
+         "class": class_names.get(str(idx), "Unknown Class"), "score": int(scores[idx])}
+        for rank, idx in enumerate(top5_indices)
+    ]
+
+def save_top5(predictions: list, image_output_dir: Path):
+    """Writes one image's top-5 predictions next to its stage dumps."""
+    image_output_dir.mkdir(parents=True, exist_ok=True)
+    with (image_output_dir / TOP5_NAME).open("w") as f:
+        json.dump(predictions, f, indent=2)
+
+def save_batch_results(results: dict, output_dir: Path) -> Path:
+    """Writes the aggregated {image name: top-5 predictions} file for a batch."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    results_path = output_dir / RESULTS_NAME
+    with results_path.open("w") as f:
+        json.dump(results, f, indent=2)
+    return results_path
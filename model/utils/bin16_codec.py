@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Shared codec for the 16-bit binary-text format used by every model script.
+
+Each value is one line of 16 '0'/'1' characters (two's complement, MSB first),
+the format read by the SystemVerilog testbench in `sim/`. The GLB loaders also
+take a 64-bit-merged variant in which four consecutive values share one line,
+the first value in the rightmost 16 characters. Whole files are
+decoded and encoded with NumPy in bulk instead of one line at a time; the
+bytes written are identical to `format(np.uint16(x).item(), "016b") + "\\n"`.
+"""
+import numpy as np
+from pathlib import Path
+
+LINE_BITS = 16
+_ASCII_0 = ord("0")
+_ASCII_1 = ord("1")
+_BYTE_TABLE = None
+
+# ------------------------- Scalar Helpers -------------------------
+
+def bin16_to_int16(binstr: str) -> np.int16:
+    """Converts a 16-bit two's-complement binary string to int16."""
+    val = int(binstr, 2)
+    if val & 0x8000:
+        val -= 1 << 16
+    return np.int16(val)
+
+def int16_to_bin16(x: np.int16) -> str:
+    """Converts int16 to a 16-bit two's-complement binary string."""
+    return format(np.uint16(x).item(), "016b")
+
+# ------------------------- Bulk Decoding -------------------------
+
+# Eight ASCII digits are handled as one little-endian uint64 word: XOR with
+# "00000000" leaves one bit per byte, and the multiply gathers those eight bits
+# (first character = MSB) into the top byte.
+_ZEROS_U64 = np.uint64(0x3030303030303030)
+_LOW_BITS_U64 = np.uint64(0x0101010101010101)
+_GATHER_U64 = np.uint64(0x8040201008040201)
+
+def _digit_rows(raw: bytes) -> np.ndarray:
+    """Returns the non-blank lines of `raw` as a contiguous (N, 16) uint8 array of ASCII digits."""
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    # Fast path: every line is exactly 16 digits + "\n" (or "\r\n").
+    for stride in (LINE_BITS + 1, LINE_BITS + 2):
+        if buf.size and buf.size % stride == 0 and (buf[stride - 1::stride] == ord("\n")).all() \
+                and (stride == LINE_BITS + 1 or (buf[LINE_BITS::stride] == ord("\r")).all()):
+            line_dtype = np.dtype({"names": ["digits"], "formats": [f"V{LINE_BITS}"], "itemsize": stride})
+            return np.frombuffer(raw, dtype=line_dtype)["digits"].copy().view(np.uint8).reshape(-1, LINE_BITS)
+    # General path: blank lines, CR/LF mixes or a missing final newline.
+    tokens = raw.split()
+    lengths = {len(t) for t in tokens}
+    if lengths - {LINE_BITS}:
+        bad = sorted(lengths - {LINE_BITS})[0]
+        raise ValueError(f"Expected {LINE_BITS}-character binary lines, found a line of length {bad}.")
+    return np.frombuffer(b"".join(tokens), dtype=np.uint8).reshape(-1, LINE_BITS)
+
+def decode_bin16(raw: bytes) -> np.ndarray:
+    """Decodes the contents of a 16-bit binary-text file into a 1-D int16 array."""
+    return _decode_digit_rows(_digit_rows(raw))
+
+def _decode_digit_rows(rows: np.ndarray) -> np.ndarray:
+    """Decodes a contiguous (N, 16) uint8 array of ASCII digits into N int16 values."""
+    words = rows.view("<u8")                                      # (N, 2): high, low byte
+    bits = np.bitwise_xor(words, _ZEROS_U64)
+    if np.bitwise_or.reduce(bits, axis=None) & ~_LOW_BITS_U64:
+        raise ValueError("Binary lines may only contain '0' and '1'.")
+    bits *= _GATHER_U64
+    # The gathered bits sit in byte 7 of each word; place them as a little-endian int16.
+    gathered = bits.view(np.uint8).reshape(-1, 2 * 8)
+    values = np.empty(gathered.shape[0], dtype="<i2")
+    value_bytes = values.view(np.uint8).reshape(-1, 2)
+    value_bytes[:, 1] = gathered[:, 7]
+    value_bytes[:, 0] = gathered[:, 15]
+    return values.astype(np.int16, copy=False)
+
+def read_bin16_file(path: Path) -> np.ndarray:
+    """Reads a whole 16-bit binary-text file into a 1-D int16 array."""
+    return decode_bin16(Path(path).read_bytes())
+
+# ------------------------- Bulk Encoding -------------------------
+
+def _byte_table() -> np.ndarray:
+    """Returns the 8 ASCII digits of every byte value, packed as 256 little-endian uint64 words."""
+    global _BYTE_TABLE
+    if _BYTE_TABLE is None:
+        values = np.arange(256, dtype=np.uint8)[:, None]
+        digits = ((values >> np.arange(7, -1, -1, dtype=np.uint8)) & 1) + _ASCII_0
+        _BYTE_TABLE = digits.astype(np.uint8).view("<u8").ravel()
+    return _BYTE_TABLE
+
+def _encode_lines(data: np.ndarray, final_newline: bool) -> bytearray:
+    """Encodes an integer array (flattened in C order) into a buffer of 16-bit binary-text lines."""
+    codes = np.asarray(data).astype(np.int16, copy=False).ravel().view(np.uint16)
+    stride = LINE_BITS + 1
+    out = bytearray(codes.size * stride)
+    if codes.size:
+        # Write each line's two 8-digit halves straight into the output buffer.
+        high = np.ndarray((codes.size,), dtype="<u8", buffer=out, offset=0, strides=(stride,))
+        low = np.ndarray((codes.size,), dtype="<u8", buffer=out, offset=8, strides=(stride,))
+        newline = np.ndarray((codes.size,), dtype=np.uint8, buffer=out, offset=LINE_BITS, strides=(stride,))
+        table = _byte_table()
+        np.take(table, codes >> 8, out=high)
+        np.take(table, codes & 0xFF, out=low)
+        newline[:] = ord("\n")
+    if not final_newline and out:
+        del out[-1]
+    return out
+
+def encode_bin16(data: np.ndarray, final_newline: bool = True) -> bytes:
+    """Encodes an integer array (flattened in C order) as 16-bit binary-text lines."""
+    return bytes(_encode_lines(data, final_newline))
+
+def write_bin16_file(path: Path, data: np.ndarray, final_newline: bool = True):
+    """Writes an integer array (flattened in C order) as a 16-bit binary-text file."""
+    with Path(path).open("wb") as f:
+        f.write(_encode_lines(data, final_newline))
+
+# ------------------------- 64-bit Merged Lines -------------------------
+
+WORDS_PER_LINE = 4
+
+def pack_bin64_words(data: np.ndarray) -> np.ndarray:
+    """
+    Packs an integer array (flattened in C order) into uint64 words, four 16-bit lanes each.
+
+    Value 4k+i lands in bits [16i, 16i+16) of word k (word0 in the low lane), and
+    the last word is zero-padded.
+    """
+    codes = np.asarray(data).astype(np.int16, copy=False).ravel()
+    remainder = codes.size % WORDS_PER_LINE
+    if remainder:
+        codes = np.concatenate([codes, np.zeros(WORDS_PER_LINE - remainder, dtype=np.int16)])
+    return np.ascontiguousarray(codes, dtype="<i2").view("<u8")
+
+def encode_bin64_words(words: np.ndarray, final_newline: bool = True) -> bytes:
+    """Encodes uint64 words as 64-character binary lines, MSB first."""
+    lanes = np.ascontiguousarray(words, dtype="<u8").view("<u2").reshape(-1, WORDS_PER_LINE)[:, ::-1]
+    lines16 = np.frombuffer(_encode_lines(lanes, True), dtype=np.uint8).reshape(-1, WORDS_PER_LINE, LINE_BITS + 1)
+    out = np.empty((lanes.shape[0], WORDS_PER_LINE * LINE_BITS + 1), dtype=np.uint8)
+    out[:, :-1] = lines16[:, :, :LINE_BITS].reshape(lanes.shape[0], -1)
+    out[:, -1] = ord("\n")
+    data = out.tobytes()
+    return data if final_newline or not data else data[:-1]
+
+def encode_bin64_merged(data: np.ndarray, final_newline: bool = True) -> bytes:
+    """
+    Encodes an integer array (flattened in C order) as 64-bit merged lines.
+
+    Values are grouped four at a time (zero-padded at the end) and each group is
+    written as word3 word2 word1 word0, matching `merge_split.py`.
+    """
+    return encode_bin64_words(pack_bin64_words(data), final_newline)
+
+def decode_bin64_merged(raw: bytes) -> np.ndarray:
+    """
+    Decodes 64-bit merged lines back into a 1-D int16 array (word0 of each line first).
+
+    '-' separators inside a line are ignored, as in `merge_split.py`.
+    """
+    tokens = raw.replace(b"-", b"").split()
+    lengths = {len(t) for t in tokens}
+    if lengths - {WORDS_PER_LINE * LINE_BITS}:
+        bad = sorted(lengths - {WORDS_PER_LINE * LINE_BITS})[0]
+        raise ValueError(f"Input word must be exactly {WORDS_PER_LINE * LINE_BITS} bits. Got: {bad} bits.")
+    digits = np.frombuffer(b"".join(tokens), dtype=np.uint8).reshape(-1, WORDS_PER_LINE, LINE_BITS)
+    return _decode_digit_rows(np.ascontiguousarray(digits[:, ::-1]).reshape(-1, LINE_BITS))
+
+def write_bin64_merged_file(path: Path, data: np.ndarray, final_newline: bool = True):
+    """Writes an integer array (flattened in C order) as a 64-bit merged text file."""
+    Path(path).write_bytes(encode_bin64_merged(data, final_newline))
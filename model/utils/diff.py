@@ -1,4 +1,19 @@
+import sys
+import numpy as np
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bin16_codec import int16_to_bin16, read_bin16_file
+from stage_archive import ARCHIVE_SUFFIX, StageArchive
+
 def compare_and_show_differences(file1_path, file2_path):
+    if is_archive_spec(file1_path) or is_archive_spec(file2_path):
+        if Path(file1_path).suffix == ARCHIVE_SUFFIX and Path(file2_path).suffix == ARCHIVE_SUFFIX:
+            compare_archives(file1_path, file2_path)
+        else:
+            compare_values(load_values(file1_path), load_values(file2_path))
+        return
+
     with open(file1_path, 'r') as f1, open(file2_path, 'r') as f2:
         lines1 = f1.readlines()
         lines2 = f2.readlines()
@@ -22,10 +37,67 @@ def compare_and_show_differences(file1_path, file2_path):
     else:
         print(f"Total mismatched lines: {mismatch_count}")
 
+# ------------------------- Stage Archives -------------------------
+
+def is_archive_spec(spec) -> bool:
+    """True for `archive.zip`, `archive.zip:stage` and `archive.zip:stage:channel`."""
+    return f"{ARCHIVE_SUFFIX}:" in str(spec) or Path(spec).suffix == ARCHIVE_SUFFIX
+
+def load_values(spec) -> np.ndarray:
+    """
+    Loads the values named by a file path or an archive slice.
+
+    A stage is flattened in CHW order and a channel in row order, the same
+    order as the `_all_channels.txt` and `channel_NNN/output.txt` dumps.
+    """
+    spec = str(spec)
+    if f"{ARCHIVE_SUFFIX}:" not in spec:
+        return read_bin16_file(Path(spec))
+    archive_path, _, member = spec.rpartition(f"{ARCHIVE_SUFFIX}:")
+    stage, _, channel = member.partition(":")
+    with StageArchive(Path(archive_path + ARCHIVE_SUFFIX)) as archive:
+        if channel:
+            return archive.read_channel(stage, int(channel)).ravel()
+        return archive.read_stage(stage).ravel()
+
+def compare_values(values1: np.ndarray, values2: np.ndarray, verbose: bool = True) -> int:
+    """Compares two value arrays line by line, as the text comparison does; returns the mismatch count."""
+    n = min(values1.size, values2.size)
+    mismatches = np.flatnonzero(values1[:n] != values2[:n]).tolist() + list(range(n, max(values1.size, values2.size)))
+    if verbose:
+        for i in mismatches:
+            line1 = int16_to_bin16(values1[i]) if i < values1.size else '<missing>'
+            line2 = int16_to_bin16(values2[i]) if i < values2.size else '<missing>'
+            print(f"Line {i + 1}:")
+            print(f"  File1: {line1}")
+            print(f"  File2: {line2}")
+            print()
+        if not mismatches:
+            print("🏆 All lines matched successfully!")
+        else:
+            print(f"Total mismatched lines: {len(mismatches)}")
+    return len(mismatches)
+
+def compare_archives(archive1_path, archive2_path):
+    """Compares every stage of two stage archives and prints one summary line per stage."""
+    with StageArchive(Path(archive1_path)) as a1, StageArchive(Path(archive2_path)) as a2:
+        stages1, stages2 = a1.stages(), a2.stages()
+        total = 0
+        for stage in stages1 + [s for s in stages2 if s not in stages1]:
+            if stage not in stages1 or stage not in stages2:
+                print(f"❌ {stage}: only in {'File1' if stage in stages1 else 'File2'}")
+                total += 1
+                continue
+            count = compare_values(a1.read_stage(stage).ravel(), a2.read_stage(stage).ravel(), verbose=False)
+            total += count
+            print(f"{'✅' if count == 0 else '❌'} {stage}: {count} mismatched value(s)")
+    if total == 0:
+        print("🏆 All stages matched successfully!")
+
 def main():
-    import sys
     if len(sys.argv) != 3:
         print("Usage: python diff_script.py <file1.txt> <file2.txt>")
+        print("       (either file may also be archive.zip, archive.zip:<stage> or archive.zip:<stage>:<channel>)")
         return
 
     file1_path = sys.argv[1]
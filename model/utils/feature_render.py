@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Vectorized rendering of Q3.13 feature maps to grayscale images.
+
+All channels of a stage are converted and min-max normalized in one NumPy
+operation, and the channel grid is built as a single array (a reshape and
+transpose of the normalized channels) before one `Image.fromarray`. The
+per-channel JPEGs are encoded on a thread pool; Pillow releases the GIL
+while encoding.
+
+The pixels are identical to the per-channel loop this replaces: each channel
+is mapped with `(x - min) / (max - min) * 255` truncated to uint8, and
+constant channels are black.
+"""
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+
+RENDER_THREADS = min(8, os.cpu_count() or 1)
+
+# ------------------------- Conversion -------------------------
+
+def q313_to_float(data: np.ndarray) -> np.ndarray:
+    """Converts a Q3.13 int16 array of any shape to float64."""
+    return np.asarray(data, dtype=np.float64) / (2**13)
+
+def normalize_channels(data_array: np.ndarray) -> np.ndarray:
+    """
+    Min-max normalizes every channel of an (H, W, C) Q3.13 feature map to uint8.
+
+    Returns:
+        np.ndarray: (C, H, W) uint8 array, one grayscale image per channel.
+    """
+    float_data = q313_to_float(data_array).transpose(2, 0, 1)
+    min_vals = float_data.min(axis=(1, 2), keepdims=True)
+    max_vals = float_data.max(axis=(1, 2), keepdims=True)
+    span = max_vals - min_vals
+    flat = span == 0
+    normalized = (float_data - min_vals) / np.where(flat, 1.0, span) * 255
+    normalized[np.broadcast_to(flat, normalized.shape)] = 0
+    return normalized.astype(np.uint8)
+
+def grid_canvas(channels: np.ndarray) -> np.ndarray:
+    """
+    Tiles (C, H, W) channel images row by row into a near-square grid.
+
+    Unused cells at the end of the last row are black.
+    """
+    C, H, W = channels.shape
+    grid_cols = int(np.ceil(np.sqrt(C)))
+    grid_rows = int(np.ceil(C / grid_cols))
+    cells = np.zeros((grid_rows * grid_cols, H, W), dtype=np.uint8)
+    cells[:C] = channels
+    return cells.reshape(grid_rows, grid_cols, H, W).transpose(0, 2, 1, 3).reshape(grid_rows * H, grid_cols * W)
+
+# ------------------------- Rendering -------------------------
+
+def _save_jpeg(pixels: np.ndarray, path: Path):
+    Image.fromarray(pixels).save(path, 'JPEG')
+
+def render_feature_map(data_array: np.ndarray, stage_dir: Path, stage_name: str,
+                       channel_images: bool = True, threads: int = RENDER_THREADS):
+    """
+    Writes the visualizations of an (H, W, C) Q3.13 feature map.
+
+    Args:
+        data_array (np.ndarray): Feature map (H, W, C), int16.
+        stage_dir (Path): Stage directory; channel images go to `channel_XXX/visualization.jpeg`.
+        stage_name (str): Prefix of the grid image `<stage_name>_visualization_grid.jpeg`.
+        channel_images (bool): Also write one JPEG per channel.
+        threads (int): Threads encoding the per-channel JPEGs.
+    """
+    H, W, C = data_array.shape
+    if C == 0 or H == 0 or W == 0:
+        return
+    channels = normalize_channels(data_array)
+    if channel_images:
+        paths = []
+        for c in range(C):
+            channel_dir = stage_dir / f"channel_{c:03d}"
+            channel_dir.mkdir(parents=True, exist_ok=True)
+            paths.append(channel_dir / "visualization.jpeg")
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+            list(executor.map(_save_jpeg, channels, paths))
+    _save_jpeg(grid_canvas(channels), stage_dir / f"{stage_name}_visualization_grid.jpeg")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Array-based ifmap segmentation and 64-bit packing for the DRAM stimulus files.
+
+The testbench loads the input image in overlapping row bands (segments): each
+segment holds `rows_per_segment` rows of every channel, channel by channel,
+and consecutive segments start `rows_per_segment - overlap` rows apart. Rows
+past the bottom of the image are zero. With the defaults (35 rows, 7 rows of
+overlap) a 227-row conv1 ifmap gives the 8 `conv1_ifmap_segN_64.txt` files
+loaded by `sim/load_pkg.sv`.
+
+Segments are strided views of one zero-padded (C, H, W) array, so no rows are
+copied until the words are packed. Each segment is packed into uint64 words of
+four 16-bit lanes (word0 in the low lane, printed last on its line, as in
+`merge_split.py`) and every file is written with one bulk write.
+"""
+import numpy as np
+from pathlib import Path
+from numpy.lib.stride_tricks import sliding_window_view
+
+from bin16_codec import encode_bin64_words, encode_bin16, pack_bin64_words
+
+DEFAULT_ROWS_PER_SEGMENT = 35
+DEFAULT_OVERLAP = 7
+
+# ------------------------- Segmentation -------------------------
+
+def segment_starts(height: int, rows_per_segment: int = DEFAULT_ROWS_PER_SEGMENT,
+                   overlap: int = DEFAULT_OVERLAP) -> list:
+    """Returns the first row of every segment; the last segment reaches the bottom row."""
+    if rows_per_segment <= 0 or not 0 <= overlap < rows_per_segment:
+        raise ValueError(f"Need 0 <= overlap < rows_per_segment, got {overlap} and {rows_per_segment}.")
+    starts = [0]
+    while starts[-1] + rows_per_segment < height:
+        starts.append(starts[-1] + rows_per_segment - overlap)
+    return starts
+
+def segment_views(ifmap_chw: np.ndarray, rows_per_segment: int = DEFAULT_ROWS_PER_SEGMENT,
+                  overlap: int = DEFAULT_OVERLAP) -> np.ndarray:
+    """
+    Returns all segments of a (C, H, W) ifmap as a (S, C, rows_per_segment, W) view.
+
+    The ifmap is copied once only if the last segment needs zero rows below it.
+    """
+    C, H, W = ifmap_chw.shape
+    starts = segment_starts(H, rows_per_segment, overlap)
+    padded_rows = starts[-1] + rows_per_segment
+    if padded_rows > H:
+        padded = np.zeros((C, padded_rows, W), dtype=ifmap_chw.dtype)
+        padded[:, :H] = ifmap_chw
+    else:
+        padded = ifmap_chw
+    # windows[c, s, w, r] = padded[c, s + r, w]; keep every `step`-th start.
+    windows = sliding_window_view(padded, rows_per_segment, axis=1)[:, ::rows_per_segment - overlap]
+    return windows[:, :len(starts)].transpose(1, 0, 3, 2)
+
+def pack_segments(ifmap_chw: np.ndarray, rows_per_segment: int = DEFAULT_ROWS_PER_SEGMENT,
+                  overlap: int = DEFAULT_OVERLAP) -> list:
+    """Returns one uint64 word array per segment."""
+    return [pack_bin64_words(segment) for segment in segment_views(ifmap_chw, rows_per_segment, overlap)]
+
+# ------------------------- File Output -------------------------
+
+def write_segments(segments: np.ndarray, output_dir: Path, merged: bool = True,
+                   name_format: str = "segment_{index}_64bit_merged.txt", final_newline: bool = True) -> list:
+    """
+    Writes already segmented data, (S, ...) with one entry per segment, one file per segment.
+
+    Each file is encoded in memory and written with a single write. Returns the
+    paths of the written files, in segment order.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for index, segment in enumerate(segments, start=1):
+        if merged:
+            payload = encode_bin64_words(pack_bin64_words(segment), final_newline)
+        else:
+            payload = encode_bin16(segment, final_newline)
+        path = output_dir / name_format.format(index=index)
+        path.write_bytes(payload)
+        paths.append(path)
+    return paths
+
+def write_segment_files(ifmap_chw: np.ndarray, output_dir: Path, rows_per_segment: int = DEFAULT_ROWS_PER_SEGMENT,
+                        overlap: int = DEFAULT_OVERLAP, merged: bool = True,
+                        name_format: str = "segment_{index}_64bit_merged.txt", final_newline: bool = True) -> list:
+    """
+    Segments a (C, H, W) ifmap and writes every segment to its own text file.
+
+    Args:
+        ifmap_chw (np.ndarray): Q3.13 int16 ifmap in (C, H, W) order.
+        output_dir (Path): Directory for the segment files.
+        rows_per_segment (int): Rows of each channel per segment.
+        overlap (int): Rows shared by consecutive segments.
+        merged (bool): Write 64-bit merged words; otherwise one 16-bit value per line.
+        name_format (str): File name pattern, formatted with the 1-based `index`.
+        final_newline (bool): End each file with a newline.
+
+    Returns:
+        list: Paths of the written files, in segment order.
+    """
+    segments = segment_views(ifmap_chw, rows_per_segment, overlap)
+    return write_segments(segments, output_dir, merged, name_format, final_newline)
@@ -3,6 +3,9 @@ from PIL import Image
 from pathlib import Path
 import sys
 
+from bin16_codec import read_bin16_file, write_bin16_file
+from image_ingest import load_image_q313
+
 # ------------------------- Helper Functions -------------------------
 
 def float_to_q313_int16(val: float) -> np.int16:
@@ -13,17 +16,6 @@ def float_to_q313_int16(val: float) -> np.int16:
     scaled_val = int(round(val * (2**13)))
     return np.int16(scaled_val)
 
-def int16_to_bin16(x: np.int16) -> str:
-    """Converts a signed 16-bit integer to its 16-bit binary string."""
-    return format(np.uint16(x).item(), "016b")
-
-def bin16_to_int16(bin_str: str) -> np.int16:
-    """Converts a 16-bit binary string to a signed 16-bit integer."""
-    val = int(bin_str, 2)
-    if val & 0x8000:
-        val -= 1 << 16
-    return np.int16(val)
-
 def q313_int16_to_float(q_val: np.int16) -> float:
     """Converts a Q3.13 signed 16-bit integer back to a float."""
     return float(q_val) / (2**13)
@@ -39,13 +31,8 @@ def run_image_to_q313():
         print(f"❌ Error: File not found at '{input_path}'")
         return
 
-    # 1. Process image: Open, resize, normalize
-    img = Image.open(input_path).convert('RGB').resize((227, 227), Image.BILINEAR)
-    np_img_float = np.array(img).astype(np.float32) / 255.0
-
-    # 2. Convert float values to Q3.13 fixed-point format
-    q313_vectorized = np.vectorize(float_to_q313_int16)
-    np_img_q313 = q313_vectorized(np_img_float)
+    # 1-2. Process image (open, resize, normalize) and convert to Q3.13 in one vectorized pass
+    np_img_q313 = load_image_q313(input_path)
     
     # 3. Transpose from (H, W, C) to (C, H, W) for standard tensor layout
     tensor_chw = np.transpose(np_img_q313, (2, 0, 1))
@@ -53,10 +40,8 @@ def run_image_to_q313():
     # 4. Save to text file
     output_path = input_path.with_suffix('.txt')
     try:
-        with output_path.open("w") as f:
-            # Flatten the tensor and write each value as a binary string
-            for val in tensor_chw.flatten():
-                f.write(int16_to_bin16(val) + "\n")
+        # Flatten the tensor and write each value as a binary string
+        write_bin16_file(output_path, tensor_chw)
         print(f"✅ Q3.13 data saved successfully to: {output_path}")
     except IOError as e:
         print(f"❌ Error saving file: {e}")
@@ -83,8 +68,7 @@ def run_q313_to_image():
 
     # 2. Load and convert data from the text file
     try:
-        lines = input_path.read_text().splitlines()
-        int16_data = np.array([bin16_to_int16(line) for line in lines], dtype=np.int16)
+        int16_data = read_bin16_file(input_path)
         float_data = np.array([q313_int16_to_float(val) for val in int16_data], dtype=np.float32)
 
         # 3. Reshape and denormalize
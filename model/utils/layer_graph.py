@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Declarative layer graphs and a fusing executor for the Q3.13 AlexNet pipeline.
+
+A graph is a list of layer dictionaries (name, op and hyper-parameters, with
+`weights` naming the entry in the weight/bias dictionaries). The ops are
+"conv", "relu", "maxpool", "pad" and "fc". The stage names are the ones the
+drivers dump.
+
+`GraphExecutor` turns the graph into a shorter list of fused steps, merging
+an op into the one before it when the intermediate stage is not needed:
+
+- "pad" is never a separate copy: the producer (conv, ReLU or max pooling)
+  writes straight into the interior of a zero-bordered buffer, and the conv
+  that follows reads it as its implicitly padded input;
+- "relu" after "conv" or "fc" is applied on the writeback (as the ReLU array
+  does in hardware), when the pre-ReLU output is not kept;
+- "relu" followed by "maxpool" becomes one pooling pass with ReLU, when the
+  ReLU output is not kept.
+
+Every step writes into an activation buffer that is allocated once and
+reused for every image. Stages passed to `on_stage` are views of these
+buffers and are only valid until the next `run`.
+"""
+import numpy as np
+
+from product_lut import conv2d_q313_lut
+from q313_engine import fully_connected_q313_batch, max_pool_q313
+from q313_parallel import conv2d_q313_parallel
+from stage_cache import content_hash
+
+# --------------------------------------------------------------------
+# Graph descriptions
+# --------------------------------------------------------------------
+
+ALEXNET_FEATURES = [
+    {"name": "conv1", "op": "conv", "weights": "conv1", "stride": 4},
+    {"name": "relu1", "op": "relu"},
+    {"name": "maxpool1", "op": "maxpool", "pool_size": 3, "stride": 2},
+    {"name": "padding2", "op": "pad", "pad": 2},
+    {"name": "conv2", "op": "conv", "weights": "conv2", "stride": 1},
+    {"name": "relu2", "op": "relu"},
+    {"name": "maxpool2", "op": "maxpool", "pool_size": 3, "stride": 2},
+    {"name": "padding3", "op": "pad", "pad": 1},
+    {"name": "conv3", "op": "conv", "weights": "conv3", "stride": 1},
+    {"name": "relu3", "op": "relu"},
+    {"name": "padding4", "op": "pad", "pad": 1},
+    {"name": "conv4", "op": "conv", "weights": "conv4", "stride": 1},
+    {"name": "relu4", "op": "relu"},
+    {"name": "padding5", "op": "pad", "pad": 1},
+    {"name": "conv5", "op": "conv", "weights": "conv5", "stride": 1},
+    {"name": "relu5", "op": "relu"},
+    {"name": "maxpool3", "op": "maxpool", "pool_size": 3, "stride": 2},
+]
+
+ALEXNET_CLASSIFIER = [
+    {"name": "fc1", "op": "fc", "weights": "fc1", "mode": "custom"},
+    {"name": "relu_fc1", "op": "relu"},
+    {"name": "fc2", "op": "fc", "weights": "fc2", "mode": "custom"},
+    {"name": "relu_fc2", "op": "relu"},
+    {"name": "fc3_output", "op": "fc", "weights": "fc3", "mode": "custom"},
+]
+
+ALEXNET_GRAPH = ALEXNET_FEATURES + ALEXNET_CLASSIFIER
+
+OPS = ("conv", "relu", "maxpool", "pad", "fc")
+
+# --------------------------------------------------------------------
+# Planning
+# --------------------------------------------------------------------
+
+def plan_graph(graph: list, keep: set) -> list:
+    """
+    Fuses a graph into executor steps.
+
+    Each step is a dictionary with the primary layer ("op", "layer"), the fused
+    "relu" flag and output "pad", and "emit": the (stage name, "interior" or
+    "full") pairs of kept stages the step's buffer holds.
+    """
+    steps = []
+    for layer in graph:
+        op, name = layer["op"], layer["name"]
+        if op not in OPS:
+            raise ValueError(f"Unknown op '{op}' in layer '{name}'.")
+        prev = steps[-1] if steps else None
+        hidden = prev is not None and not prev["last_kept"]
+
+        if op == "relu" and hidden and prev["op"] in ("conv", "fc", "maxpool") and prev["pad"] == 0:
+            prev["relu"] = True
+        elif op == "maxpool" and hidden and prev["op"] == "relu" and prev["pad"] == 0:
+            prev.update(op="maxpool", layer=layer, relu=True)
+        elif op == "pad" and prev is not None and prev["op"] in ("conv", "relu", "maxpool") and prev["pad"] == 0:
+            prev["pad"] = layer["pad"]
+        else:
+            steps.append({"op": op, "layer": layer, "relu": False, "pad": 0, "emit": [], "last_kept": False})
+            prev = steps[-1]
+
+        prev["last_kept"] = name in keep
+        if name in keep:
+            prev["emit"].append((name, "full" if op == "pad" else "interior"))
+    return steps
+
+def describe_plan(steps: list) -> str:
+    """Returns a one-line summary of the fused steps, e.g. 'conv1+relu | maxpool1+pad2'."""
+    parts = []
+    for step in steps:
+        label = step["layer"]["name"]
+        if step["relu"]:
+            label += "+relu"
+        if step["pad"]:
+            label += f"+pad{step['pad']}"
+        parts.append(label)
+    return " | ".join(parts)
+
+# --------------------------------------------------------------------
+# Executor
+# --------------------------------------------------------------------
+
+class GraphExecutor:
+    """
+    Runs a layer graph with fused ops and reused activation buffers.
+
+    Args:
+        graph (list): Layer dictionaries, e.g. `ALEXNET_GRAPH`.
+        weights (dict): Weight arrays by name, conv (K, K, C, M) and fc (in, out).
+        biases (dict): Bias arrays by name.
+        keep (set): Stage names that must be observable through `on_stage`;
+            None keeps every stage (no fusion across kept stages).
+        conv_workers (int): Worker processes for each convolution.
+        stage_cache (StageCache): Optional cache for conv and single-image fc outputs.
+        digests (dict): Per-layer weight/bias digests used in the cache keys.
+        space_to_depth (bool): Run strided convolutions (conv1) through the
+            bit-identical space-to-depth kernel.
+        product_luts (dict): Product tables by weight name (see `product_lut.py`);
+            a conv with a table runs as a gather-and-sum whenever its input is
+            made of 8-bit pixel codes, and through the regular kernels otherwise.
+    """
+
+    def __init__(self, graph: list, weights: dict, biases: dict, keep: set = None,
+                 conv_workers: int = 1, stage_cache=None, digests: dict = None,
+                 space_to_depth: bool = False, product_luts: dict = None):
+        self.weights = weights
+        self.biases = biases
+        self.keep = {layer["name"] for layer in graph} if keep is None else set(keep)
+        self.conv_workers = conv_workers
+        self.stage_cache = stage_cache
+        self.digests = digests or {}
+        self.space_to_depth = space_to_depth
+        self.product_luts = product_luts or {}
+        self.steps = plan_graph(graph, self.keep)
+        self._buffers = [None] * len(self.steps)
+
+    def _buffer(self, index: int, shape: tuple) -> np.ndarray:
+        """Returns the zero-bordered activation buffer of a step, allocating it once."""
+        buf = self._buffers[index]
+        if buf is None or buf.shape != shape:
+            buf = self._buffers[index] = np.zeros(shape, dtype=np.int16)
+        return buf
+
+    def _cached(self, layer: dict, layer_input: np.ndarray, params: dict, compute_fn) -> np.ndarray:
+        if self.stage_cache is None:
+            return compute_fn()
+        name = layer["name"]
+        key = content_hash(name, layer_input, self.digests[layer["weights"]], params)
+        return self.stage_cache.get_or_compute(key, compute_fn, name)
+
+    def _run_step(self, index: int, step: dict, x: np.ndarray) -> np.ndarray:
+        layer, op, pad, relu = step["layer"], step["op"], step["pad"], step["relu"]
+
+        # Vectors and (N, F) batches: fc layers and their ReLUs.
+        if op == "fc":
+            vector = x.ndim != 2
+            inputs = x.reshape(1, -1) if vector else x
+            w, b = self.weights[layer["weights"]], self.biases[layer["weights"]]
+            if not vector:
+                return self._fc(inputs, w, b, layer["mode"], relu)
+            params = {"mode": layer["mode"], "relu": relu}
+            return self._cached(layer, inputs[0], params,
+                                lambda: self._fc(inputs, w, b, layer["mode"], relu)[0])
+        if x.ndim != 3:
+            if op != "relu":
+                raise ValueError(f"Layer '{layer['name']}' ({op}) needs an (H, W, C) input, got shape {x.shape}.")
+            return np.maximum(x, 0)
+
+        # Feature maps: every step writes into its own zero-bordered buffer.
+        H, W, C = x.shape
+        if op == "conv":
+            w, b = self.weights[layer["weights"]], self.biases[layer["weights"]]
+            K, _, _, M = w.shape
+            stride = layer["stride"]
+            OH, OW, C = (H - K) // stride + 1, (W - K) // stride + 1, M
+        elif op == "maxpool":
+            pool_size, stride = layer["pool_size"], layer["stride"]
+            OH, OW = (H - pool_size) // stride + 1, (W - pool_size) // stride + 1
+        else:
+            OH, OW = H, W
+            if op == "pad":
+                pad = layer["pad"]
+        buf = self._buffer(index, (OH + 2 * pad, OW + 2 * pad, C))
+
+        if op == "maxpool":
+            return max_pool_q313(x, pool_size, stride, pad=pad, out=buf, relu=relu)
+        interior = buf[pad:pad + OH, pad:pad + OW]
+        if op == "conv":
+            params = {"stride": stride, "mode": "custom", "relu": relu}
+            result = self._cached(layer, x, params,
+                                  lambda: self._conv(x, layer["weights"], w, b, stride, relu, interior))
+            if result is not interior:
+                interior[...] = result
+        elif op == "relu":
+            np.maximum(x, 0, out=interior)
+        else:
+            interior[...] = x
+        return buf
+
+    def _conv(self, x, key, w, b, stride, relu, out):
+        lut = self.product_luts.get(key)
+        if lut is not None:
+            try:
+                return conv2d_q313_lut(x, lut, b, w.shape[0], stride, relu=relu, out=out)
+            except ValueError:
+                pass   # not an image input; fall back to the multiplying kernels
+        return conv2d_q313_parallel(x, w, b, stride, self.conv_workers, relu=relu, out=out,
+                                    space_to_depth=self.space_to_depth)
+
+    @staticmethod
+    def _fc(inputs, w, b, mode, relu):
+        out = fully_connected_q313_batch(inputs, w, b, mode=mode)
+        if relu:
+            np.maximum(out, 0, out=out)
+        return out
+
+    @staticmethod
+    def _interior(step: dict, buf: np.ndarray) -> np.ndarray:
+        """Returns the unpadded output of a step whose producer wrote into a padded buffer."""
+        pad = step["pad"]
+        return buf[pad:buf.shape[0] - pad, pad:buf.shape[1] - pad] if pad else buf
+
+    def run(self, x: np.ndarray, on_stage=None) -> np.ndarray:
+        """
+        Runs the graph on an (H, W, C) ifmap, or an (N, F) batch for fc-only graphs.
+
+        `on_stage(name, array)` is called for every kept stage, in graph order.
+        Returns the output of the last step (a reused buffer for conv-type steps).
+        """
+        for index, step in enumerate(self.steps):
+            x = self._run_step(index, step, x)
+            if on_stage is not None:
+                for name, part in step["emit"]:
+                    on_stage(name, x if part == "full" else self._interior(step, x))
+        return x
@@ -1,48 +1,33 @@
 import os
 
-def split_64bit_to_4x16bit(word_64):
-    """Splits a 64-bit word into 4x16-bit words."""
-    word_64 = word_64.replace('-', '')
-    if len(word_64) != 64:
-        raise ValueError(f"Input word must be exactly 64 bits. Got: {len(word_64)} bits.")
-    words = [word_64[i:i+16] for i in range(0, 64, 16)]
-    return words[::-1]  # Return as word0 to word3
-
-def merge_4x16bit_to_64bit(words_16):
-    """Merges 4x16-bit binary strings into one 64-bit string."""
-    if len(words_16) != 4 or any(len(w) != 16 for w in words_16):
-        raise ValueError("Input must be a list of four 16-bit binary strings.")
-    return ''.join(words_16[::-1])
+from bin16_codec import WORDS_PER_LINE, decode_bin16, decode_bin64_merged, write_bin16_file, write_bin64_merged_file
 
 def process_file(input_path, mode):
-    with open(input_path, 'r') as f:
-        lines = [line.strip() for line in f if line.strip()]
+    """
+    Splits or merges a whole file at once.
 
-    output_lines = []
+    Each 64-bit line holds four 16-bit words, word 0 in the lowest bits.
+    """
+    with open(input_path, 'rb') as f:
+        raw = f.read()
 
     if mode == 'S':
-        for line in lines:
-            output_lines.extend(split_64bit_to_4x16bit(line))
+        values = decode_bin64_merged(raw)
         output_path = os.path.splitext(input_path)[0] + '_16bit_split.txt'
+        write_bin16_file(output_path, values)
 
     elif mode == 'M':
-        remainder = len(lines) % 4
+        values = decode_bin16(raw)
+        remainder = values.size % WORDS_PER_LINE
         if remainder != 0:
-            padding = 4 - remainder
+            padding = WORDS_PER_LINE - remainder
             print(f"[!] Padding with {padding} zeros to make line count divisible by 4.")
-            lines.extend(['0' * 16] * padding)
-
-        for i in range(0, len(lines), 4):
-            output_lines.append(merge_4x16bit_to_64bit(lines[i:i+4]))
         output_path = os.path.splitext(input_path)[0] + '_64bit_merged.txt'
+        write_bin64_merged_file(output_path, values)
 
     else:
         raise ValueError("Mode must be 'S' (split) or 'M' (merge).")
 
-    with open(output_path, 'w') as f:
-        for line in output_lines:
-            f.write(line + '\n')
-
     print(f"✅ Output written to: {output_path}")
 
 def main():
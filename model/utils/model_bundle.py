@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Binary, memory-mapped model bundle for the Q3.13 AlexNet weights.
+
+A bundle is a single file that replaces the per-line `.txt` weight files:
+
+    magic "Q313BNDL" | uint32 version | uint32 header length | JSON header | payloads
+
+The JSON header lists every tensor with its name, shape, layout, Q-format,
+dtype and byte offset. Payloads are raw little-endian int16, each aligned to
+64 bytes and stored in the same element order as the `.txt` files, so they
+can be opened with `np.memmap` and paged in lazily.
+
+Run this script once to convert a directory of `.txt` weights into a bundle.
+"""
+import sys
+import json
+import struct
+import numpy as np
+from pathlib import Path
+
+from bin16_codec import read_bin16_file
+
+BUNDLE_MAGIC = b"Q313BNDL"
+BUNDLE_VERSION = 1
+BUNDLE_NAME = "alexnet_q313.bundle"
+ALIGNMENT = 64
+
+# (bundle key, text file stem, kind, shape of the stored tensor)
+# Conv filters are stored as (M, C, K, K), FC matrices as (out, in).
+ALEXNET_LAYERS = [
+    ("conv1", "conv1", "conv", (64, 3, 11, 11)),
+    ("conv2", "conv2", "conv", (192, 64, 5, 5)),
+    ("conv3", "conv3", "conv", (384, 192, 3, 3)),
+    ("conv4", "conv4", "conv", (256, 384, 3, 3)),
+    ("conv5", "conv5", "conv", (256, 256, 3, 3)),
+    ("fc1", "fc_layer_1", "fc", (4096, 9216)),
+    ("fc2", "fc_layer_2", "fc", (4096, 4096)),
+    ("fc3", "fc_layer_3", "fc", (1000, 4096)),
+]
+
+# ------------------------- Text Input -------------------------
+
+def text_weight_paths(weights_dir: Path, stem: str, kind: str):
+    """Returns the (weights, biases) `.txt` paths used by the AlexNet scripts for a layer."""
+    if kind == "conv":
+        return weights_dir / f"{stem}_filter_16.txt", weights_dir / f"{stem}_bias_16.txt"
+    return weights_dir / f"{stem}_weights.pth.txt", weights_dir / f"{stem}_biases.pth.txt"
+
+# ------------------------- Bundle Writer -------------------------
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def write_bundle(tensors: list, output_path: Path):
+    """
+    Writes a bundle file.
+
+    Args:
+        tensors (list): (name, array, layout) tuples; arrays are stored as int16.
+        output_path (Path): Destination file.
+    """
+    entries = []
+    payloads = []
+    for name, data, layout in tensors:
+        data = np.ascontiguousarray(data, dtype="<i2")
+        entries.append({
+            "name": name,
+            "shape": list(data.shape),
+            "layout": layout,
+            "qformat": "Q3.13",
+            "dtype": "int16",
+            "nbytes": data.nbytes,
+        })
+        payloads.append(data)
+
+    # The header stores absolute offsets, which depend on the header size itself.
+    header_len = 0
+    while True:
+        offset = _align(len(BUNDLE_MAGIC) + 8 + header_len)
+        for entry in entries:
+            entry["offset"] = offset
+            offset = _align(offset + entry["nbytes"])
+        header = json.dumps({"tensors": entries}).encode("utf-8")
+        if len(header) == header_len:
+            break
+        header_len = len(header)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("wb") as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(struct.pack("<II", BUNDLE_VERSION, header_len))
+        f.write(header)
+        for entry, data in zip(entries, payloads):
+            f.write(b"\0" * (entry["offset"] - f.tell()))
+            f.write(data.tobytes())
+
+def convert_text_weights(weights_dir: Path, output_path: Path):
+    """Converts the AlexNet `.txt` weight/bias files in `weights_dir` into one bundle."""
+    tensors = []
+    for key, stem, kind, shape in ALEXNET_LAYERS:
+        w_path, b_path = text_weight_paths(weights_dir, stem, kind)
+        print(f"  - Reading {w_path.name} and {b_path.name}...")
+        weights = read_bin16_file(w_path)
+        biases = read_bin16_file(b_path)
+        if weights.size != int(np.prod(shape)):
+            raise ValueError(f"{w_path.name} has {weights.size} values, expected {int(np.prod(shape))} for shape {shape}.")
+        if biases.size != shape[0]:
+            raise ValueError(f"{b_path.name} has {biases.size} values, expected {shape[0]}.")
+        tensors.append((f"{key}.weight", weights.reshape(shape), "MCKK" if kind == "conv" else "OI"))
+        tensors.append((f"{key}.bias", biases, "M" if kind == "conv" else "O"))
+    write_bundle(tensors, output_path)
+
+# ------------------------- Bundle Reader -------------------------
+
+def read_bundle_header(path: Path) -> dict:
+    """Reads and validates the JSON header of a bundle file."""
+    with path.open("rb") as f:
+        magic = f.read(len(BUNDLE_MAGIC))
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"'{path}' is not a Q3.13 model bundle.")
+        version, header_len = struct.unpack("<II", f.read(8))
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bundle version {version} in '{path}'.")
+        return json.loads(f.read(header_len).decode("utf-8"))
+
+def open_bundle(path: Path) -> dict:
+    """Opens every tensor of a bundle as a read-only `np.memmap`, keyed by name."""
+    header = read_bundle_header(path)
+    return {
+        entry["name"]: np.memmap(path, dtype="<i2", mode="r",
+                                 offset=entry["offset"], shape=tuple(entry["shape"]))
+        for entry in header["tensors"]
+    }
+
+def load_alexnet_bundle(path: Path):
+    """
+    Maps an AlexNet bundle into the weight/bias dictionaries used by the scripts.
+
+    Conv weights are returned as (K, K, C, M) views and FC weights as (in, out)
+    views of the memory map, so nothing is read until a layer is used.
+    """
+    tensors = open_bundle(path)
+    weights, biases = {}, {}
+    for key, _, kind, _ in ALEXNET_LAYERS:
+        w = tensors[f"{key}.weight"]
+        weights[key] = w.transpose(2, 3, 1, 0) if kind == "conv" else w.T
+        biases[key] = tensors[f"{key}.bias"]
+    return weights, biases
+
+# ------------------------- Main Driver -------------------------
+
+def main():
+    """Interactively converts a directory of `.txt` weights into a model bundle."""
+    print("🚀 --- AlexNet .txt Weights -> Binary Model Bundle --- 🚀")
+    weights_dir = Path(input("Enter path to the WEIGHTS & BIASES directory: ").strip())
+    output_str = input(f"Enter path for the OUTPUT bundle (default: <weights dir>/{BUNDLE_NAME}): ").strip()
+    output_path = Path(output_str) if output_str else weights_dir / BUNDLE_NAME
+
+    try:
+        convert_text_weights(weights_dir, output_path)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"\n❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"\n✅ Bundle written to: {output_path} ({output_path.stat().st_size / 2**20:.1f} MiB)")
+
+if __name__ == "__main__":
+    main()
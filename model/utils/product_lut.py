@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Product lookup tables for convolutions over 8-bit image inputs (conv1).
+
+An ingested image is quantized from 8-bit pixels, so the conv1 ifmap holds
+at most 256 distinct Q3.13 values, the pixel codes. Every conv1 product is
+truncated on its own (`fixed_mul_q313`), so each MAC term is a pure function
+of (pixel code, weight): a table of the 256 x (K*K*C) x M truncated products
+replaces every conv1 multiply with a gather, and the convolution becomes a
+gather-and-sum that is bit-identical to `conv2d_q313_blocked`.
+
+A table depends only on the filters. `load_product_lut` keeps it as a
+`.q313` file next to the model weights, named after the weights' content
+hash, so it is built once per weight set and memory-mapped afterwards.
+"""
+import os
+import numpy as np
+from pathlib import Path
+
+from image_ingest import quantize_q313
+from q313_engine import DEFAULT_MEM_BUDGET, INT16_MAX, INT16_MIN, im2col_q313, truncate_products_q313
+from stage_cache import content_hash
+from tensor_file import TENSOR_SUFFIX, open_tensor, write_tensor
+
+# The Q3.13 value of every 8-bit pixel, exactly as `load_image_q313` quantizes it.
+PIXEL_CODES = quantize_q313(np.arange(256, dtype=np.float32) / 255.0)
+# Part of every table key; bump it when the table contents change.
+LUT_VERSION = 1
+
+_CODE_OF_VALUE = np.full(1 << 16, -1, dtype=np.int16)
+_CODE_OF_VALUE[PIXEL_CODES.view(np.uint16)] = np.arange(256)
+
+# ------------------------- Tables -------------------------
+
+def build_product_lut(weights: np.ndarray) -> np.ndarray:
+    """
+    Returns the (256, K*K*C, M) int16 table of truncated products for (K, K, C, M) filters.
+
+    Entry [code, k, m] is `fixed_mul_q313(PIXEL_CODES[code], w[k, m])` with
+    the filters flattened in (kh, kw, c) order, the im2col column order.
+    """
+    K, _, C, M = weights.shape
+    w_mat = np.asarray(weights, dtype=np.int32).reshape(K * K * C, M)
+    lut = np.empty((256, K * K * C, M), dtype=np.int16)
+    for code, value in enumerate(PIXEL_CODES.astype(np.int32)):
+        lut[code] = truncate_products_q313(value * w_mat)
+    return lut
+
+def lut_key(weights: np.ndarray) -> str:
+    """Returns the content hash that names the table of a weight set."""
+    return content_hash("product_lut", LUT_VERSION, np.asarray(weights, dtype=np.int16), PIXEL_CODES)
+
+def load_product_lut(weights: np.ndarray, cache_dir: Path = None, name: str = "conv1") -> np.ndarray:
+    """
+    Returns the product table of a weight set, built once and cached in `cache_dir`.
+
+    The table is stored as `<name>_product_lut_<key>.q313` (written through a
+    temporary file) and memory-mapped on later runs. Without a `cache_dir`, or
+    if the directory cannot be written, the table is built in memory.
+    """
+    if cache_dir is None:
+        return build_product_lut(weights)
+    path = Path(cache_dir) / f"{name}_product_lut_{lut_key(weights)[:16]}{TENSOR_SUFFIX}"
+    K, _, C, M = weights.shape
+    if path.is_file():
+        try:
+            lut, header = open_tensor(path)
+            if tuple(header["shape"]) == (256, K * K * C, M):
+                return lut
+        except (ValueError, OSError):
+            pass
+    lut = build_product_lut(weights)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        write_tensor(tmp_path, lut, layout="FLAT")
+        os.replace(tmp_path, path)
+        print(f"✅ Built {name} product table: {path.name}")
+    except OSError as e:
+        tmp_path.unlink(missing_ok=True)
+        print(f"⚠️ Could not cache the {name} product table in '{cache_dir}': {e}")
+    return lut
+
+# ------------------------- Convolution -------------------------
+
+def pixel_code_map(ifmap: np.ndarray) -> np.ndarray:
+    """
+    Maps an ifmap of pixel codes to the 8-bit codes themselves.
+
+    Raises:
+        ValueError: If any value is not one of the 256 `PIXEL_CODES`.
+    """
+    codes = _CODE_OF_VALUE[np.ascontiguousarray(ifmap, dtype=np.int16).view(np.uint16)]
+    if codes.size and codes.min() < 0:
+        raise ValueError("The ifmap holds values that are not quantized 8-bit pixels.")
+    return codes.astype(np.uint8)
+
+def conv2d_q313_lut(ifmap: np.ndarray, lut: np.ndarray, biases: np.ndarray, kernel_size: int,
+                    stride: int, mem_budget: int = DEFAULT_MEM_BUDGET,
+                    relu: bool = False, out: np.ndarray = None) -> np.ndarray:
+    """
+    2D convolution of a pixel-code ifmap as a gather-and-sum over a product table.
+
+    Every window tap k with pixel code c contributes row lut[c, k], so the
+    output is the sum of K*K*C gathered rows of M truncated products. Rows are
+    gathered tap-major for a block of output pixels and summed with contiguous
+    vector adds. Bit-identical to `conv2d_q313_blocked` with the table's filters.
+
+    Args:
+        ifmap (np.ndarray): Input feature map (H, W, C) of `PIXEL_CODES` values.
+        lut (np.ndarray): Product table (256, K*K*C, M) from `build_product_lut`.
+        biases (np.ndarray): Biases (M,), Q3.13 int16.
+        kernel_size (int): Filter size K.
+        stride (int): Convolution stride.
+        mem_budget (int): Upper bound in bytes for the gathered product blocks.
+        relu (bool): Apply ReLU on the writeback, after saturation.
+        out (np.ndarray): Optional (OH, OW, M) int16 array (or view) to write into.
+
+    Returns:
+        np.ndarray: Output feature map (OH, OW, M), int16; `out` if it was given.
+
+    Raises:
+        ValueError: If the ifmap is not made of pixel codes.
+    """
+    H, W, C = ifmap.shape
+    K = kernel_size
+    _, KKC, M = lut.shape
+    if KKC != K * K * C:
+        raise ValueError(f"Table has {KKC} taps, but a {K}x{K}x{C} window needs {K * K * C}.")
+    OH = (H - K) // stride + 1
+    OW = (W - K) // stride + 1
+    P = OH * OW
+
+    # Row index into the flattened table, tap-major: (KKC, P).
+    cols = im2col_q313(pixel_code_map(ifmap), K, stride)
+    rows = (cols.astype(np.int32) * KKC + np.arange(KKC, dtype=np.int32)).T.copy()
+    table = np.asarray(lut).reshape(256 * KKC, M)
+
+    # One gathered int16 block (taps, positions, M) at a time, capped at 1 MiB to stay in cache.
+    p_block = max(1, min(P, min(mem_budget, 1 << 20) // (KKC * M * 2)))
+    acc = np.empty((P, M), dtype=np.int32)
+    for p0 in range(0, P, p_block):
+        p1 = min(p0 + p_block, P)
+        np.add.reduce(table[rows[:, p0:p1]], axis=0, dtype=np.int32, out=acc[p0:p1])
+
+    acc += biases.astype(np.int32)
+    np.clip(acc, 0 if relu else INT16_MIN, INT16_MAX, out=acc)
+    if out is None:
+        return acc.astype(np.int16).reshape(OH, OW, M)
+    out[...] = acc.reshape(OH, OW, M)
+    return out
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Vectorized Q3.13 compute kernels with the custom bit-preserving truncation.
+
+Every product is truncated exactly like `fixed_mul_q313` in the AlexNet
+scripts (sign from product bit 31, value from bits 27..13), so the results
+are bit-identical to the per-window Python loops they replace. Products are
+formed block by block so the K*K*C*M product tensor never has to be
+materialized at once.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+INT16_MIN, INT16_MAX = -32768, 32767
+
+# Default upper bound (in bytes) for the temporary product buffers.
+DEFAULT_MEM_BUDGET = 256 * 1024 * 1024
+
+# Product block size of the space-to-depth kernel, small enough to stay in cache.
+S2D_BLOCK_BYTES = 1024 * 1024
+
+# --------------------------------------------------------------------
+# Truncation
+# --------------------------------------------------------------------
+
+def fixed_mul_q313(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Element-wise multiply two Q3.13 int16 arrays using custom bit-preserving truncation.
+    - New Sign Bit (bit 15):      Taken from product bit 31.
+    - New Integer Bits (bits 14-13):  Taken from product bits 27 and 26.
+    - New Fractional Bits (bits 12-0): Taken from product bits 25 down to 13.
+    """
+    prod32 = a.astype(np.int32) * b.astype(np.int32)
+    prod32_unsigned = prod32.view(np.uint32)
+    value_mask = np.uint32(0x0FFFE000)
+    sign_mask = np.uint32(0x80000000)
+    value_part = (prod32_unsigned & value_mask) >> 13
+    sign_part = (prod32_unsigned & sign_mask) >> 16
+    final_result_unsigned = sign_part | value_part
+    return final_result_unsigned.astype(np.int16)
+
+def truncate_products_q313(prod32: np.ndarray, scratch: np.ndarray = None) -> np.ndarray:
+    """
+    Applies the `fixed_mul_q313` truncation in place to an int32 product array.
+
+    The truncated value is returned sign-extended in int32, i.e. the same number
+    `fixed_mul_q313(...).astype(np.int32)` would give, so it can be summed directly.
+    `scratch` is an optional int32 buffer of the same shape used for the value bits.
+    """
+    if scratch is None:
+        scratch = np.empty_like(prod32)
+    np.right_shift(prod32, 13, out=scratch)
+    np.bitwise_and(scratch, 0x7FFF, out=scratch)   # bits 27..13 -> 14..0
+    np.right_shift(prod32, 31, out=prod32)         # 0 or -1 from bit 31
+    np.left_shift(prod32, 15, out=prod32)          # 0 or -32768
+    np.bitwise_or(prod32, scratch, out=prod32)
+    return prod32
+
+def _accumulator_dtype(n_terms: int):
+    """Returns int32 when `n_terms` truncated products cannot overflow it, else int64."""
+    return np.int32 if n_terms * (INT16_MAX + 1) <= np.iinfo(np.int32).max else np.int64
+
+# --------------------------------------------------------------------
+# Convolution
+# --------------------------------------------------------------------
+
+def im2col_q313(ifmap: np.ndarray, kernel_size: int, stride: int) -> np.ndarray:
+    """
+    Gathers every K x K x C window of an (H, W, C) ifmap into a (OH*OW, K*K*C) matrix.
+
+    The columns follow the (kh, kw, c) order of a (K, K, C, M) weight tensor.
+    """
+    K = kernel_size
+    windows = sliding_window_view(ifmap, (K, K), axis=(0, 1))[::stride, ::stride]
+    OH, OW, C = windows.shape[:3]
+    # (OH, OW, C, K, K) -> (OH, OW, K, K, C)
+    return windows.transpose(0, 1, 3, 4, 2).reshape(OH * OW, K * K * C)
+
+def conv2d_q313_blocked(ifmap: np.ndarray, weights: np.ndarray, biases: np.ndarray,
+                        stride: int, mem_budget: int = DEFAULT_MEM_BUDGET,
+                        relu: bool = False, out: np.ndarray = None,
+                        space_to_depth: bool = False) -> np.ndarray:
+    """
+    Vectorized 2D convolution with per-product custom truncation and int16 saturation.
+
+    Bit-identical to the per-window `conv2d_q313` loop of the AlexNet scripts.
+
+    Args:
+        ifmap (np.ndarray): Input feature map (H, W, C), Q3.13 int16.
+        weights (np.ndarray): Filters (K, K, C, M), Q3.13 int16.
+        biases (np.ndarray): Biases (M,), Q3.13 int16.
+        stride (int): Convolution stride.
+        mem_budget (int): Upper bound in bytes for the temporary product blocks.
+        relu (bool): Apply ReLU on the writeback, after saturation.
+        out (np.ndarray): Optional (OH, OW, M) int16 array (or view) to write into.
+        space_to_depth (bool): Run a strided conv as `conv2d_q313_s2d` (same result).
+
+    Returns:
+        np.ndarray: Output feature map (OH, OW, M), int16; `out` if it was given.
+    """
+    if space_to_depth and stride > 1:
+        return conv2d_q313_s2d(ifmap, weights, biases, stride, mem_budget, relu, out)
+    H, W, C = ifmap.shape
+    K, _, _, M = weights.shape
+    OH = (H - K) // stride + 1
+    OW = (W - K) // stride + 1
+    KKC = K * K * C
+
+    cols = im2col_q313(ifmap, K, stride).astype(np.int32)       # (P, KKC)
+    w_mat = weights.reshape(KKC, M).T.astype(np.int32)          # (M, KKC)
+    acc_dtype = _accumulator_dtype(KKC)
+
+    # Two int32 buffers (products + scratch) per block.
+    budget_elems = max(1, mem_budget // (2 * np.dtype(np.int32).itemsize))
+    m_block = min(M, max(1, budget_elems // KKC))
+    p_block = max(1, budget_elems // (KKC * m_block))
+
+    P = OH * OW
+    acc = np.empty((P, M), dtype=acc_dtype)
+    prod = np.empty((min(p_block, P), m_block, KKC), dtype=np.int32)
+    scratch = np.empty_like(prod)
+    for p0 in range(0, P, p_block):
+        p1 = min(p0 + p_block, P)
+        for m0 in range(0, M, m_block):
+            m1 = min(m0 + m_block, M)
+            block = prod[:p1 - p0, :m1 - m0]
+            np.multiply(cols[p0:p1, None, :], w_mat[None, m0:m1, :], out=block)
+            truncate_products_q313(block, scratch[:p1 - p0, :m1 - m0])
+            block.sum(axis=-1, dtype=acc_dtype, out=acc[p0:p1, m0:m1])
+
+    acc += biases.astype(acc_dtype)
+    np.clip(acc, 0 if relu else INT16_MIN, INT16_MAX, out=acc)
+    if out is None:
+        return acc.astype(np.int16).reshape(OH, OW, M)
+    out[...] = acc.reshape(OH, OW, M)
+    return out
+
+# --------------------------------------------------------------------
+# Space-to-depth convolution
+# --------------------------------------------------------------------
+
+def space_to_depth(ifmap: np.ndarray, block: int) -> np.ndarray:
+    """
+    Rearranges an (H, W, C) ifmap into (ceil(H/U), ceil(W/U), U*U*C) for block size U.
+
+    Output pixel (i, j) holds the U x U input pixels starting at (i*U, j*U),
+    ordered (row, column, channel); pixels past the edge are zero.
+    """
+    H, W, C = ifmap.shape
+    HS, WS = -(-H // block), -(-W // block)
+    padded = np.zeros((HS * block, WS * block, C), dtype=ifmap.dtype)
+    padded[:H, :W] = ifmap
+    return padded.reshape(HS, block, WS, block, C).transpose(0, 2, 1, 3, 4).reshape(HS, WS, block * block * C)
+
+def space_to_depth_filters(weights: np.ndarray, block: int) -> np.ndarray:
+    """
+    Rearranges (K, K, C, M) filters to match `space_to_depth`: (T, T, U*U*C, M), T = ceil(K/U).
+
+    The kernel is zero-extended to T*U taps, so a stride-U conv over the
+    ifmap is a stride-1 conv with these filters over the rearranged ifmap.
+    """
+    K, _, C, M = weights.shape
+    T = -(-K // block)
+    padded = np.zeros((T * block, T * block, C, M), dtype=weights.dtype)
+    padded[:K, :K] = weights
+    return padded.reshape(T, block, T, block, C, M).transpose(0, 2, 1, 3, 4, 5).reshape(T, T, block * block * C, M)
+
+def conv2d_q313_s2d(ifmap: np.ndarray, weights: np.ndarray, biases: np.ndarray,
+                    stride: int, mem_budget: int = DEFAULT_MEM_BUDGET,
+                    relu: bool = False, out: np.ndarray = None) -> np.ndarray:
+    """
+    Strided convolution as a stride-1 convolution over a space-to-depth ifmap.
+
+    With U = stride, the ifmap and filters are rearranged so that every output
+    pixel is the sum of T x T taps, each a dot product over U*U*C channels of
+    one rearranged pixel (T = ceil(K/U)). Each tap reads a plain shifted slice
+    of the rearranged ifmap instead of gathering strided windows, and its
+    channels are laid out along the first axis of the product block, so the
+    channel sum is a run of contiguous vector adds. Channels that only meet
+    the zero extension of the kernel are dropped per tap, so exactly the
+    K*K*C products of `conv2d_q313_blocked` are formed, truncated the same
+    way and summed exactly: the result is bit-identical.
+
+    Args and return value as `conv2d_q313_blocked`; product blocks are kept
+    under both `mem_budget` and `S2D_BLOCK_BYTES`.
+    """
+    H, W, C = ifmap.shape
+    K, _, _, M = weights.shape
+    U = stride
+    OH = (H - K) // U + 1
+    OW = (W - K) // U + 1
+    P = OH * OW
+    T = -(-K // U)
+    acc_dtype = _accumulator_dtype(K * K * C)
+
+    xs = space_to_depth(ifmap, U).astype(np.int32)
+    ws = space_to_depth_filters(weights, U).astype(np.int32)
+    # Kernel row (or column) of every rearranged channel, per tap offset.
+    sub = np.arange(U)
+    chan_rows = np.broadcast_to(sub[:, None, None], (U, U, C)).ravel()
+    chan_cols = np.broadcast_to(sub[None, :, None], (U, U, C)).ravel()
+
+    # Two int32 buffers (products + scratch) of (channels, positions, M) per block.
+    budget_elems = max(1, min(mem_budget, S2D_BLOCK_BYTES) // (2 * np.dtype(np.int32).itemsize))
+    p_block = max(1, min(P, budget_elems // (U * U * C * M)))
+
+    acc = np.zeros((P, M), dtype=acc_dtype)
+    partial = np.empty((p_block, M), dtype=acc_dtype)
+    prod = np.empty((U * U * C, p_block, M), dtype=np.int32)
+    scratch = np.empty_like(prod)
+    for ti in range(T):
+        for tj in range(T):
+            valid = (ti * U + chan_rows < K) & (tj * U + chan_cols < K)
+            w_tap = ws[ti, tj, valid]                                           # (Ct, M)
+            x_tap = xs[ti:ti + OH, tj:tj + OW, valid].reshape(P, -1).T.copy()   # (Ct, P)
+            Ct = w_tap.shape[0]
+            for p0 in range(0, P, p_block):
+                p1 = min(p0 + p_block, P)
+                block = prod[:Ct, :p1 - p0]
+                np.multiply(x_tap[:, p0:p1, None], w_tap[:, None, :], out=block)
+                truncate_products_q313(block, scratch[:Ct, :p1 - p0])
+                np.add.reduce(block, axis=0, dtype=acc_dtype, out=partial[:p1 - p0])
+                acc[p0:p1] += partial[:p1 - p0]
+
+    acc += biases.astype(acc_dtype)
+    np.clip(acc, 0 if relu else INT16_MIN, INT16_MAX, out=acc)
+    if out is None:
+        return acc.astype(np.int16).reshape(OH, OW, M)
+    out[...] = acc.reshape(OH, OW, M)
+    return out
+
+# --------------------------------------------------------------------
+# Max pooling
+# --------------------------------------------------------------------
+
+def max_pool_q313(input_3d: np.ndarray, pool_size: int, stride: int,
+                  pad: int = 0, out: np.ndarray = None, relu: bool = False) -> np.ndarray:
+    """
+    Vectorized max pooling over an (H, W, C) array, optionally zero-padded afterwards.
+
+    The window maximum is separable: each output row first takes the maximum of
+    its `pool_size` input rows (strided views of the input), then each output
+    column takes the maximum of `pool_size` columns of that result. Overlapping
+    windows (e.g. 3x3, stride 2) share the work, and the result is bit-identical
+    to the per-window `max_pooling_3d` loop of the scripts.
+
+    Args:
+        input_3d (np.ndarray): Input array (H, W, C) of any integer dtype.
+        pool_size (int): Pooling window size.
+        stride (int): Pooling stride.
+        pad (int): Zero border added around the pooled output.
+        out (np.ndarray): Optional (OH + 2*pad, OW + 2*pad, C) buffer to write into;
+            its border is zeroed and the pooled values are written to its interior.
+        relu (bool): Apply ReLU in the same pass. ReLU is monotonic, so
+            max(relu(x)) == relu(max(x)) and only the pooled values are clamped.
+
+    Returns:
+        np.ndarray: The pooled (and padded) array, `out` if it was given.
+    """
+    H, W, C = input_3d.shape
+    OH = (H - pool_size) // stride + 1
+    OW = (W - pool_size) // stride + 1
+    padded_shape = (OH + 2 * pad, OW + 2 * pad, C)
+    if out is None:
+        out = np.zeros(padded_shape, dtype=input_3d.dtype)
+    elif out.shape != padded_shape:
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {padded_shape}.")
+    elif pad:
+        out[:pad] = 0
+        out[-pad:] = 0
+        out[:, :pad] = 0
+        out[:, -pad:] = 0
+
+    # Rows: maximum over the pool_size rows of every output row.
+    row_span = stride * (OH - 1) + 1
+    rows = input_3d[0:row_span:stride].copy()
+    for i in range(1, pool_size):
+        np.maximum(rows, input_3d[i:i + row_span:stride], out=rows)
+
+    # Columns: maximum over the pool_size columns, straight into the output.
+    col_span = stride * (OW - 1) + 1
+    interior = out[pad:pad + OH, pad:pad + OW]
+    interior[...] = rows[:, 0:col_span:stride]
+    for j in range(1, pool_size):
+        np.maximum(interior, rows[:, j:j + col_span:stride], out=interior)
+    if relu:
+        np.maximum(interior, 0, out=interior)
+    return out
+
+# --------------------------------------------------------------------
+# Fully-connected
+# --------------------------------------------------------------------
+
+# Default number of output neurons processed per block.
+DEFAULT_FC_BLOCK = 256
+
+def fully_connected_q313_batch(inputs: np.ndarray, weights: np.ndarray, biases: np.ndarray,
+                               block_size: int = DEFAULT_FC_BLOCK, mode: str = "custom") -> np.ndarray:
+    """
+    Fully-connected layer over a stack of inputs in a single pass over the weights.
+
+    Each block of output neurons is read and widened once and then applied to every
+    input row, so the weight stream is amortized over the whole batch.
+
+    Args:
+        inputs (np.ndarray): Input features (N, F), Q3.13 int16.
+        weights (np.ndarray): Weight matrix (F, O), Q3.13 int16.
+        biases (np.ndarray): Biases (O,), Q3.13 int16.
+        block_size (int): Output neurons per block; the temporary int32 product
+            matrix holds `block_size * F` elements.
+        mode (str): "custom" truncates every product like `fixed_mul_q313`;
+            "shift" computes the full int32 dot product and shifts it right by 13,
+            as the FC layers of `alexnet_custom.py` do.
+
+    Returns:
+        np.ndarray: Output scores (N, O), int16 (saturated).
+    """
+    if mode not in ("custom", "shift"):
+        raise ValueError(f"Unknown FC mode '{mode}', expected 'custom' or 'shift'.")
+    N, F = inputs.shape
+    O = weights.shape[1]
+    x = inputs.astype(np.int32)
+    w_t = weights.T                                              # (O, F)
+    acc_dtype = _accumulator_dtype(F) if mode == "custom" else np.int32
+    block_size = max(1, min(block_size, O))
+
+    acc = np.empty((N, O), dtype=acc_dtype)
+    if mode == "custom":
+        prod = np.empty((block_size, F), dtype=np.int32)
+        scratch = np.empty_like(prod)
+    for j0 in range(0, O, block_size):
+        j1 = min(j0 + block_size, O)
+        w_blk = w_t[j0:j1].astype(np.int32)
+        if mode == "shift":
+            np.matmul(x, w_blk.T, out=acc[:, j0:j1])
+            continue
+        block = prod[:j1 - j0]
+        for n in range(N):
+            np.multiply(w_blk, x[n][None, :], out=block)
+            truncate_products_q313(block, scratch[:j1 - j0])
+            block.sum(axis=-1, dtype=acc_dtype, out=acc[n, j0:j1])
+
+    if mode == "shift":
+        acc >>= 13
+    acc += biases.astype(acc_dtype)
+    np.clip(acc, INT16_MIN, INT16_MAX, out=acc)
+    return acc.astype(np.int16)
+
+def fully_connected_q313_blocked(input_vector: np.ndarray, weights: np.ndarray, biases: np.ndarray,
+                                 block_size: int = DEFAULT_FC_BLOCK) -> np.ndarray:
+    """
+    Fully-connected layer with per-product custom truncation and int16 saturation.
+
+    Bit-identical to the per-neuron `fully_connected_layer` loop of the AlexNet scripts.
+
+    Args:
+        input_vector (np.ndarray): Input features (F,), Q3.13 int16.
+        weights (np.ndarray): Weight matrix (F, O), Q3.13 int16.
+        biases (np.ndarray): Biases (O,), Q3.13 int16.
+        block_size (int): Output neurons per block; the temporary int32 product
+            matrix holds `block_size * F` elements.
+
+    Returns:
+        np.ndarray: Output scores (O,), int16.
+    """
+    return fully_connected_q313_batch(input_vector[None, :], weights, biases, block_size)[0]
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Process-pool parallel Q3.13 convolution.
+
+Each weight tensor is placed in a `multiprocessing.shared_memory` block the
+first time it is used and kept there until `shutdown_pool()`, so the weights
+of every layer are copied once per process rather than once per image. Only
+the ifmap and the output are staged per call. Worker processes attach to the
+blocks by name instead of receiving pickled arrays. Each worker runs
+`conv2d_q313_blocked` on a slice of the output filters (or a band of output
+rows) and writes its result straight into the shared ofmap, so the result is
+bit-identical to the single-process engine.
+
+A forked child (e.g. an image worker of `batch_runner`) starts without a
+pool or shared weights of its own; `atexit` does not run there, so it must
+call `shutdown_pool()` itself before exiting.
+"""
+import atexit
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from q313_engine import DEFAULT_MEM_BUDGET, conv2d_q313_blocked
+
+_EXECUTOR = None
+_EXECUTOR_WORKERS = 0
+# id(weights) -> (weights, block, descriptor); holding `weights` keeps the id from being reused.
+_SHARED_WEIGHTS = {}
+
+# --------------------------------------------------------------------
+# Shared-memory helpers
+# --------------------------------------------------------------------
+
+def _to_shared(data: np.ndarray):
+    """Copies an array into a new shared-memory block; returns (block, descriptor)."""
+    block = shared_memory.SharedMemory(create=True, size=max(1, data.nbytes))
+    view = np.ndarray(data.shape, dtype=data.dtype, buffer=block.buf)
+    view[...] = data
+    return block, (block.name, data.shape, data.dtype.str)
+
+def _attach(descriptor):
+    """Attaches to a shared-memory block from a worker; returns (block, array view)."""
+    name, shape, dtype = descriptor
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+def _shared_weights(weights: np.ndarray):
+    """Returns the descriptor of the shared block holding `weights`, creating it on first use."""
+    entry = _SHARED_WEIGHTS.get(id(weights))
+    if entry is None or entry[0] is not weights:
+        block, desc = _to_shared(np.ascontiguousarray(weights, dtype=np.int16))
+        entry = _SHARED_WEIGHTS[id(weights)] = (weights, block, desc)
+    return entry[2]
+
+def _release_shared_weights():
+    """Closes and unlinks every cached weight block."""
+    for _, block, _ in _SHARED_WEIGHTS.values():
+        block.close()
+        block.unlink()
+    _SHARED_WEIGHTS.clear()
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """Returns the module's process pool, (re)creating it for `workers` processes."""
+    global _EXECUTOR, _EXECUTOR_WORKERS
+    if _EXECUTOR is None or _EXECUTOR_WORKERS != workers:
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown()
+        _EXECUTOR = ProcessPoolExecutor(max_workers=workers)
+        _EXECUTOR_WORKERS = workers
+    return _EXECUTOR
+
+def shutdown_pool():
+    """Shuts down the worker processes, if any were started, and frees the shared weights."""
+    global _EXECUTOR, _EXECUTOR_WORKERS
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown()
+        _EXECUTOR, _EXECUTOR_WORKERS = None, 0
+    _release_shared_weights()
+
+def _forget_pool():
+    """Drops the pool and weight blocks a forked child inherited; they belong to the parent."""
+    global _EXECUTOR, _EXECUTOR_WORKERS
+    _EXECUTOR, _EXECUTOR_WORKERS = None, 0
+    _SHARED_WEIGHTS.clear()
+
+atexit.register(shutdown_pool)
+os.register_at_fork(after_in_child=_forget_pool)
+
+# --------------------------------------------------------------------
+# Worker
+# --------------------------------------------------------------------
+
+def _conv_task(ifmap_desc, weights_desc, out_desc, biases, stride, split, start, stop, mem_budget, relu,
+               space_to_depth):
+    """Computes filters [start, stop) or output rows [start, stop) into the shared ofmap."""
+    blocks, arrays = [], []
+    try:
+        for desc in (ifmap_desc, weights_desc, out_desc):
+            block, array = _attach(desc)
+            blocks.append(block)
+            arrays.append(array)
+        ifmap, weights, ofmap = arrays
+        if split == "filters":
+            conv2d_q313_blocked(ifmap, weights[:, :, :, start:stop], biases[start:stop], stride,
+                                mem_budget, relu, out=ofmap[:, :, start:stop], space_to_depth=space_to_depth)
+        else:
+            K = weights.shape[0]
+            rows = ifmap[start * stride:(stop - 1) * stride + K]
+            conv2d_q313_blocked(rows, weights, biases, stride, mem_budget, relu, out=ofmap[start:stop],
+                                space_to_depth=space_to_depth)
+    finally:
+        # Views must be released before the blocks can be closed.
+        ifmap = weights = ofmap = rows = None
+        arrays.clear()
+        for block in blocks:
+            block.close()
+
+# --------------------------------------------------------------------
+# Parallel convolution
+# --------------------------------------------------------------------
+
+def _split_range(n: int, parts: int):
+    """Splits range(n) into at most `parts` contiguous, nearly equal (start, stop) chunks."""
+    bounds = np.linspace(0, n, min(parts, n) + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+def conv2d_q313_parallel(ifmap: np.ndarray, weights: np.ndarray, biases: np.ndarray,
+                         stride: int, workers: int, split: str = "auto",
+                         mem_budget: int = DEFAULT_MEM_BUDGET, relu: bool = False,
+                         out: np.ndarray = None, space_to_depth: bool = False) -> np.ndarray:
+    """
+    2D convolution split across a process pool, bit-identical to `conv2d_q313_blocked`.
+
+    Args:
+        ifmap (np.ndarray): Input feature map (H, W, C), Q3.13 int16.
+        weights (np.ndarray): Filters (K, K, C, M), Q3.13 int16.
+        biases (np.ndarray): Biases (M,), Q3.13 int16.
+        stride (int): Convolution stride.
+        workers (int): Number of worker processes; 1 runs in-process.
+        split (str): "filters" splits the M output channels, "rows" splits the
+            output rows into bands, "auto" picks filters when M >= workers.
+        mem_budget (int): Total bytes for temporary product blocks, shared by the workers.
+        relu (bool): Apply ReLU on the writeback.
+        out (np.ndarray): Optional (OH, OW, M) int16 array (or view) to write into.
+        space_to_depth (bool): Run strided convs through the space-to-depth kernel.
+
+    Returns:
+        np.ndarray: Output feature map (OH, OW, M), int16; `out` if it was given.
+    """
+    if split not in ("auto", "filters", "rows"):
+        raise ValueError(f"Unknown split '{split}', expected 'auto', 'filters' or 'rows'.")
+    if workers <= 1:
+        return conv2d_q313_blocked(ifmap, weights, biases, stride, mem_budget, relu, out, space_to_depth)
+
+    H, W, C = ifmap.shape
+    K, _, _, M = weights.shape
+    OH = (H - K) // stride + 1
+    OW = (W - K) // stride + 1
+    if split == "auto":
+        split = "filters" if M >= workers else "rows"
+    chunks = _split_range(M if split == "filters" else OH, workers)
+
+    ifmap_block, ifmap_desc = _to_shared(np.ascontiguousarray(ifmap, dtype=np.int16))
+    out_block, out_desc = _to_shared(np.zeros((OH, OW, M), dtype=np.int16))
+    try:
+        executor = _get_executor(workers)
+        weights_desc = _shared_weights(weights)
+        biases = np.asarray(biases, dtype=np.int16)
+        futures = [
+            executor.submit(_conv_task, ifmap_desc, weights_desc, out_desc, biases, stride,
+                            split, start, stop, max(1, mem_budget // workers), relu, space_to_depth)
+            for start, stop in chunks
+        ]
+        for future in futures:
+            future.result()
+        result = np.ndarray((OH, OW, M), dtype=np.int16, buffer=out_block.buf)
+        if out is None:
+            out = result.copy()
+        else:
+            out[...] = result
+        del result
+        return out
+    finally:
+        for block in (ifmap_block, out_block):
+            block.close()
+            block.unlink()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Single-file stage archives: all stage outputs of one image in one zip file.
+
+The per-image directory layout (`stage/channel_NNN/output.txt` for every
+channel) creates one directory and several files per channel. An archive
+holds the same data in one file:
+
+    <stage>.q313                       stage tensor (CHW for feature maps, FLAT for vectors)
+    <stage>_visualization_grid.jpeg    optional channel grid
+    top5_predictions.json              optional JSON members
+
+Members are stored uncompressed, and each tensor member is a complete `.q313`
+file. The zip central directory is the index: reading one (stage, channel)
+slice looks up the member, seeks to its payload and reads H*W values,
+without scanning or extracting anything else.
+"""
+import io
+import json
+import os
+import struct
+import threading
+import zipfile
+import numpy as np
+from pathlib import Path
+from PIL import Image
+
+from tensor_file import TENSOR_SUFFIX, convert_layout, encode_tensor, read_header_from
+from feature_render import grid_canvas, normalize_channels
+
+ARCHIVE_SUFFIX = ".zip"
+GRID_SUFFIX = "_visualization_grid.jpeg"
+# Fixed member timestamps: member contents do not depend on when a run happened.
+MEMBER_DATE = (1980, 1, 1, 0, 0, 0)
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+
+# ------------------------- Writer -------------------------
+
+class StageArchiveWriter:
+    """
+    Collects the stage outputs of one image into a zip archive.
+
+    The archive is written to a temporary file and moved into place by `close`,
+    so a crashed run never leaves a truncated archive behind. `suspend` closes
+    the file handle without finishing the archive; the next `add_*` reopens it
+    in append mode. `add_*` may be called from several writer threads.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        self._zip = zipfile.ZipFile(self._tmp_path, "w", zipfile.ZIP_STORED)
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def _add(self, name: str, payload: bytes):
+        with self._lock:
+            if self._finished:
+                raise ValueError(f"Archive '{self.path.name}' is already closed.")
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(self._tmp_path, "a", zipfile.ZIP_STORED)
+            self._zip.writestr(zipfile.ZipInfo(name, date_time=MEMBER_DATE), payload)
+
+    def add_stage(self, stage_name: str, data: np.ndarray, visualize: bool = False):
+        """Adds one stage output; feature maps (H, W, C) are stored channel-major."""
+        if data.ndim == 3:
+            self._add(f"{stage_name}{TENSOR_SUFFIX}", encode_tensor(data.transpose(2, 0, 1), layout="CHW"))
+            if visualize and data.size:
+                buf = io.BytesIO()
+                Image.fromarray(grid_canvas(normalize_channels(data))).save(buf, 'JPEG')
+                self._add(f"{stage_name}{GRID_SUFFIX}", buf.getvalue())
+        else:
+            self._add(f"{stage_name}{TENSOR_SUFFIX}", encode_tensor(data, layout="FLAT"))
+
+    def add_json(self, name: str, obj):
+        """Adds a JSON member, e.g. the top-5 predictions."""
+        self._add(name, json.dumps(obj, indent=2).encode("utf-8"))
+
+    def suspend(self):
+        """Closes the open file handle; the archive stays unfinished and can still be added to."""
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+
+    def close(self):
+        """Finishes the archive and moves it to its final path."""
+        if self._finished:
+            return
+        self.suspend()
+        self._finished = True
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+# ------------------------- Reader -------------------------
+
+class StageArchive:
+    """Random-access reader for a stage archive."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(self.path, "r")
+        self._file = self.path.open("rb")
+        self._headers = {}
+
+    def stages(self) -> list:
+        """Returns the stage names, sorted (stage names start with their step number)."""
+        return sorted(info.filename[:-len(TENSOR_SUFFIX)] for info in self._zip.infolist()
+                      if info.filename.endswith(TENSOR_SUFFIX))
+
+    def _member_start(self, name: str) -> int:
+        """Returns the file offset of a stored member's data."""
+        try:
+            info = self._zip.getinfo(name)
+        except KeyError:
+            raise KeyError(f"'{name}' is not in archive '{self.path.name}'.") from None
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"Member '{name}' of '{self.path.name}' is compressed; slices need stored members.")
+        self._file.seek(info.header_offset)
+        fields = _LOCAL_HEADER.unpack(self._file.read(_LOCAL_HEADER.size))
+        return info.header_offset + _LOCAL_HEADER.size + fields[9] + fields[10]
+
+    def header(self, stage: str):
+        """Returns (tensor header, payload file offset) of a stage."""
+        if stage not in self._headers:
+            start = self._member_start(f"{stage}{TENSOR_SUFFIX}")
+            self._file.seek(start)
+            header = read_header_from(self._file, f"{self.path.name}:{stage}")
+            self._headers[stage] = (header, start + header["offset"])
+        return self._headers[stage]
+
+    def _read(self, offset: int, count: int) -> np.ndarray:
+        self._file.seek(offset)
+        return np.frombuffer(self._file.read(count * 2), dtype="<i2").astype(np.int16)
+
+    def read_stage(self, stage: str, layout: str = None) -> np.ndarray:
+        """Reads a whole stage; feature maps come back as CHW unless `layout` says otherwise."""
+        header, offset = self.header(stage)
+        shape = tuple(header["shape"])
+        data = self._read(offset, int(np.prod(shape))).reshape(shape)
+        if layout is not None:
+            data = np.ascontiguousarray(convert_layout(data, header["layout"], layout))
+        return data
+
+    def read_channel(self, stage: str, channel: int) -> np.ndarray:
+        """Reads one (H, W) channel of a feature-map stage."""
+        header, offset = self.header(stage)
+        if header["layout"] != "CHW":
+            raise ValueError(f"Stage '{stage}' is not a channel-major feature map.")
+        C, H, W = header["shape"]
+        if not 0 <= channel < C:
+            raise IndexError(f"Channel {channel} is out of range for stage '{stage}' with {C} channels.")
+        return self._read(offset + channel * H * W * 2, H * W).reshape(H, W)
+
+    def read_json(self, name: str):
+        """Reads a JSON member."""
+        return json.loads(self._zip.read(name).decode("utf-8"))
+
+    def close(self):
+        self._zip.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
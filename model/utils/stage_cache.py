@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk caches with a size cap and LRU eviction.
+
+`DiskCache` keeps one file per key under a cache directory. A file's
+modification time is its last use: every hit touches the file, and once the
+directory grows past `max_bytes` the least recently used files are removed.
+Writes go through a temporary file and `os.replace`, so several processes
+and threads can share one cache directory.
+
+`StageCache` stores int16 stage outputs as `.q313` tensor files, keyed by
+`content_hash` of everything that determines them (input tensor, weights,
+biases, hyper-parameters, arithmetic mode). A rerun then skips every stage
+whose inputs did not change.
+"""
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+
+from tensor_file import TENSOR_SUFFIX, load_tensor, write_tensor
+
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+# Eviction trims the cache to this fraction of the cap so it does not run on every write.
+EVICT_TARGET = 0.9
+
+# ------------------------- Hashing -------------------------
+
+def content_hash(*parts) -> str:
+    """
+    Returns a hex digest over arrays, bytes and JSON-serializable values.
+
+    Arrays contribute their dtype, shape and raw bytes, so equal keys mean equal
+    contents regardless of memory layout.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            data = np.ascontiguousarray(part)
+            h.update(f"nd:{data.dtype.str}:{data.shape}".encode("utf-8"))
+            h.update(memoryview(data).cast("B"))
+        elif isinstance(part, (bytes, bytearray)):
+            h.update(b"b:")
+            h.update(part)
+        else:
+            h.update(b"j:" + json.dumps(part, sort_keys=True).encode("utf-8"))
+        h.update(b"|")
+    return h.hexdigest()
+
+# ------------------------- LRU Directory -------------------------
+
+class DiskCache:
+    """A directory of `<key><suffix>` files capped at `max_bytes` with LRU eviction."""
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_CACHE_BYTES, suffix: str = ".bin"):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        """Returns (last use, size, path) for every cached file."""
+        entries = []
+        for path in self.cache_dir.glob(f"*/*{self.suffix}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:          # removed by another process
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{self.suffix}"
+
+    def lookup(self, key: str):
+        """Returns the path of a cached entry and marks it as used, or None on a miss."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def store(self, key: str, write_fn) -> Path:
+        """Creates the entry for `key` by calling `write_fn(path)` on a temporary path."""
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        write_fn(tmp_path)
+        try:
+            # An existing entry (same key computed twice) is overwritten, not added.
+            old_size = path.stat().st_size
+        except FileNotFoundError:
+            old_size = 0
+        os.replace(tmp_path, path)
+        self._total_bytes += path.stat().st_size - old_size
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+        return path
+
+    def evict(self):
+        """Removes least recently used entries until the cache is below its target size."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._total_bytes = total
+
+# ------------------------- Stage Outputs -------------------------
+
+class StageCache(DiskCache):
+    """Caches int16 stage outputs as `.q313` tensor files."""
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_CACHE_BYTES):
+        super().__init__(cache_dir, max_bytes, suffix=TENSOR_SUFFIX)
+
+    def get(self, key: str):
+        """Returns the cached stage output for `key`, or None."""
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            return load_tensor(path)
+        except (ValueError, OSError):          # evicted or partially written meanwhile
+            return None
+
+    def put(self, key: str, data: np.ndarray):
+        """Stores a stage output under `key`."""
+        layout = "HWC" if data.ndim == 3 else "FLAT"
+        self.store(key, lambda path: write_tensor(path, data, layout=layout))
+
+    def get_or_compute(self, key: str, compute_fn, label: str = "stage") -> np.ndarray:
+        """Returns the cached output for `key`, computing and storing it on a miss."""
+        data = self.get(key)
+        if data is not None:
+            print(f"  ♻️  Reused cached {label} output.")
+            return data
+        data = compute_fn()
+        self.put(key, data)
+        return data
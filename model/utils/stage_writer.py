@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Stage dump levels and a bounded background writer for the AlexNet drivers.
+
+Every stage can be dumped at one of four levels:
+
+- "none":     nothing is written;
+- "final":    nothing is written, unless the stage is the network's final output,
+              which is then dumped in full;
+- "combined": one packed `.q313` tensor file per stage (export it to the text
+              formats with `tensor_file.py` when needed);
+- "full":     the debug dump: per-channel `output.txt` and JPEG, the combined
+              `_all_channels.txt` and the grid visualization.
+
+`StageWriter` runs the dump functions on a small thread pool, so the compute
+thread does not wait on file I/O. At most `max_pending` dumps are queued at a
+time; each holds a private copy of its stage data, which bounds the extra memory.
+"""
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+DUMP_LEVELS = ("none", "final", "combined", "full")
+DEFAULT_WRITER_THREADS = 2
+DEFAULT_MAX_PENDING = 8
+
+# ------------------------- Dump Levels -------------------------
+
+def parse_dump_overrides(spec: str) -> dict:
+    """Parses per-stage overrides such as 'conv5=full, relu5=none' into a dictionary."""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, level = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid dump level override '{item}', expected 'stage=level'.")
+        overrides[name.strip()] = level.strip().lower()
+    return overrides
+
+def resolve_dump_levels(stage_names: list, default: str = "full", overrides: dict = None) -> dict:
+    """
+    Returns {stage name: "none", "combined" or "full"} in stage order.
+
+    "final" is resolved here: the last stage is dumped in full, every other
+    stage at "final" is skipped.
+    """
+    overrides = overrides or {}
+    unknown = set(overrides) - set(stage_names)
+    if unknown:
+        raise ValueError(f"Unknown stage(s) in dump level overrides: {', '.join(sorted(unknown))}.")
+    levels = {}
+    for name in stage_names:
+        level = overrides.get(name, default)
+        if level not in DUMP_LEVELS:
+            raise ValueError(f"Unknown dump level '{level}' for stage '{name}', expected one of {DUMP_LEVELS}.")
+        if level == "final":
+            level = "full" if name == stage_names[-1] else "none"
+        levels[name] = level
+    return levels
+
+# ------------------------- Background Writer -------------------------
+
+class StageWriter:
+    """
+    Runs stage dumps on a bounded background thread pool.
+
+    Args:
+        threads (int): Writer threads; 0 runs every dump inline on the caller's thread.
+        max_pending (int): Dumps that may be queued or running before `submit` blocks.
+    """
+
+    def __init__(self, threads: int = DEFAULT_WRITER_THREADS, max_pending: int = DEFAULT_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=threads) if threads > 0 else None
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._futures = []
+
+    def submit(self, save_fn, *args):
+        """
+        Queues `save_fn(*args)`. Array arguments are copied first, so the caller
+        may overwrite its buffers as soon as this returns.
+        """
+        if self._executor is None:
+            save_fn(*args)
+            return
+        args = tuple(np.array(arg) if isinstance(arg, np.ndarray) else arg for arg in args)
+        self._slots.acquire()
+        future = self._executor.submit(save_fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def wait(self):
+        """Waits for every queued dump; re-raises the first error a dump raised."""
+        futures, self._futures = self._futures, []
+        errors = [f.exception() for f in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def close(self):
+        """Lets the queued dumps finish and stops the writer threads; errors are only reported by `wait`."""
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._futures.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Packed binary container for single Q3.13 tensors (`.q313` files).
+
+A tensor file replaces the 17-bytes-per-value binary text files for
+intermediate feature maps:
+
+    magic "Q313TNSR" | uint32 version | uint32 header length | JSON header | payload
+
+The JSON header stores the shape, layout ("CHW" or "HWC" for feature maps,
+"FLAT" for vectors), Q-format and dtype. The payload is raw little-endian
+int16 aligned to 64 bytes, so it can be opened with `np.memmap`. The text
+formats read by the testbench are only produced on demand with the exporters.
+
+Run this script to convert between `.q313` files and the text formats.
+"""
+import sys
+import json
+import struct
+import numpy as np
+from pathlib import Path
+
+from bin16_codec import read_bin16_file, write_bin16_file, write_bin64_merged_file
+
+TENSOR_MAGIC = b"Q313TNSR"
+TENSOR_VERSION = 1
+TENSOR_SUFFIX = ".q313"
+ALIGNMENT = 64
+LAYOUTS = ("CHW", "HWC", "FLAT")
+
+# ------------------------- Layout Helpers -------------------------
+
+def convert_layout(data: np.ndarray, src: str, dst: str) -> np.ndarray:
+    """Returns a (possibly transposed) view of a 3-D tensor in layout `dst`."""
+    for layout in (src, dst):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout '{layout}', expected one of {LAYOUTS}.")
+    if src == dst:
+        return data
+    if "FLAT" in (src, dst):
+        raise ValueError(f"Cannot convert a tensor from layout '{src}' to '{dst}'.")
+    return data.transpose(1, 2, 0) if src == "CHW" else data.transpose(2, 0, 1)
+
+# ------------------------- Writer -------------------------
+
+def encode_header(shape: tuple, layout: str = "HWC", qformat: str = "Q3.13") -> bytes:
+    """
+    Returns the header of a `.q313` file for a tensor of `shape`, zero-padded up to the payload.
+
+    Writers that produce the payload piece by piece write this first and then
+    append the int16 values in C order.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}', expected one of {LAYOUTS}.")
+    if layout != "FLAT" and len(shape) != 3:
+        raise ValueError(f"Layout '{layout}' needs a 3-D tensor, got shape {tuple(shape)}.")
+
+    entry = {"shape": [int(d) for d in shape], "layout": layout, "qformat": qformat, "dtype": "int16"}
+    # The payload offset is part of the header, so settle the header size first.
+    header_len = 0
+    while True:
+        entry["offset"] = (len(TENSOR_MAGIC) + 8 + header_len + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+        header = json.dumps(entry).encode("utf-8")
+        if len(header) == header_len:
+            break
+        header_len = len(header)
+
+    prefix = TENSOR_MAGIC + struct.pack("<II", TENSOR_VERSION, header_len) + header
+    return prefix + b"\0" * (entry["offset"] - len(prefix))
+
+def encode_tensor(data: np.ndarray, layout: str = "HWC", qformat: str = "Q3.13") -> bytes:
+    """Returns the complete `.q313` file contents for one tensor (see `write_tensor`)."""
+    data = np.ascontiguousarray(data, dtype="<i2")
+    return encode_header(data.shape, layout, qformat) + data.tobytes()
+
+def write_tensor(path: Path, data: np.ndarray, layout: str = "HWC", qformat: str = "Q3.13"):
+    """
+    Writes one tensor to a `.q313` file.
+
+    Args:
+        path (Path): Destination file.
+        data (np.ndarray): Tensor to store; it is saved as int16 in C order.
+        layout (str): "CHW", "HWC" or "FLAT"; describes the axes of `data`.
+        qformat (str): Fixed-point format recorded in the header.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(encode_tensor(data, layout, qformat))
+
+# ------------------------- Reader -------------------------
+
+def read_header_from(f, name: str) -> dict:
+    """
+    Reads and validates a tensor header from an open binary file at its current position.
+
+    The payload offset in the header is relative to that position.
+    """
+    if f.read(len(TENSOR_MAGIC)) != TENSOR_MAGIC:
+        raise ValueError(f"'{name}' is not a Q3.13 tensor file.")
+    version, header_len = struct.unpack("<II", f.read(8))
+    if version != TENSOR_VERSION:
+        raise ValueError(f"Unsupported tensor file version {version} in '{name}'.")
+    return json.loads(f.read(header_len).decode("utf-8"))
+
+def read_tensor_header(path: Path) -> dict:
+    """Reads and validates the JSON header of a `.q313` file."""
+    path = Path(path)
+    with path.open("rb") as f:
+        return read_header_from(f, path)
+
+def open_tensor(path: Path):
+    """Opens a `.q313` file as a read-only `np.memmap`; returns (tensor, header)."""
+    header = read_tensor_header(path)
+    tensor = np.memmap(path, dtype="<i2", mode="r", offset=header["offset"], shape=tuple(header["shape"]))
+    return tensor, header
+
+def load_tensor(path: Path, layout: str = None) -> np.ndarray:
+    """
+    Loads a `.q313` file into memory as an int16 array.
+
+    If `layout` is given, a 3-D tensor is transposed into that layout.
+    """
+    tensor, header = open_tensor(path)
+    if layout is not None:
+        tensor = convert_layout(tensor, header["layout"], layout)
+    return np.array(tensor, dtype=np.int16)
+
+# ------------------------- Text Converters -------------------------
+
+def _export_view(path: Path, layout: str) -> np.ndarray:
+    """Opens a `.q313` file in the element order of the requested export layout."""
+    tensor, header = open_tensor(path)
+    if header["layout"] == "FLAT":
+        return tensor
+    return convert_layout(tensor, header["layout"], layout)
+
+def export_bin16_txt(path: Path, txt_path: Path, layout: str = "CHW"):
+    """Exports a `.q313` file to the one-value-per-line binary text format in `layout` order."""
+    write_bin16_file(txt_path, _export_view(path, layout))
+
+def export_bin64_merged_txt(path: Path, txt_path: Path, layout: str = "CHW"):
+    """Exports a `.q313` file to the 64-bit merged text format in `layout` order."""
+    write_bin64_merged_file(txt_path, _export_view(path, layout))
+
+def import_bin16_txt(txt_path: Path, path: Path, shape: tuple, layout: str):
+    """Packs a binary text file holding a tensor of `shape` in `layout` order into a `.q313` file."""
+    data = read_bin16_file(txt_path)
+    expected = int(np.prod(shape))
+    if data.size != expected:
+        raise ValueError(f"{Path(txt_path).name} has {data.size} values, but shape {shape} requires {expected}.")
+    write_tensor(path, data.reshape(shape), layout)
+
+# ------------------------- Main Driver -------------------------
+
+def main():
+    """Interactively converts between `.q313` tensor files and the text formats."""
+    print("🚀 --- Q3.13 Tensor File Converter --- 🚀")
+    mode = input("Enter mode: [P]ack .txt -> .q313, [E]xport .q313 -> .txt, [M]erged 64-bit export: ").strip().upper()
+    if mode not in ("P", "E", "M"):
+        print("❌ Invalid mode. Use 'P', 'E' or 'M'.", file=sys.stderr)
+        sys.exit(1)
+    input_path = Path(input("Enter path to the INPUT file: ").strip())
+
+    try:
+        if mode == "P":
+            layout = input("Enter the layout of the text file [CHW/HWC/FLAT] (default: CHW): ").strip().upper() or "CHW"
+            dims = input("Enter the tensor shape in that layout, comma separated (e.g. 64,55,55): ")
+            shape = tuple(int(d) for d in dims.split(","))
+            output_path = input_path.with_suffix(TENSOR_SUFFIX)
+            import_bin16_txt(input_path, output_path, shape, layout)
+        else:
+            layout = input("Enter the layout to export in [CHW/HWC] (default: CHW): ").strip().upper() or "CHW"
+            if mode == "E":
+                output_path = input_path.with_suffix(".txt")
+                export_bin16_txt(input_path, output_path, layout)
+            else:
+                output_path = input_path.with_name(input_path.stem + "_64bit_merged.txt")
+                export_bin64_merged_txt(input_path, output_path, layout)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"\n❌ Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"✅ Output written to: {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,22 @@ import os
 import numpy as np
 from PIL import Image
 
+from pathlib import Path
+
+from bin16_codec import encode_bin16
+from image_ingest import input_key, load_image_cached, pixels_from_q313, quantize_q313
+from ifmap_segments import DEFAULT_OVERLAP, DEFAULT_ROWS_PER_SEGMENT, segment_views, write_segments
+from stage_cache import DEFAULT_CACHE_BYTES, StageCache, content_hash
+
 # --- Configuration Constants ---
 # Image settings
 IMAGE_WIDTH = 227
 IMAGE_HEIGHT = 227
 CHANNELS = 3
 
-# Segmentation settings
-ROWS_PER_SEGMENT = 35
-OVERLAP = 7
+# Segmentation settings (defaults; the prompts in main() can override them)
+ROWS_PER_SEGMENT = DEFAULT_ROWS_PER_SEGMENT
+OVERLAP = DEFAULT_OVERLAP
 
 # --- Stage 1: Image Resizing ---
 def resize_image(input_path, output_path):
@@ -26,87 +33,63 @@ def resize_image(input_path, output_path):
     return img_resized
 
 # --- Stage 2: Q3.13 Fixed-Point Conversion ---
-def float_to_q313_bin(val):
-    """Converts a float to a 16-bit Q3.13 binary string."""
-    max_val = 7.9998779296875  # (2^3 - 2^-13)
-    min_val = -8.0             # -2^3
-    val = min(max(val, min_val), max_val)
-    scaled = int(round(val * (2 ** 13)))
-    if scaled < 0:
-        scaled = (1 << 16) + scaled
-    return format(scaled, '016b')
-
-def convert_image_to_q313_lines(img_obj):
+def convert_image_to_q313(img_obj):
     """
-    Converts a PIL image object to a list of Q3.13 binary strings.
+    Converts a PIL image object to a (C, H, W) Q3.13 int16 array.
     """
     print("[*] Converting resized image to Q3.13 fixed-point format...")
-    np_img = np.array(img_obj).astype(np.float32) / 255.0
-    np_img = np.transpose(np_img, (2, 0, 1))  # Reorder to (C, H, W)
-    
-    lines = []
-    channels, height, width = np_img.shape
-    for c in range(channels):
-        for h in range(height):
-            for w in range(width):
-                binary_val = float_to_q313_bin(np_img[c, h, w])
-                lines.append(binary_val)
-    return lines
-
-# --- Stage 3: Segmentation ---
-def segment_q313_data(q313_lines):
-    """
-    Splits the full list of Q3.13 lines into overlapping segments.
-    Returns a dictionary where keys are segment filenames and values are the line data.
-    """
-    print("[*] Segmenting the Q3.13 data...")
-    pixels_per_channel = IMAGE_WIDTH * IMAGE_HEIGHT
-    ch1 = q313_lines[0 : pixels_per_channel]
-    ch2 = q313_lines[pixels_per_channel : 2 * pixels_per_channel]
-    ch3 = q313_lines[2 * pixels_per_channel : 3 * pixels_per_channel]
-    channels = [ch1, ch2, ch3]
-
-    start_rows = [0]
-    while start_rows[-1] + ROWS_PER_SEGMENT < IMAGE_HEIGHT:
-        next_start = start_rows[-1] + ROWS_PER_SEGMENT - OVERLAP
-        start_rows.append(next_start)
-
-    segments = {}
-    for idx, start_row in enumerate(start_rows):
-        segment_data = []
-        for ch_lines in channels:
-            for i in range(start_row, start_row + ROWS_PER_SEGMENT):
-                if i >= IMAGE_HEIGHT:
-                    segment_data.extend(['0' * 16] * IMAGE_WIDTH)
-                else:
-                    start_idx = i * IMAGE_WIDTH
-                    end_idx = start_idx + IMAGE_WIDTH
-                    segment_data.extend(ch_lines[start_idx:end_idx])
-        
-        segment_name = f"segment_{idx+1}_16bit.txt"
-        segments[segment_name] = segment_data
-        
-    print(f"  ✅ Generated data for {len(segments)} segments.")
-    return segments
+    np_img = quantize_q313(np.array(img_obj).astype(np.float32) / 255.0)
+    return np.transpose(np_img, (2, 0, 1))  # Reorder to (C, H, W)
+
+# --- Stages 3-4: Segmentation and Merging to 64-bit ---
+def save_merged_segments(segments, final_dir):
+    """Packs (S, ...) int16 segments into 64-bit words and writes one merged file per segment."""
+    print("[*] Merging segments to 64-bit words and saving final files...")
+    for output_path in write_segments(segments, final_dir, merged=True,
+                                      name_format="segment_{index}_64bit_merged.txt", final_newline=False):
+        print(f"  ✅ Saved final merged file: {output_path}")
 
-# --- Stage 4: Merging to 64-bit ---
-def merge_16bit_to_64bit(lines_16bit):
+# --- Core Processing Function for a Single Image ---
+def process_single_image_cached(image_path, base_output_dir, cache, rows_per_segment=ROWS_PER_SEGMENT, overlap=OVERLAP):
     """
-    Merges a list of 16-bit binary strings (4 at a time) into 64-bit strings.
+    Runs the pipeline for one image through an input cache.
+
+    The quantized tensor and the 16-bit segments are looked up by the source
+    file's content hash and the resize/segmentation parameters; on a hit, the
+    resized JPEG, q313_full.txt and merged segment files are re-created from the
+    cached values without decoding the image. The files are identical either way.
     """
-    if len(lines_16bit) % 4 != 0:
-        padding_needed = 4 - (len(lines_16bit) % 4)
-        lines_16bit.extend(['0' * 16] * padding_needed)
-
-    output_lines_64bit = []
-    for i in range(0, len(lines_16bit), 4):
-        merged = ''.join(lines_16bit[i:i+4][::-1])
-        output_lines_64bit.append(merged)
-        
-    return output_lines_64bit
+    try:
+        image_base_name = os.path.splitext(os.path.basename(image_path))[0]
+        intermediate_dir = os.path.join(base_output_dir, "intermediate_files")
+        final_dir = os.path.join(base_output_dir, "final_64bit_segments")
+        os.makedirs(intermediate_dir, exist_ok=True)
+        os.makedirs(final_dir, exist_ok=True)
 
-# --- Core Processing Function for a Single Image ---
-def process_single_image(image_path, base_output_dir):
+        # STAGES 1-2: RESIZE AND CONVERT TO Q3.13 (cached tensor)
+        tensor = load_image_cached(Path(image_path), cache, size=IMAGE_WIDTH)
+        resized_img_path = os.path.join(intermediate_dir, f"{image_base_name}_227x227.jpg")
+        Image.fromarray(pixels_from_q313(tensor)).save(resized_img_path, format='JPEG')
+        print(f"  ✅ Saved resized image to: {resized_img_path}")
+        tensor_chw = np.transpose(tensor, (2, 0, 1))
+        q313_full_path = os.path.join(intermediate_dir, f"{image_base_name}_q313_full.txt")
+        with open(q313_full_path, 'wb') as f:
+            f.write(encode_bin16(tensor_chw, final_newline=False))
+        print(f"  ✅ Saved full Q3.13 data to: {q313_full_path}")
+
+        # STAGE 3: SEGMENT DATA (cached segments)
+        segments_key = content_hash("segments", input_key(Path(image_path), size=IMAGE_WIDTH),
+                                    {"rows_per_segment": rows_per_segment, "overlap": overlap})
+        segments = cache.get_or_compute(segments_key, lambda: np.ascontiguousarray(
+            segment_views(tensor_chw, rows_per_segment, overlap)), "segments")
+
+        # STAGE 4: MERGE SEGMENTS & SAVE
+        save_merged_segments(segments, final_dir)
+
+    except Exception as e:
+        print(f"❌ An unexpected error occurred while processing {os.path.basename(image_path)}: {e}")
+
+def process_single_image(image_path, base_output_dir, rows_per_segment=ROWS_PER_SEGMENT, overlap=OVERLAP):
     """Runs the full processing pipeline for one image."""
     try:
         image_base_name = os.path.splitext(os.path.basename(image_path))[0]
@@ -122,24 +105,18 @@ def process_single_image(image_path, base_output_dir):
         resized_img_obj = resize_image(image_path, resized_img_path)
 
         # STAGE 2: CONVERT TO Q3.13
-        q313_lines = convert_image_to_q313_lines(resized_img_obj)
+        tensor_chw = convert_image_to_q313(resized_img_obj)
         q313_full_path = os.path.join(intermediate_dir, f"{image_base_name}_q313_full.txt")
-        with open(q313_full_path, 'w') as f:
-            f.write('\n'.join(q313_lines))
+        with open(q313_full_path, 'wb') as f:
+            f.write(encode_bin16(tensor_chw, final_newline=False))
         print(f"  ✅ Saved full Q3.13 data to: {q313_full_path}")
 
-        # STAGE 3: SEGMENT DATA
-        segments_16bit = segment_q313_data(q313_lines)
+        # STAGE 3: SEGMENT DATA (strided views, no copies)
+        segments = segment_views(tensor_chw, rows_per_segment, overlap)
+        print(f"  ✅ Generated data for {len(segments)} segments.")
 
         # STAGE 4: MERGE SEGMENTS & SAVE
-        print("[*] Merging segments to 64-bit words and saving final files...")
-        for name, data_16bit in segments_16bit.items():
-            data_64bit = merge_16bit_to_64bit(data_16bit)
-            final_filename = name.replace("_16bit.txt", "_64bit_merged.txt")
-            output_path = os.path.join(final_dir, final_filename)
-            with open(output_path, 'w') as f:
-                f.write('\n'.join(data_64bit))
-            print(f"  ✅ Saved final merged file: {output_path}")
+        save_merged_segments(segments, final_dir)
 
     except Exception as e:
         print(f"❌ An unexpected error occurred while processing {os.path.basename(image_path)}: {e}")
@@ -161,6 +138,17 @@ def main():
         print("❌ Error: Output directory name cannot be empty.")
         return
 
+    rows_str = input(f"Enter rows per segment (default: {ROWS_PER_SEGMENT}): ").strip()
+    overlap_str = input(f"Enter overlapping rows between segments (default: {OVERLAP}): ").strip()
+    rows_per_segment = int(rows_str) if rows_str else ROWS_PER_SEGMENT
+    overlap = int(overlap_str) if overlap_str else OVERLAP
+
+    cache_dir = input("Enter path to an INPUT CACHE directory (leave empty to disable): ").strip()
+    cache = None
+    if cache_dir:
+        cache_mib = input(f"Enter the input cache size limit in MiB (default: {DEFAULT_CACHE_BYTES // 2**20}): ").strip()
+        cache = StageCache(Path(cache_dir), int(cache_mib) * 2**20 if cache_mib else DEFAULT_CACHE_BYTES)
+
     # 2. Find all images in the directory
     supported_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
     image_files = [f for f in os.listdir(input_dir_path) if os.path.splitext(f)[1].lower() in supported_extensions]
@@ -182,7 +170,10 @@ def main():
         print(f"\n--- Processing: {image_name} ---")
         print(f"Results will be saved in: {image_specific_output_dir}")
         
-        process_single_image(image_path, image_specific_output_dir)
+        if cache is not None:
+            process_single_image_cached(image_path, image_specific_output_dir, cache, rows_per_segment, overlap)
+        else:
+            process_single_image(image_path, image_specific_output_dir, rows_per_segment, overlap)
 
     print("\n🎉 Batch processing finished successfully!")
 